@@ -0,0 +1,731 @@
+"""Micro-benchmarks for every conversation handler in bot.py.
+
+Each handler runs in isolation against lightweight fake Update, CallbackQuery
+and context objects, so no network or Telegram objects are involved:
+
+    python bench.py                      # print ns/op and allocations per call
+    python bench.py --only collect_username new_q1_yes
+    python bench.py --save               # store bench_baseline.json
+    python bench.py --check              # exit 1 if a handler got slower than the baseline
+    python bench.py --logging            # event-loop cost of a log call, direct vs queued
+    python bench.py --profile            # updates/s and p99 through polling, PERF_PROFILE off vs fast
+    python bench.py --media              # Bot API request bytes per guide view, upload vs cached file_id
+    python bench.py --proof-index        # reused-proof lookup time at 10k to 1M stored hashes
+    python bench.py --gateway            # a burst through OutgoingGateway: pacing and wait per class
+    python bench.py --llm                # LLMTriage against llm_stub: completion vs first streamed chunk,
+                                         # and answer_question's time to first text and edits
+
+Timing is the best of three rounds. Allocations are measured in a separate
+pass under tracemalloc: peak bytes allocated during a call, and memory
+blocks still held after it (state the handler keeps, e.g. ticket rows).
+
+--profile polls a fake Bot API running in a child process over local HTTP,
+so the event loop, the HTTP client and JSON decoding are all on the measured
+path: updates/s is measured flat out, latency (batch hand-out to handler
+return) at --rate offered updates/s.
+
+--media sends a synthetic guide (three screenshots and a short video) through
+MediaLibrary against a fake Bot API, and edits one screenshot half way, to
+show which views upload files and which only send file_ids.
+
+--llm starts llm_stub.py in this process and points OPENAI_BASE_URL at it, so
+LLMTriage goes through the real openai client and HTTP. Each question is
+asked once against the stub, then once more to time the cache. The
+answer_question handler is then run on new questions, timing when its
+placeholder message first shows text and how many edits the answer took.
+"""
+import argparse
+import asyncio
+import dataclasses
+import datetime
+import itertools
+import json
+import logging
+import logging.handlers
+import multiprocessing
+import os
+import queue
+import re
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from telegram import Update
+from telegram.ext import CallbackQueryHandler, CommandHandler, MessageHandler, TypeHandler
+
+import bot
+import llm_stub
+from replay import FAKE_SUPPORT_CHAT_ID, FakeBotAPI
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baseline.json")
+FAKE_TOKEN = "123456:BENCH"
+MESSAGE_INPUTS = {
+    'collect_username': "@player_one",
+    'answer_question': "Do I need a VPN to play?",
+}
+# Handlers that take a screenshot rather than text
+PHOTO_INPUTS = {'receive_proof'}
+
+class FakeUser:
+    def __init__(self, user_id: int):
+        self.id = user_id
+        self.username = "bench_user"
+        self.first_name = "Bench"
+        self.last_name = "User"
+        self.language_code = "en"
+
+class FakeChat:
+    def __init__(self, chat_id: int):
+        self.id = chat_id
+        self.type = "private"
+
+class FakePhotoSize:
+    def __init__(self, file_id: str, width: int):
+        self.file_id = file_id
+        self.file_unique_id = file_id
+        self.width = width
+        self.height = width * 9 // 16
+
+class FakeMessage:
+    date = datetime.datetime(2026, 1, 1, tzinfo=datetime.timezone.utc)
+    document = None
+    media_group_id = None
+
+    def __init__(self, user: FakeUser, text: str = None, photo: bool = False):
+        self.text = text
+        self.from_user = user
+        self.chat = FakeChat(user.id)
+        self.chat_id = user.id
+        self.message_id = 1
+        # Every screenshot is a new one, so the proof is stored rather than reported as a duplicate
+        self.photo = [FakePhotoSize(f"proof-{user.id}-{width}", width) for width in (320, 1280)] if photo else []
+
+    async def reply_text(self, *args, **kwargs):
+        return self
+
+    async def edit_text(self, *args, **kwargs):
+        return self
+
+class FakeCallbackQuery:
+    def __init__(self, user: FakeUser, data: str):
+        self.data = data
+        self.from_user = user
+        self.message = FakeMessage(user)
+
+    async def answer(self, *args, **kwargs):
+        return True
+
+    async def edit_message_text(self, *args, **kwargs):
+        return self.message
+
+class FakeUpdate:
+    # collect_username keys tickets by update, so every call must look like a new one
+    update_ids = itertools.count(1)
+
+    def __init__(self, user: FakeUser, data: str = None, text: str = None, photo: bool = False):
+        self.update_id = next(self.update_ids)
+        self.effective_user = user
+        self.callback_query = FakeCallbackQuery(user, data) if data is not None else None
+        self.message = FakeMessage(user, text, photo) if data is None else None
+        self.effective_message = self.message or self.callback_query.message
+        self.effective_chat = self.effective_message.chat
+
+class FakeBot:
+    async def send_message(self, *args, **kwargs):
+        return FakeMessage(FakeUser(0))
+
+    # ProofForwarder sends every tenth proof to the support group straight away
+    send_photo = send_document = send_message
+
+    async def send_media_group(self, *args, **kwargs):
+        return [FakeMessage(FakeUser(0))]
+
+class StreamedMessage(FakeMessage):
+    """A question whose reply placeholder is itself; records when each edit of it was made."""
+
+    def __init__(self, user: FakeUser, text: str):
+        super().__init__(user, text)
+        self.edits = []
+
+    async def edit_text(self, *args, **kwargs):
+        self.edits.append(time.perf_counter())
+        return self
+
+class FakeApplication:
+    def create_task(self, coroutine, update=None):
+        # Background work such as the proof reuse check is not part of the handler's time
+        coroutine.close()
+
+class FakeContext:
+    def __init__(self, bot_data: dict, user_data: dict, args: list = None):
+        self.bot = FakeBot()
+        self.application = FakeApplication()
+        self.bot_data = bot_data
+        self.user_data = user_data
+        self.args = args or []
+
+BENCH_TENANT = dataclasses.replace(bot.DEFAULT_TENANT, token=FAKE_TOKEN, record_dir=None,
+                                   support_chat_id=FAKE_SUPPORT_CHAT_ID)
+
+def fresh_user_data(ticket_id: int) -> dict:
+    """State a user has mid-flow, so any step can run on its own."""
+    return {'lang': 'en', 'new_player_qa': [], 'existing_player_qa': [], 'support_qa': [],
+            'flow_type': 'support', 'support_q13_text_key': 'support_q13_text', 'proof_ticket_id': ticket_id}
+
+def fresh_bot_data() -> dict:
+    """An empty ticket store holding the one ticket users attach their proofs to."""
+    store = bot.TicketStore(':memory:')
+    ticket_id = store.add_ticket(1, "@bench", 'support', 'en', [("Question", "Answer")])
+    return {'tenant': BENCH_TENANT, 'ticket_store': store, 'bench_ticket_id': ticket_id}
+
+# Handlers whose benchmark is only meaningful if they get past their early returns:
+# name -> (what the success path leaves behind, check on bot_data after the warm-up calls)
+SUCCESS_PATHS = {
+    'collect_username': ("a ticket per call", lambda bot_data: bot_data['ticket_store'].conn.execute(
+        "SELECT COUNT(*) FROM tickets WHERE delivery = 'sent'").fetchone()[0] > 0),
+    'receive_proof': ("a stored proof per call",
+                      lambda bot_data: bot_data['ticket_store'].proof_count(bot_data['bench_ticket_id']) > 0),
+}
+
+def collect_cases() -> dict:
+    """name -> (callback, kind, payload) for every handler wired into the ConversationHandler."""
+    application = bot.build_application(BENCH_TENANT, persist=False)
+    cases = {}
+    conv_handler = application.handlers[0][0]
+    handlers = list(conv_handler.entry_points) + list(conv_handler.fallbacks)
+    for state_handlers in conv_handler.states.values():
+        handlers.extend(state_handlers)
+    for handler in handlers:
+        name = handler.callback.__name__
+        if name in cases:
+            continue
+        if isinstance(handler, CallbackQueryHandler):
+            # "^(en|fr)$" -> "en", "^new_q1_yes$" -> "new_q1_yes"
+            data = re.sub(r"[\^$()]", "", handler.pattern.pattern).split("|")[0]
+            cases[name] = (handler.callback, 'callback', data)
+        elif isinstance(handler, MessageHandler):
+            kind = 'photo' if name in PHOTO_INPUTS else 'message'
+            cases[name] = (handler.callback, kind, MESSAGE_INPUTS.get(name, "hello"))
+        elif isinstance(handler, CommandHandler):
+            cases[name] = (handler.callback, 'message', f"/{next(iter(handler.commands))}")
+    cases['show_main_menu[message]'] = (bot.show_main_menu, 'message', "/start")
+    return cases
+
+def make_call(callback, kind: str, payload: str, bot_data: dict, user_id: int):
+    user = FakeUser(user_id)
+    if kind == 'callback':
+        update = FakeUpdate(user, data=payload)
+    else:
+        update = FakeUpdate(user, text=payload, photo=kind == 'photo')
+    context = FakeContext(bot_data, fresh_user_data(bot_data['bench_ticket_id']))
+    return callback(update, context)
+
+async def bench_handler(callback, kind: str, payload: str, iterations: int) -> dict:
+    bot_data = fresh_bot_data()
+    for i in range(min(50, iterations)):
+        await make_call(callback, kind, payload, bot_data, 10_000_000 + i)
+    success = SUCCESS_PATHS.get(callback.__name__)
+    if success and not success[1](bot_data):
+        raise RuntimeError(f"{callback.__name__} did not reach its success path ({success[0]}): fix the fakes")
+
+    rounds = []
+    for r in range(3):
+        # Build the fake objects up front so only the handler is timed
+        calls = [make_call(callback, kind, payload, bot_data, r * iterations + i) for i in range(iterations)]
+        started = time.perf_counter_ns()
+        for call in calls:
+            await call
+        rounds.append((time.perf_counter_ns() - started) / iterations)
+
+    alloc_iterations = max(1, iterations // 10)
+    tracemalloc.start()
+    peak_total = 0
+    before = tracemalloc.take_snapshot()
+    for i in range(alloc_iterations):
+        call = make_call(callback, kind, payload, bot_data, 20_000_000 + i)
+        tracemalloc.reset_peak()
+        current = tracemalloc.get_traced_memory()[0]
+        await call
+        peak_total += tracemalloc.get_traced_memory()[1] - current
+    del call
+    held = sum(stat.count_diff for stat in tracemalloc.take_snapshot().compare_to(before, 'filename'))
+    tracemalloc.stop()
+
+    return {"ns_per_op": round(min(rounds)), "peak_bytes_per_op": round(peak_total / alloc_iterations),
+            "held_blocks_per_op": round(held / alloc_iterations, 1)}
+
+async def run(only: list, iterations: int) -> dict:
+    results = {}
+    for name, (callback, kind, payload) in sorted(collect_cases().items()):
+        if only and name not in only:
+            continue
+        results[name] = await bench_handler(callback, kind, payload, iterations)
+    return results
+
+class SlowSink:
+    """File-like stream whose writes take `latency` seconds, like stderr into a congested pipe."""
+
+    def __init__(self, stream, latency: float):
+        self.stream = stream
+        self.latency = latency
+
+    def write(self, text):
+        if self.latency:
+            time.sleep(self.latency)
+        return self.stream.write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+def bench_logging(iterations: int, sink_latency: float) -> dict:
+    """ns spent on the calling thread per warning: stderr-style direct write vs bot.py's queued setup."""
+    error = ConnectionError("Timed out")
+    results = {}
+    with tempfile.TemporaryFile("w") as f:
+        sink = SlowSink(f, sink_latency)
+        setups = {
+            "direct, f-string": (logging.StreamHandler(sink), None, lambda log: log.warning(f"Failed to edit message: {error}")),
+            "queued, lazy": (None, None, lambda log: log.warning("Failed to edit message, will retry: %s", error)),
+            "queued, lazy, sampled": (None, bot.SamplingFilter({"Failed to edit message: %s"}, bot.LOG_SAMPLE_EVERY),
+                                      lambda log: log.warning("Failed to edit message: %s", error)),
+        }
+        for name, (direct, sampler, emit) in setups.items():
+            log = logging.getLogger(f"bench.logging.{len(results)}")
+            log.propagate = False
+            listener = None
+            if direct is not None:
+                direct.setFormatter(logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
+                log.addHandler(direct)
+            else:
+                log_queue = queue.SimpleQueue()
+                handler = bot.LazyQueueHandler(log_queue)
+                if sampler:
+                    handler.addFilter(sampler)
+                log.addHandler(handler)
+                output = logging.StreamHandler(sink)
+                output.setFormatter(bot.JsonFormatter())
+                listener = logging.handlers.QueueListener(log_queue, output)
+                listener.start()
+            started = time.perf_counter_ns()
+            for _ in range(iterations):
+                emit(log)
+            results[name] = round((time.perf_counter_ns() - started) / iterations)
+            if listener:
+                listener.stop()
+            log.handlers.clear()
+    return results
+
+PROFILE_STEPS = ["/start", "new_player_start", "new_q1_yes", "new_q2_yes", "new_q3_yes", "back_to_main"]
+
+def synthetic_updates(count: int, users: int = 200) -> list:
+    """Update dicts for `users` people walking the first new-player screens, interleaved."""
+    updates = []
+    for i in range(count):
+        user_id = 1000 + i % users
+        step = PROFILE_STEPS[(i // users) % len(PROFILE_STEPS)]
+        user = {"id": user_id, "is_bot": False, "first_name": "Bench", "language_code": "en"}
+        chat = {"id": user_id, "type": "private", "first_name": "Bench"}
+        if step.startswith("/"):
+            updates.append({"update_id": i + 1, "message": {
+                "message_id": i + 1, "date": 1767225600, "chat": chat, "from": user, "text": step,
+                "entities": [{"type": "bot_command", "offset": 0, "length": len(step)}]}})
+        else:
+            updates.append({"update_id": i + 1, "callback_query": {
+                "id": str(i + 1), "chat_instance": "bench", "data": step, "from": user,
+                "message": {"message_id": 1, "date": 1767225600, "chat": chat, "text": "menu",
+                            "from": {"id": 123456, "is_bot": True, "first_name": "Bench"}}}})
+    return updates
+
+class FakeAPIHandler(BaseHTTPRequestHandler):
+    """Hands out getUpdates batches, no faster than `interval` apart, and a fixed message for every send/edit."""
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True  # headers and body are separate writes; avoid delayed-ACK stalls
+    batches = []      # encoded getUpdates bodies
+    interval = 0.0
+    served = None     # multiprocessing queue of (batch index, time.monotonic())
+    next_batch = 0
+    started = None
+    lock = threading.Lock()
+    message = json.dumps({"ok": True, "result": {
+        "message_id": 1, "date": 1767225600, "text": "Welcome! " * 20,
+        "chat": {"id": 1000, "type": "private", "first_name": "Bench"},
+        "from": {"id": 123456, "is_bot": True, "first_name": "Bench", "username": "bench_bot"},
+        "reply_markup": {"inline_keyboard": [[{"text": f"Button {i}", "callback_data": f"data_{i}"}]
+                                             for i in range(5)]},
+    }}).encode()
+    me = json.dumps({"ok": True, "result": {"id": 123456, "is_bot": True, "first_name": "Bench",
+                                            "username": "bench_bot"}}).encode()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        method = self.path.rsplit("/", 1)[-1]
+        if method == "getUpdates":
+            body = self.next_updates()
+        elif method == "getMe":
+            body = self.me
+        elif method in ("sendMessage", "editMessageText"):
+            body = self.message
+        else:
+            body = b'{"ok": true, "result": true}'
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the bot closed its long poll on shutdown
+
+    def next_updates(self) -> bytes:
+        cls = FakeAPIHandler
+        with cls.lock:
+            cls.started = cls.started or time.monotonic()
+            index = cls.next_batch
+            cls.next_batch += 1
+        if index >= len(self.batches):
+            time.sleep(0.05)
+            return b'{"ok": true, "result": []}'
+        time.sleep(max(0.0, cls.started + index * self.interval - time.monotonic()))
+        self.served.put((index, time.monotonic()))
+        return self.batches[index]
+
+    def log_message(self, format, *args):
+        pass
+
+def serve_fake_api(batches: list, interval: float, served, ready) -> None:
+    """Child process: run the fake Bot API until terminated."""
+    FakeAPIHandler.batches = batches
+    FakeAPIHandler.interval = interval
+    FakeAPIHandler.served = served
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeAPIHandler)
+    ready.put(server.server_address[1])
+    server.serve_forever()
+
+async def poll_through(port: int, count: int) -> dict:
+    """Poll `count` updates from the fake API; update ID -> time.monotonic() its handlers returned."""
+    tenant = dataclasses.replace(bot.DEFAULT_TENANT, token=FAKE_TOKEN, record_dir=None,
+                                 base_url=f"http://127.0.0.1:{port}/bot")
+    application = bot.build_application(tenant, persist=False)
+    application.bot_data['ticket_store'] = bot.TicketStore(':memory:')
+    finished = {}
+
+    async def mark_finished(update: Update, context) -> None:
+        finished[update.update_id] = time.monotonic()
+
+    application.add_handler(TypeHandler(Update, mark_finished), group=1)
+    await application.initialize()
+    await application.start()
+    await application.updater.start_polling(poll_interval=0)
+    while len(finished) < count:
+        await asyncio.sleep(0.01)
+    await application.updater.stop()
+    await application.stop()
+    await application.shutdown()
+    return finished
+
+def profile_run(updates: list, batch_size: int, rate: float, fast: bool) -> dict:
+    """One run against a fake API in its own process, so its CPU use is not charged to the bot."""
+    batches = [json.dumps({"ok": True, "result": updates[i:i + batch_size]}).encode()
+               for i in range(0, len(updates), batch_size)]
+    served, ready = multiprocessing.Queue(), multiprocessing.Queue()
+    server = multiprocessing.Process(target=serve_fake_api, daemon=True,
+                                     args=(batches, batch_size / rate if rate else 0.0, served, ready))
+    server.start()
+    try:
+        bot.FAST_JSON = fast and bot.orjson is not None
+        finished = bot.run_event_loop(poll_through(ready.get(timeout=10), len(updates)), fast=fast)
+        served_at = dict(served.get(timeout=10) for _ in batches)
+    finally:
+        server.terminate()
+    latencies = sorted(finished[update_id] - served_at[(update_id - 1) // batch_size] for update_id in finished)
+    return {"updates_per_second": round(len(updates) / (max(finished.values()) - served_at[0])),
+            "p50_ms": round(latencies[len(latencies) // 2] * 1e3, 2),
+            "p99_ms": round(latencies[int(len(latencies) * 0.99)] * 1e3, 2)}
+
+def bench_profile(count: int, rate: float) -> dict:
+    """PERF_PROFILE off vs fast: throughput flat out (batches of 100), latency at `rate` updates/s (batches of 10)."""
+    updates = synthetic_updates(count)
+    results = {}
+    for name, fast in (("default", False), ("fast", True)):
+        json_name = "orjson" if fast and bot.orjson is not None else "json"
+        loop_name = "uvloop" if fast and bot.uvloop is not None else "asyncio"
+        flat_out = profile_run(updates, 100, 0, fast)
+        paced = profile_run(updates, 10, rate, fast)
+        results[f"{name} ({json_name}, {loop_name})"] = {
+            "updates_per_second": flat_out["updates_per_second"], "p50_ms": paced["p50_ms"], "p99_ms": paced["p99_ms"]
+        }
+    return results
+
+class FakeMediaAPI(FakeBotAPI):
+    """Fake Bot API that counts request body bytes and answers media sends with new file_ids."""
+
+    def __init__(self):
+        super().__init__()
+        self.body_bytes = 0
+        self._file_id = 0
+
+    async def do_request(self, url, method, request_data=None, read_timeout=None,
+                         write_timeout=None, connect_timeout=None, pool_timeout=None):
+        if request_data is not None:
+            # Payload bytes only: multipart boundaries and headers add a few hundred more
+            self.body_bytes += len(request_data.json_payload)
+            if request_data.contains_files:
+                self.body_bytes += sum(len(part[1]) for part in request_data.multipart_data.values()
+                                       if isinstance(part, tuple))
+        return await super().do_request(url, method, request_data, read_timeout, write_timeout,
+                                         connect_timeout, pool_timeout)
+
+    def result(self, endpoint: str, params: dict):
+        if endpoint == 'sendMediaGroup':
+            return [self._message({item['type']: item['media']}) for item in params['media']]
+        if endpoint in ('sendPhoto', 'sendVideo'):
+            kind = endpoint[4:].lower()
+            return self._message({kind: params[kind]})
+        return super().result(endpoint, params)
+
+    def _message(self, media: dict) -> dict:
+        (kind, source), = media.items()
+        if source.startswith('attach://'):
+            self._file_id += 1
+            source = f"{kind}-{self._file_id}"
+        sent = {"file_id": source, "file_unique_id": source, "width": 1280, "height": 720}
+        self._message_id += 1
+        return {"message_id": self._message_id, "date": int(time.time()), "chat": {"id": 1, "type": "private"},
+                kind: [sent] if kind == 'photo' else {**sent, "duration": 10}}
+
+async def bench_media(views: int) -> list:
+    """Request bytes and uploads for each of `views` views of a guide, one screenshot edited half way."""
+    from telegram import Bot
+
+    results = []
+    with tempfile.TemporaryDirectory() as root:
+        folder = os.path.join(root, "channel_instruction_9")
+        os.makedirs(folder)
+        assets = {"1-open-settings.png": 180_000, "2-find-code.png": 160_000,
+                  "3-paste-code.png": 170_000, "4-walkthrough.mp4": 1_500_000}
+        for name, size in assets.items():
+            with open(os.path.join(folder, name), 'wb') as f:
+                f.write(os.urandom(size))
+
+        api = FakeMediaAPI()
+        telegram_bot = Bot(FAKE_TOKEN, request=api)
+        await telegram_bot.initialize()
+        library = bot.MediaLibrary(bot.TicketStore(':memory:'), root=root)
+        for view in range(views):
+            if view == views // 2:
+                with open(os.path.join(folder, "2-find-code.png"), 'wb') as f:
+                    f.write(os.urandom(160_000))
+            before = api.body_bytes
+            uploads = await library.send(telegram_bot, 1, "channel_instruction_9", "en")
+            results.append({"bytes": api.body_bytes - before, "uploads": uploads})
+        await telegram_bot.shutdown()
+    return results
+
+def bench_proof_index(sizes: tuple = (10_000, 100_000, 1_000_000), lookups: int = 50) -> dict:
+    """Median ProofHashIndex.nearest time per index size, for random hashes with one planted near-duplicate."""
+    import numpy as np
+
+    rng = np.random.default_rng(0)
+    results = {}
+    for size in sizes:
+        index = bot.ProofHashIndex()
+        hashes = rng.integers(0, 1 << 64, size, dtype=np.uint64, endpoint=False)
+        for i, hash_value in enumerate(hashes.tolist()):
+            index.add(i, i, hash_value)
+        planted = hashes[size // 2] ^ np.uint64(0b101)  # 2 bits away from a stored hash
+        timings = []
+        for _ in range(lookups):
+            start = time.perf_counter()
+            match = index.nearest(int(planted), exclude_user=-1)
+            timings.append(time.perf_counter() - start)
+        results[size] = {"median_ms": round(sorted(timings)[lookups // 2] * 1e3, 3), "found": match is not None}
+    return results
+
+async def bench_gateway(chats: int = 20, deliveries: int = 5) -> dict:
+    """Send one burst through OutgoingGateway at the default limits: per class waits, and calls/s in the busiest second.
+
+    Each private chat presses a button (answer, edit, message, edit) and the
+    support group gets `deliveries` tickets, all at once.
+    """
+    support_chat_id = -1000000000001
+    gateway = bot.OutgoingGateway(support_chat_id)
+    sent = []
+
+    async def call(endpoint):
+        sent.append(time.monotonic())
+        return True
+
+    calls = []
+    for chat_id in range(1, chats + 1):
+        calls += [('answerCallbackQuery', {'callback_query_id': str(chat_id)}),
+                  ('editMessageText', {'chat_id': chat_id}), ('sendMessage', {'chat_id': chat_id}),
+                  ('editMessageText', {'chat_id': chat_id})]
+    calls += [('sendMessage', {'chat_id': support_chat_id})] * deliveries
+    started = time.monotonic()
+    await asyncio.gather(*(gateway.process_request(call, (endpoint,), {}, endpoint, data, None)
+                           for endpoint, data in calls))
+    elapsed = time.monotonic() - started
+    await gateway.shutdown()
+    busiest = max(sum(1 for t in sent if start <= t < start + 1) for start in sent)
+    return {"calls": len(calls), "seconds": round(elapsed, 2), "busiest_second": busiest,
+            "classes": gateway.snapshot()["classes"]}
+
+async def bench_llm(questions: int, latency: float, chunk_delay: float) -> dict:
+    """Milliseconds to the first chunk and to the whole answer, per way of asking the model.
+
+    "completion" is one non-streamed request, as LLMTriage made before it
+    streamed; "stream" is LLMTriage.stream and "stream (cached)" the same
+    questions asked again. "answer_question" is the handler streaming an
+    answer into its placeholder through stream_edit_message, with the number
+    of edits that took.
+    """
+    server = llm_stub.serve(0, latency, chunk_delay)
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+    bot._openai_client = None  # built from the variables above on first use
+    triage = bot.LLMTriage(tenant=BENCH_TENANT)
+    asked = [f"Question {i}: which code unlocks the reward island?" for i in range(questions)]
+    timings = {"completion": [], "stream": [], "stream (cached)": [], "answer_question": []}
+    edits = []
+    try:
+        client = bot.shared_openai_client()
+        for question in asked:
+            started = time.perf_counter()
+            await client.chat.completions.create(model=triage.model, messages=triage._messages(question, 'en'))
+            elapsed = time.perf_counter() - started
+            timings["completion"].append((elapsed, elapsed))
+        for name in ("stream", "stream (cached)"):
+            for question in asked:
+                started = time.perf_counter()
+                first = None
+                async for _ in triage.stream(question, 'en'):
+                    first = first or time.perf_counter() - started
+                timings[name].append((first, time.perf_counter() - started))
+
+        # Words the FAQ index cannot match, so every question goes to the model
+        bot.LLM_ENABLED = True
+        bot_data = {**fresh_bot_data(), 'llm_triage': triage}
+        for i in range(questions):
+            message = StreamedMessage(FakeUser(30_000_000 + i), f"Question {i}: qwzx plorb vrell?")
+            update = FakeUpdate(message.from_user, text=message.text)
+            update.message = update.effective_message = message
+            started = time.perf_counter()
+            await bot.answer_question(update, FakeContext(bot_data, fresh_user_data(bot_data['bench_ticket_id'])))
+            timings["answer_question"].append((message.edits[0] - started, time.perf_counter() - started))
+            edits.append(len(message.edits))
+    finally:
+        await bot.shared_openai_client().close()
+        bot._openai_client = None
+        server.shutdown()
+    results = {
+        name: {"first_ms": round(sorted(t[0] for t in runs)[len(runs) // 2] * 1e3, 1),
+               "total_ms": round(sorted(t[1] for t in runs)[len(runs) // 2] * 1e3, 1)}
+        for name, runs in timings.items()
+    }
+    results["answer_question"]["edits"] = sorted(edits)[len(edits) // 2]
+    return results
+
+def check(results: dict, tolerance: float) -> list:
+    """Names of handlers slower than baseline * (1 + tolerance)."""
+    with open(BASELINE_PATH) as f:
+        baseline = json.load(f)
+    return [
+        name for name, result in results.items()
+        if name in baseline and result["ns_per_op"] > baseline[name]["ns_per_op"] * (1 + tolerance)
+    ]
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--only", nargs="*", default=[], help="handler names to run")
+    parser.add_argument("-n", "--iterations", type=int, default=2000)
+    parser.add_argument("--save", action="store_true", help=f"write results to {os.path.basename(BASELINE_PATH)}")
+    parser.add_argument("--check", action="store_true", help="compare against the stored baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown for --check")
+    parser.add_argument("--logging", action="store_true", help="benchmark log calls instead of handlers")
+    parser.add_argument("--sink-latency", type=float, default=0.0002, help="seconds per log write for --logging")
+    parser.add_argument("--profile", action="store_true", help="compare PERF_PROFILE off and fast through polling")
+    parser.add_argument("--rate", type=float, default=200, help="offered updates/s for --profile latency")
+    parser.add_argument("--media", action="store_true", help="Bot API bytes per guide view with the file_id cache")
+    parser.add_argument("--proof-index", action="store_true", help="reused-proof hash lookup time by index size")
+    parser.add_argument("--gateway", action="store_true", help="pace a burst of Bot API calls through OutgoingGateway")
+    parser.add_argument("--llm", action="store_true", help="time LLMTriage against llm_stub, streamed and not")
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="llm_stub seconds before each answer")
+    parser.add_argument("--llm-chunk-delay", type=float, default=0.05, help="llm_stub seconds between words")
+    args = parser.parse_args()
+
+    if args.proof_index:
+        for size, result in bench_proof_index().items():
+            print(f"{size:>10,} hashes: {result['median_ms']:>8} ms per lookup, planted match found: {result['found']}")
+        return
+
+    if args.gateway:
+        result = asyncio.run(bench_gateway())
+        print(f"{result['calls']} calls in {result['seconds']}s, at most {result['busiest_second']} in any second")
+        for name, stat in result["classes"].items():
+            print(f"  {name:<10}{stat['calls']:>5} calls, {stat['waited']:>4} waited, "
+                  f"mean {stat['mean_wait_ms']:>8} ms, max {stat['max_wait_ms']:>8} ms")
+        return
+
+    if args.llm:
+        if bot.AsyncOpenAI is None:
+            sys.exit("--llm needs the openai package")
+        results = asyncio.run(bench_llm(min(args.iterations, 10), args.llm_latency, args.llm_chunk_delay))
+        print(f"llm_stub: {args.llm_latency:g}s before each answer, {args.llm_chunk_delay:g}s between words; medians")
+        print(f"{'request':<34}{'first text ms':>14}{'full answer ms':>16}{'edits':>8}")
+        for name, result in results.items():
+            print(f"{name:<34}{result['first_ms']:>14}{result['total_ms']:>16}{result.get('edits', ''):>8}")
+        return
+
+    if args.media:
+        logging.disable(logging.INFO)
+        views = asyncio.run(bench_media(min(args.iterations, 100)))
+        upload_bytes = views[0]["bytes"]
+        for i, view in enumerate(views):
+            if i in (0, 1) or view["uploads"]:
+                print(f"view {i + 1:>3}: {view['bytes']:>10,} bytes, {view['uploads']} file(s) uploaded")
+        total = sum(view["bytes"] for view in views)
+        print(f"{len(views)} views: {total:,} bytes with the file_id cache, "
+              f"~{upload_bytes * len(views):,} uploading every time ({upload_bytes * len(views) / total:.0f}x)")
+        return
+
+    if args.profile:
+        logging.disable(logging.INFO)
+        bot.EDIT_DELAY = bot.MENU_DELAY = 0
+        bot.GATEWAY_GLOBAL_RATE = 0
+        print(f"{'profile':<34}{'updates/s':>12}{f'p50 ms @{args.rate:g}/s':>16}{'p99 ms':>10}")
+        for name, result in bench_profile(args.iterations, args.rate).items():
+            print(f"{name:<34}{result['updates_per_second']:>12,}{result['p50_ms']:>16}{result['p99_ms']:>10}")
+        return
+
+    if args.logging:
+        for latency in (0.0, args.sink_latency):
+            print(f"Log sink write latency {latency * 1e6:.0f} µs:")
+            for name, ns in bench_logging(args.iterations, latency).items():
+                print(f"  {name:<32}{ns:>12,} ns/log call on the event loop")
+        return
+
+    logging.disable(logging.INFO)
+    bot.EDIT_DELAY = bot.MENU_DELAY = 0
+    results = asyncio.run(run(args.only, args.iterations))
+
+    print(f"{'handler':<34}{'ns/op':>12}{'peak B/op':>12}{'held blocks/op':>16}")
+    for name, result in results.items():
+        print(f"{name:<34}{result['ns_per_op']:>12,}{result['peak_bytes_per_op']:>12,}{result['held_blocks_per_op']:>16}")
+
+    if args.save:
+        with open(BASELINE_PATH, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"💾 Baseline saved to {BASELINE_PATH}")
+    if args.check:
+        slower = check(results, args.tolerance)
+        if slower:
+            print(f"❌ Slower than baseline by more than {args.tolerance:.0%}: {', '.join(slower)}")
+            sys.exit(1)
+        print("✅ No handler slower than baseline")
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,157 @@
 import logging
+import logging.handlers
 import os
 import asyncio
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardRemove
+import atexit
+import base64
+import contextlib
+import contextvars
+import datetime
+import functools
+import gzip
+import hashlib
+import heapq
+import hmac
+import io
+import itertools
+import json
+import queue
+import re
+import signal
+import sqlite3
+import sys
+import threading
+import time
+import traceback
+import tracemalloc
+import unicodedata
+import urllib.parse
+import weakref
+import zlib
+from collections import OrderedDict, deque
+from collections.abc import Mapping
+from dataclasses import dataclass
+from telegram import (
+    Update,
+    Chat,
+    ForceReply,
+    InlineKeyboardButton,
+    InlineKeyboardMarkup,
+    InputMediaDocument,
+    InputMediaPhoto,
+    InputMediaVideo,
+    MessageEntity,
+    ReplyKeyboardRemove,)
+from telegram.error import BadRequest, NetworkError, RetryAfter, TelegramError, TimedOut
 from telegram.ext import (
     Application,
+    BaseRateLimiter,
     CommandHandler,
     CallbackQueryHandler,
     ConversationHandler,
     ContextTypes,
+    ExtBot,
     MessageHandler,
+    PersistenceInput,
+    PicklePersistence,
+    TypeHandler,
     filters,)
+from telegram.request import HTTPXRequest
+import numpy as np
+
+try:
+    from openai import AsyncOpenAI
+except ImportError:  # free-text questions are disabled without the openai package
+    AsyncOpenAI = None
+
+# PERF_PROFILE=fast uses these when installed and falls back to asyncio and json otherwise
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+try:
+    from PIL import Image
+except ImportError:  # reused proof screenshots are not detected without Pillow
+    Image = None
 
 # Enable logging
-logging.basicConfig(
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO)
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "json")
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
+LOG_SAMPLE_EVERY = int(os.environ.get("LOG_SAMPLE_EVERY", "20"))
+# High-volume messages (by format template) of which only one in LOG_SAMPLE_EVERY is written
+LOG_SAMPLED_MESSAGES = {
+    "Failed to edit message: %s",
+    "Failed to edit message, might be same as old: %s",
+    "Failed to edit streamed message: %s",
+}
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line."""
+
+    def format(self, record):
+        entry = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S") + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if getattr(record, 'sampled', 1) > 1:
+            entry["sampled"] = record.sampled
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+JsonFormatter.converter = time.gmtime
+
+class SamplingFilter(logging.Filter):
+    """Keeps one record in `every` per sampled message template and notes how many it stands for."""
+
+    def __init__(self, templates, every: int):
+        super().__init__()
+        self.templates = templates
+        self.every = every
+        self._counts = {}
+
+    def filter(self, record):
+        if record.msg not in self.templates or self.every <= 1:
+            return True
+        count = self._counts.get(record.msg, 0) + 1
+        self._counts[record.msg] = count
+        if count % self.every != 1:
+            return False
+        record.sampled = self.every
+        return True
+
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    """Enqueues the record untouched: %-formatting happens in the listener thread, not on the event loop."""
+
+    def prepare(self, record):
+        return record
+
+def setup_logging() -> logging.handlers.QueueListener:
+    """Route all logging through a queue so writes to stderr never block the event loop."""
+    output = logging.StreamHandler(sys.stderr)
+    if LOG_FORMAT == "json":
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
+    log_queue = queue.SimpleQueue()
+    handler = LazyQueueHandler(log_queue)
+    handler.addFilter(SamplingFilter(LOG_SAMPLED_MESSAGES, LOG_SAMPLE_EVERY))
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(LOG_LEVEL)
+    listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
+log_listener = setup_logging()
 logger = logging.getLogger(__name__)
 
 # --- CONFIGURATION ---
@@ -29,9 +167,89 @@ if SUPPORT_CHAT_ID:
 print("=" * 50)
 
 HELPFUL_CHANNEL_LINK = "https://t.me/rejoinsnousetgagne"
+TICKET_DB_PATH = os.environ.get("TICKET_DB_PATH", "tickets.db")
+PERSISTENCE_PATH = os.environ.get("PERSISTENCE_PATH", "user_data.pickle")
+TICKET_WINDOW_SECONDS = int(os.environ.get("TICKET_WINDOW_SECONDS", "3600"))
+TICKET_MAX_PER_WINDOW = int(os.environ.get("TICKET_MAX_PER_WINDOW", "3"))
+
+# Free-text questions (the OpenAI client also reads OPENAI_BASE_URL, e.g. llm_stub.py)
+OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
+LLM_MODEL = os.environ.get("LLM_MODEL", "gpt-4o-mini")
+LLM_MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", "4"))
+LLM_CACHE_SIZE = int(os.environ.get("LLM_CACHE_SIZE", "1024"))
+LLM_CACHE_TTL = int(os.environ.get("LLM_CACHE_TTL", "86400"))
+LLM_ENABLED = bool(OPENAI_API_KEY and AsyncOpenAI)
+EDIT_DELAY = float(os.environ.get("EDIT_DELAY", "0.5"))
+MENU_DELAY = float(os.environ.get("MENU_DELAY", "0.3"))
+RECORD_UPDATES_DIR = os.environ.get("RECORD_UPDATES_DIR")
+# JSON list of bots to run in this process (see load_tenants); unset runs the single bot above
+BOTS_CONFIG = os.environ.get("BOTS_CONFIG")
+HTTP_POOL_SIZE = int(os.environ.get("HTTP_POOL_SIZE", "256"))
+BOT_API_BASE_URL = os.environ.get("BOT_API_BASE_URL", "https://api.telegram.org/bot")
+# "fast": uvloop event loop (uvloop 0.18+) and orjson for Bot API responses, where installed
+PERF_PROFILE = os.environ.get("PERF_PROFILE", "default")
+FAST_JSON = PERF_PROFILE == "fast" and orjson is not None
+# On SIGTERM, handlers get DRAIN_SECONDS to finish; updates left over are spooled and handled on restart
+DRAIN_SECONDS = float(os.environ.get("DRAIN_SECONDS", "8"))
+SPOOL_PATH = os.environ.get("SPOOL_PATH", "spool.jsonl.gz")
+# Local health endpoint (see HealthMonitor); unset HEALTH_PORT disables it
+HEALTH_PORT = int(os.environ.get("HEALTH_PORT", "0"))
+HEALTH_HOST = os.environ.get("HEALTH_HOST", "127.0.0.1")
+HEALTH_PROBE_INTERVAL = float(os.environ.get("HEALTH_PROBE_INTERVAL", "0.5"))
+HEALTH_MAX_LAG = float(os.environ.get("HEALTH_MAX_LAG", "2.0"))
+HEALTH_STALL_SECONDS = float(os.environ.get("HEALTH_STALL_SECONDS", "120"))
+# Flag loop steps longer than this many ms and name the handler (see SlowCallbackWatchdog); 0 disables
+SLOW_CALLBACK_MS = float(os.environ.get("SLOW_CALLBACK_MS", "0"))
+# Guide screenshots and videos: MEDIA_DIR/<guide>/<lang>/ or MEDIA_DIR/<guide>/ for every language
+MEDIA_DIR = os.environ.get("MEDIA_DIR", "media")
+# One <code>.json per language; a pack is offered as soon as its file is there
+LANG_DIR = os.environ.get("LANG_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "lang"))
+# Proof screenshots are forwarded to the support group this long after the last one arrives
+PROOF_FLUSH_SECONDS = float(os.environ.get("PROOF_FLUSH_SECONDS", "5"))
+# Proof images whose 64-bit perceptual hashes differ in at most this many bits are flagged as reused
+PROOF_HASH_MAX_DISTANCE = int(os.environ.get("PROOF_HASH_MAX_DISTANCE", "4"))
+# Seconds between edits of ticket messages in the support group (Telegram allows ~20 messages a minute there)
+TICKET_EDIT_INTERVAL = float(os.environ.get("TICKET_EDIT_INTERVAL", "3"))
+# Set the same secret on every replica to keep conversations in signed callback_data instead of user_data
+STATELESS_SECRET = os.environ.get("STATELESS_SECRET")
+# Outgoing Bot API calls (see OutgoingGateway): a second in all, a second per private chat, a minute per group;
+# GATEWAY_GLOBAL_RATE=0 sends every call straight away
+GATEWAY_GLOBAL_RATE = float(os.environ.get("GATEWAY_GLOBAL_RATE", "30"))
+GATEWAY_PRIVATE_RATE = float(os.environ.get("GATEWAY_PRIVATE_RATE", "1"))
+GATEWAY_GROUP_PER_MINUTE = float(os.environ.get("GATEWAY_GROUP_PER_MINUTE", "20"))
+# Calls one chat may make back to back before its rate applies
+GATEWAY_CHAT_BURST = int(os.environ.get("GATEWAY_CHAT_BURST", "3"))
+# safe_edit_message retries an edit this many times after a 429 or a network error, waiting at most
+# EDIT_MAX_RETRY_WAIT seconds before each retry
+EDIT_RETRIES = int(os.environ.get("EDIT_RETRIES", "2"))
+EDIT_MAX_RETRY_WAIT = float(os.environ.get("EDIT_MAX_RETRY_WAIT", "10"))
+# After this many such failures in a row, edits are not retried and no new message is sent in their place
+# for EDIT_BREAKER_COOLDOWN seconds (see EditBreaker); 0 disables
+EDIT_BREAKER_THRESHOLD = int(os.environ.get("EDIT_BREAKER_THRESHOLD", "5"))
+EDIT_BREAKER_COOLDOWN = float(os.environ.get("EDIT_BREAKER_COOLDOWN", "30"))
+# Conversation traces (see ConversationTracer) as OTLP/JSON lines; unset disables
+TRACE_FILE = os.environ.get("TRACE_FILE")
+RECORD_SEGMENT_BYTES = int(os.environ.get("RECORD_SEGMENT_BYTES", str(8 * 1024 * 1024)))
+STREAM_EDIT_INTERVAL = float(os.environ.get("STREAM_EDIT_INTERVAL", "1.0"))
+FAQ_DIM = int(os.environ.get("FAQ_DIM", "256"))
+FAQ_MIN_SCORE = float(os.environ.get("FAQ_MIN_SCORE", "0.4"))
 
 # Define states
-SELECT_LANG, MAIN_MENU, EXISTING_PLAYER_FLOW, NEW_PLAYER_FLOW, SUPPORT_FLOW, USERNAME_COLLECTION = range(6)
+SELECT_LANG, MAIN_MENU, EXISTING_PLAYER_FLOW, NEW_PLAYER_FLOW, SUPPORT_FLOW, USERNAME_COLLECTION, ASK_QUESTION, PROOF_INTAKE = range(8)
+
+# Deep links (t.me/<bot>?start=<payload>): payload -> (callback_data, state the button is pressed in).
+# Question N of a flow is the screen shown after answering "Yes" to question N-1.
+DEEP_LINKS = {
+    'new': ("new_player_start", MAIN_MENU),
+    'existing': ("existing_player_start", MAIN_MENU),
+    'support': ("contact_support", MAIN_MENU),
+    'guide': ("helpful_channel", MAIN_MENU),
+    'ask': ("ask_question", MAIN_MENU),
+    'support_q13': ("support_q13", SUPPORT_FLOW),
+}
+DEEP_LINKS.update({f"new_q{n}": (f"new_q{n - 1}_yes", NEW_PLAYER_FLOW) for n in range(2, 13)})
+DEEP_LINKS.update({f"existing_q{n}": (f"existing_q{n - 1}_yes", EXISTING_PLAYER_FLOW) for n in range(2, 7)})
+DEEP_LINKS.update({f"support_q{n}": (f"support_q{n - 1}_yes", SUPPORT_FLOW) for n in range(2, 13)})
 
 # Codes for the game
 GAME_CODES = [
@@ -42,243 +260,1748 @@ GAME_CODES = [
     "4828-9033-2281"]
 
 # --- LANGUAGE STRINGS ---
-STRINGS = {
-    'en': {
-        'disclaimer': "**Disclaimer:** This bot is an unofficial guide and is not affiliated with Epic Games or Fortnite. We will *never* ask for your password.",
-        'lang_prompt': "Please select your language:",
-        'welcome': "Welcome! You're diving into an immersive gaming adventure. This bot will help you set up your account, join the game, and start playing.",
-        'new_player_btn': "New player",
-        'existing_player_btn': "Existing player",
-        'helpful_channel_btn': "Full guide in channel",
-        'support_btn': "Support",
-        'lang_btn': "🌐 Change Language",
-        'helpful_channel_text': "Join our helpful Telegram channel for the full guide, news, and community chat!",
-        'join_channel_btn': "Join Channel Now",
-        'back_btn': "⬅️ Back to Main Menu",
-        'support_q1': "Have you already read the 'New player' guide and the 'Full guide in channel'?",
-        'yes_btn': "Yes, I still have a question",
-        'no_btn': "No, I will check them now",
-        'support_q1_no': "Please review those guides first. They answer most questions! 🙏\n\nReturning you to the main menu.",
-        'support_q2': "Okay. By providing your @username, you consent to our support team contacting you directly on Telegram. We will *only* use this to help with your question.\n\nPlease type your @username (like @myusername) to proceed.\n\nType /cancel to go back.",
-        'support_thanks': "Thank you! Your @username has been noted. We will get in touch with you as soon as possible.\n\nReturning you to the main menu.",
-        'support_cancel': "Support request cancelled. Returning to main menu.",
-        'invalid_username': "That doesn't look like a valid @username. Please start with '@' and try again, or type /cancel.",
-        'username_prompt': "Okay. By providing your @username, you consent to our support team contacting you directly on Telegram. We will *only* use this to help with your question.\n\nPlease type your @username (like @myusername) to proceed.\n\nType /cancel to go back.",
-        
-        # Support flow
-        'support_flow_title': "Support",
-        'support_flow_intro': "In order to get in touch with us, you need to answer these questions so we can determine which stage of the process you're at. If everything has been done correctly, you'll be able to claim your reward 💰💰",
-        'support_q1_text': "1 Did you use a VPN?",
-        'support_q2_text': "2 - Did you already create a cloud gaming profile?",
-        'support_q3_text': "3 - Did you receive the code from epic games to activate your cloud gaming account?",
-        'support_q4_text': "4 Did you create your epic games profile?",
-        'support_q5_text': "5 Did you create a shortcut of the cloud gaming to play it like an installed app directly from your Homescreen?",
-        'support_q6_text': "6 Have you launched the game?",
-        'support_q7_text': "7 Have you searched and found the reward Island?",
-        'support_q8_text': "8 Did you follow the full setup to be able to play with friends and earn a lot together without any worries?",
-        'support_q9_text': "9 Did you start the game and play 130 hours for free this week?",
-        'support_q10_text': "10 Did you click on the like button every single time before your 1 hour play session ended during your 130 hours of play this week?",
-        'support_q11_text': "11 Have you saved the reward Island to your favorites?",
-        'support_q12_text': "12 Were you introduced to this game by an influencer?",
-        'support_q13_text': "13 Make sure you completed every single step before sending us your @, did you completed every single step and play at least 130 hours this week?",
-        
-        # Common responses
-        'vpn_reminder': "Please download and use a VPN in USA before going any further to create all your authentic profiles but to play you don't use it.\n\nDid you finally use a VPN?",
-        'cloud_gaming_reminder': "Please create a cloud gaming profile. Do you want our assistance?",
-        'epic_code_reminder': "Please you have to receive the code, do you want our guidance to help you with that?",
-        'epic_profile_reminder': "No please you have to create your epic games profile, do you want our guidance?",
-        'shortcut_reminder': "No. You have to create a shortcut to play fortnite from your homescreen, do you want our guidance with that?",
-        'launch_game_reminder': "No you have to launch the game, do you need our guidance?",
-        'reward_island_reminder': "No, you have to search the reward Island in the search bar and just choose it , do you want our guidance for that?",
-        'full_setup_reminder': "No, you have to follow the exact setup , do you need our guidance?",
-        'play_hours_reminder': "No, you have to start the game and play every single day for free before aiming for the reward, are you able to play at least 130 hours a week?",
-        'like_button_reminder': "No, You have to click on the like button every single time before your 1 hour play session ended during your 130 hours a week , do you want our guidance on that?",
-        'favorites_reminder': "No , you have to save the reward Island to your favorites and play , do you want our guidance on that?",
-        'expert_review_text': "One of the expert will review all the screenshots of the game and you will earn",
-        
-        # Button texts
-        'a_yes': "A Yes",
-        'b_no': "B No",
-        'a_if_yes': "A If yes",
-        'b_if_no': "B If no",
-        'yes_i_received': "A Yes I received the code , I want the next step",
-        'yes_im_ready': "A Yes, I'm ready for the next step",
-        'yes_i_did': "A Yes , I did it and I will send you all the necessary screenshots",
-        'want_codes': "Yes I want the best codes to play",
-        'already_chose': "No , I already choosed one code",
-        'want_assistance': "Yes",
-        'already_have': "No I already have one, I want the next step",
-        'finally_fixed': "No I finally fix everything, I want to move to the next step",
-        'will_play': "No, I will play and let you know in the support session later on",
-        'have_proof': "No , I have proof I saved the reward Island to my favorites and I actually play on it",
-        'have_proof_played': "No, I have proof that I played 130 hours this week and I liked every single time , and I am wishing to share it with you guys",
-        'see_channel': "yes I want to see it in the channel",
-        'completed': "Completed",
-        'next_question': "Next Question",
-        'join_channel_only': "Join Channel",
-        
-        # Navigation
-        'back_to_previous': "⬅️ Back",
-        'back_to_support': "⬅️ Back to Support",
-        'back_to_existing': "⬅️ Back to Existing Player", 
-        'back_to_new': "⬅️ Back to New Player",
-        'main_menu': "🏠 Main Menu",
-        
-        # Influencer question
-        'provide_name': "Provide the name please:",
-        
-        # Existing player flow
-        'existing_player_intro': "Because you are playing on the cloud, your session will last for 1 hour. The game will close, and you will have to launch it again to keep playing.\nYou probably know it cause you already follow all the instructions\n\n1 Have you searched and found the reward Island?",
-        'existing_q2_text': "2 Did you follow the full setup to be able to play with friends and earn a lot together without any worries?",
-        'existing_q3_text': "3 Did you start the game and play 130 hours for free this week?",
-        'existing_q4_text': "4 With your existing account ,  will you click on the like button every single time before your 1 hour play session ended during your 130 hours of play this week?",
-        'existing_q5_text': "5 Did you save the reward Island to your favorites?",
-        'existing_q6_text': "6 Were you introduced to this game by an influencer?",
-        
-        # New player flow
-        'new_player_intro': "New player:\n\nYou're diving into an immersive gaming adventure.This bot will help you set up your account, join the game, start playing and earning\nBecause you are playing on the cloud, your session will last for 1 hour. The game will close, and you will have to launch it again to keep playing.\n\n1 Did you use a VPN?",
-        'new_q2_text': "2 - Did you already create a cloud gaming profile?",
-        'new_q3_text': "3 - Did you receive the code from epic games to activate your cloud gaming account?",
-        'new_q4_text': "4 Did you create your epic games profile?",
-        'new_q5_text': "5 Did you create a shortcut of the cloud gaming to play it like an installed app directly from your Homescreen?",
-        'new_q6_text': "6 Have you launched the game?",
-        'new_q7_text': "7 Have you searched and found the reward Island?",
-        'new_q8_text': "8 Did you follow the full setup to be able to play with friends and earn a lot together without any worries?",
-        'new_q9_text': "9 Will you start the game and play 130 hours for free this week?",
-        'new_q10_text': "10 With your new account , will you click on the like button every single time before your 1 hour play session ended during your 130 hours of play this week?",
-        'new_q11_text': "11 Will you save the reward Island to your favorites?",
-        'new_q12_text': "12 Were you introduced to this game by an influencer?",
-        
-        # Links and guidance
-        'cloud_gaming_link': "Here's the link to create your cloud gaming profile:\nhttps://www.xbox.com/fr-FR/play/games/fortnite/BT5P2X999VH2",
-        'epic_activate_link': "Here's the activation link:\nhttp://epicgames.com/activate",
-        'epic_create_link': "Create your Epic Games profile here:\nepicgames.com",
-        'launch_game_link': "Launch the game here:\nhttps://www.xbox.com/fr-FR/play/games/fortnite/BT5P2X999VH2",
-        'channel_guidance': "Please check our channel for guidance:",
-        'channel_instruction_9': "Please check our channel and look for instruction 9:",
-        'channel_instruction_10': "Please check our channel and look for instruction 10:",
-        'channel_instruction_11': "Please check our channel and look for instruction 11:",
-        'channel_instruction_12': "Please check our channel and look for instruction 12:",
-        'channel_instruction_13': "Please check our channel and look for instruction 13:",
-    },
-    'fr': {
-        'disclaimer': "**Avertissement :** Ce bot est un guide non officiel et n'est pas affilié à Epic Games ou Fortnite. Nous ne vous demanderons *jamais* votre mot de passe.",
-        'lang_prompt': "Veuillez sélectionner votre langue :",
-        'welcome': "Bienvenue ! Tu plonges dans une aventure de jeu immersive. Ce bot t'aidera à configurer ton compte, à rejoindre la partie et à commencer à jouer.",
-        'new_player_btn': "Nouveau joueur",
-        'existing_player_btn': "Joueur existant",
-        'helpful_channel_btn': "Guide complet sur le canal",
-        'support_btn': "Support",
-        'lang_btn': "🌐 Changer de Langue",
-        'helpful_channel_text': "Rejoignez notre canal Telegram pour le guide complet, les actualités et pour discuter avec la communauté !",
-        'join_channel_btn': "Rejoindre le Canal",
-        'back_btn': "⬅️ Retour au Menu Principal",
-        'support_q1': "Avez-vous déjà lu le guide 'Nouveau joueur' et le 'Guide complet sur le canal' ?",
-        'yes_btn': "Oui, j'ai encore une question",
-        'no_btn': "Non, je vais les voir maintenant",
-        'support_q1_no': "Veuillez d'abord consulter ces guides. Ils répondent à la plupart des questions ! 🙏\n\nRetour au menu principal.",
-        'support_q2': "D'accord. En fournissant votre @nomdutilisateur, vous acceptez que notre équipe d'assistance vous contacte directement sur Telegram. Nous l'utiliserons *uniquement* pour répondre à votre question.\n\nVeuillez taper votre @nomdutilisateur (comme @monpseudo) pour continuer.\n\nTapez /cancel pour revenir.",
-        'support_thanks': "Merci ! Votre @nomdutilisateur a été noté. Nous vous contacterons dès que possible.\n\nRetour au menu principal.",
-        'support_cancel': "Demande d'aide annulée. Retour au menu principal.",
-        'invalid_username': "Cela ne ressemble pas à un @nomdutilisateur valide. Veuillez commencer par '@' et réessayer, ou tapez /cancel.",
-        'username_prompt': "D'accord. En fournissant votre @nomdutilisateur, vous acceptez que notre équipe d'assistance vous contacte directement sur Telegram. Nous l'utiliserons *uniquement* pour répondre à votre question.\n\nVeuillez taper votre @nomdutilisateur (comme @monpseudo) pour continuer.\n\nTapez /cancel pour revenir.",
-        
-        # Support flow - French
-        'support_flow_title': "Support",
-        'support_flow_intro': "Afin de nous contacter, vous devez répondre à ces questions afin que nous puissions déterminer à quelle étape du processus vous vous trouvez. Si tout a été fait correctement, vous pourrez réclamer votre récompense 💰💰",
-        'support_q1_text': "1 Avez-vous utilisé un VPN ?",
-        'support_q2_text': "2 - Avez-vous déjà créé un profil de cloud gaming ?",
-        'support_q3_text': "3 - Avez-vous reçu le code d'Epic Games pour activer votre compte de cloud gaming ?",
-        'support_q4_text': "4 Avez-vous créé votre profil Epic Games ?",
-        'support_q5_text': "5 Avez-vous créé un raccourci du cloud gaming pour jouer comme une application installée directement depuis votre écran d'accueil ?",
-        'support_q6_text': "6 Avez-vous lancé le jeu ?",
-        'support_q7_text': "7 Avez-vous recherché et trouvé l'île de récompense ?",
-        'support_q8_text': "8 Avez-vous suivi la configuration complète pour pouvoir jouer avec des amis et gagner beaucoup ensemble sans aucun souci ?",
-        'support_q9_text': "9 Avez-vous commencé le jeu et joué 130 heures gratuitement cette semaine ?",
-        'support_q10_text': "10 Avez-vous cliqué sur le bouton like à chaque fois avant que votre session de jeu d'1 heure ne se termine pendant vos 130 heures de jeu cette semaine ?",
-        'support_q11_text': "11 Avez-vous enregistré l'île de récompense dans vos favoris ?",
-        'support_q12_text': "12 Avez-vous été présenté à ce jeu par un influenceur ?",
-        'support_q13_text': "13 Assurez-vous d'avoir terminé chaque étape avant de nous envoyer votre @, avez-vous terminé chaque étape et joué au moins 130 heures cette semaine ?",
-        
-        # Common responses - French
-        'vpn_reminder': "Veuillez télécharger et utiliser un VPN aux USA avant d'aller plus loin pour créer tous vos profils authentiques mais pour jouer vous ne l'utilisez pas.\n\nAvez-vous finalement utilisé un VPN ?",
-        'cloud_gaming_reminder': "Veuillez créer un profil de cloud gaming. Voulez-vous notre assistance ?",
-        'epic_code_reminder': "Veuillez, vous devez recevoir le code, voulez-vous notre aide pour cela ?",
-        'epic_profile_reminder': "Non, veuillez, vous devez créer votre profil Epic Games, voulez-vous notre aide ?",
-        'shortcut_reminder': "Non. Vous devez créer un raccourci pour jouer à Fortnite depuis votre écran d'accueil, voulez-vous notre aide pour cela ?",
-        'launch_game_reminder': "Non, vous devez lancer le jeu, avez-vous besoin de notre aide ?",
-        'reward_island_reminder': "Non, vous devez rechercher l'île de récompense dans la barre de recherche et la choisir, voulez-vous notre aide pour cela ?",
-        'full_setup_reminder': "Non, vous devez suivre la configuration exacte, avez-vous besoin de notre aide ?",
-        'play_hours_reminder': "Non, vous devez commencer le jeu et jouer chaque jour gratuitement avant de viser la récompense, êtes-vous capable de jouer au moins 130 heures par semaine ?",
-        'like_button_reminder': "Non, vous devez cliquer sur le bouton like à chaque fois avant que votre session de jeu d'1 heure ne se termine pendant vos 130 heures par semaine, voulez-vous notre aide pour cela ?",
-        'favorites_reminder': "Non, vous devez enregistrer l'île de récompense dans vos favoris et jouer, voulez-vous notre aide pour cela ?",
-        'expert_review_text': "Un expert examinera toutes les captures d'écran du jeu et vous gagnerez",
-        
-        # Button texts - French
-        'a_yes': "A Oui",
-        'b_no': "B Non",
-        'a_if_yes': "A Si oui",
-        'b_if_no': "B Si non",
-        'yes_i_received': "A Oui j'ai reçu le code, je veux l'étape suivante",
-        'yes_im_ready': "A Oui, je suis prêt pour l'étape suivante",
-        'yes_i_did': "A Oui, je l'ai fait et je vous enverrai toutes les captures d'écran nécessaires",
-        'want_codes': "Oui je veux les meilleurs codes pour jouer",
-        'already_chose': "Non, j'ai déjà choisi un code",
-        'want_assistance': "Oui",
-        'already_have': "Non j'en ai déjà un, je veux l'étape suivante",
-        'finally_fixed': "Non j'ai finalement tout réparé, je veux passer à l'étape suivante",
-        'will_play': "Non, je vais jouer et vous tiens au courant lors de la session de support",
-        'have_proof': "Non, j'ai la preuve que je l'ai sauvegardé et que j'y joue réellement",
-        'have_proof_played': "Non, j'ai la preuve que j'ai joué 130 heures cette semaine et que j'ai aimé à chaque fois, et je souhaite le partager avec vous",
-        'see_channel': "oui je veux le voir dans le canal",
-        'completed': "Terminé",
-        'next_question': "Question Suivante",
-        'join_channel_only': "Rejoindre le Canal",
-        
-        # Navigation - French
-        'back_to_previous': "⬅️ Retour",
-        'back_to_support': "⬅️ Retour au Support",
-        'back_to_existing': "⬅️ Retour au Joueur Existant", 
-        'back_to_new': "⬅️ Retour au Nouveau Joueur",
-        'main_menu': "🏠 Menu Principal",
-        
-        # Influencer question - French
-        'provide_name': "Fournissez le nom s'il vous plaît :",
-        
-        # Existing player flow - French
-        'existing_player_intro': "Parce que vous jouez sur le cloud, votre session durera 1 heure. Le jeu se fermera et vous devrez le relancer pour continuer à jouer.\nVous le savez probablement car vous suivez déjà toutes les instructions\n\n1 Avez-vous recherché et trouvé l'île de récompense ?",
-        'existing_q2_text': "2 Avez-vous suivi la configuration complète pour pouvoir jouer avec des amis et gagner beaucoup ensemble sans aucun souci ?",
-        'existing_q3_text': "3 Avez-vous commencé le jeu et joué 130 heures gratuitement cette semaine ?",
-        'existing_q4_text': "4 Avec votre compte existant, cliquerez-vous sur le bouton like à chaque fois avant que votre session de jeu d'1 heure ne se termine pendant vos 130 heures de jeu cette semaine ?",
-        'existing_q5_text': "5 Avez-vous enregistré l'île de récompense dans vos favoris ?",
-        'existing_q6_text': "6 Avez-vous été présenté à ce jeu par un influenceur ?",
-        
-        # New player flow - French
-        'new_player_intro': "Nouveau joueur :\n\nVous plongez dans une aventure de jeu immersive. Ce bot vous aidera à configurer votre compte, à rejoindre le jeu, à commencer à jouer et à gagner.\nParce que vous jouez sur le cloud, votre session durera 1 heure. Le jeu se fermera et vous devrez le relancer pour continuer à jouer.\n\n1 Avez-vous utilisé un VPN ?",
-        'new_q2_text': "2 - Avez-vous déjà créé un profil de cloud gaming ?",
-        'new_q3_text': "3 - Avez-vous reçu le code d'Epic Games pour activer votre compte de cloud gaming ?",
-        'new_q4_text': "4 Avez-vous créé votre profil Epic Games ?",
-        'new_q5_text': "5 Avez-vous créé un raccourci du cloud gaming pour jouer comme une application installée directement depuis votre écran d'accueil ?",
-        'new_q6_text': "6 Avez-vous lancé le jeu ?",
-        'new_q7_text': "7 Avez-vous recherché et trouvé l'île de récompense ?",
-        'new_q8_text': "8 Avez-vous suivi la configuration complète pour pouvoir jouer avec des amis et gagner beaucoup ensemble sans aucun souci ?",
-        'new_q9_text': "9 Allez-vous commencer le jeu et jouer 130 heures gratuitement cette semaine ?",
-        'new_q10_text': "10 Avec votre nouveau compte, cliquerez-vous sur le bouton like à chaque fois avant que votre session de jeu d'1 heure ne se termine pendant vos 130 heures de jeu cette semaine ?",
-        'new_q11_text': "11 Allez-vous enregistrer l'île de récompense dans vos favoris ?",
-        'new_q12_text': "12 Avez-vous été présenté à ce jeu par un influenceur ?",
-        
-        # Links and guidance - French
-        'cloud_gaming_link': "Voici le lien pour créer votre profil de cloud gaming :\nhttps://www.xbox.com/fr-FR/play/games/fortnite/BT5P2X999VH2",
-        'epic_activate_link': "Voici le lien d'activation :\nhttp://epicgames.com/activate",
-        'epic_create_link': "Créez votre profil Epic Games ici :\nepicgames.com",
-        'launch_game_link': "Lancez le jeu ici :\nhttps://www.xbox.com/fr-FR/play/games/fortnite/BT5P2X999VH2",
-        'channel_guidance': "Veuillez consulter notre canal pour obtenir des conseils :",
-        'channel_instruction_9': "Veuillez consulter notre canal et chercher l'instruction 9 :",
-        'channel_instruction_10': "Veuillez consulter notre canal et chercher l'instruction 10 :",
-        'channel_instruction_11': "Veuillez consulter notre canal et chercher l'instruction 11 :",
-        'channel_instruction_12': "Veuillez consulter notre canal et chercher l'instruction 12 :",
-        'channel_instruction_13': "Veuillez consulter notre canal et chercher l'instruction 13 :",
-    }}
+class LanguagePacks(Mapping):
+    """Language packs read from LANG_DIR/<code>.json, each loaded on first use.
+
+    At startup only each pack's name and language prompt are kept, for the
+    language picker. The rest of a pack is read the first time a user of
+    that language needs it; keys the pack lacks fall back to English.
+    """
+
+    def __init__(self, root: str, default: str = 'en'):
+        self.root = root
+        self.default = default
+        self.names = {}    # code -> name shown on the picker button
+        self.prompts = {}  # code -> "Please select your language:" in that language
+        self._packs = {}   # code -> strings, for the packs loaded so far
+        for filename in sorted(os.listdir(root)):
+            code, ext = os.path.splitext(filename)
+            if ext != '.json':
+                continue
+            pack = self._read(code)
+            self.names[code] = pack.get('lang_name', code)
+            self.prompts[code] = pack.get('lang_prompt', "")
+        if default not in self.names:
+            raise RuntimeError(f"No {default}.json language pack in {root}")
+        self._codes = [default] + sorted(code for code in self.names if code != default)
+
+    def _read(self, code: str) -> dict:
+        with open(os.path.join(self.root, f"{code}.json"), encoding='utf-8') as f:
+            return json.load(f)
+
+    @property
+    def loaded(self) -> list:
+        return list(self._packs)
+
+    def __getitem__(self, code: str) -> dict:
+        pack = self._packs.get(code)
+        if pack is None:
+            if code not in self.names:
+                raise KeyError(code)
+            pack = self._read(code)
+            if code != self.default:
+                base = self[self.default]
+                missing = base.keys() - pack.keys()
+                if missing:
+                    logger.warning("Language pack %s lacks %d strings, using English for: %s",
+                                   code, len(missing), ", ".join(sorted(missing)))
+                pack = {**base, **pack}
+            self._packs[code] = pack
+            logger.info("Loaded language pack %s", code)
+        return pack
+
+    def __contains__(self, code) -> bool:
+        return code in self.names
+
+    def __iter__(self):
+        return iter(self._codes)
+
+    def __len__(self) -> int:
+        return len(self._codes)
+
+STRINGS = LanguagePacks(LANG_DIR)
+
+# --- TENANTS ---
+@dataclass(frozen=True)
+class Tenant:
+    """One bot served by this process.
+
+    STRINGS and the HTTP connection pool are shared by every tenant; the
+    token, support group, channel, codes and on-disk state are per tenant.
+    """
+
+    name: str
+    token: str
+    support_chat_id: str = None
+    helpful_channel_link: str = HELPFUL_CHANNEL_LINK
+    game_codes: tuple = tuple(GAME_CODES)
+    ticket_db_path: str = TICKET_DB_PATH
+    persistence_path: str = PERSISTENCE_PATH
+    record_dir: str = RECORD_UPDATES_DIR
+    spool_path: str = SPOOL_PATH
+    base_url: str = BOT_API_BASE_URL
+    trace_path: str = TRACE_FILE
+
+DEFAULT_TENANT = Tenant(name="default", token=TELEGRAM_TOKEN, support_chat_id=SUPPORT_CHAT_ID)
+
+def load_tenants(path: str = BOTS_CONFIG) -> list:
+    """Tenants listed in the BOTS_CONFIG file, or the single bot configured by environment variables.
+
+    The file is a JSON list of objects with Tenant's fields; `token_env` may
+    name an environment variable instead of putting `token` in the file.
+    File paths default to per-tenant names so tenants never share state.
+    """
+    if not path:
+        return [DEFAULT_TENANT]
+    with open(path, encoding='utf-8') as f:
+        entries = json.load(f)
+
+    tenants = []
+    for entry in entries:
+        name = entry['name']
+        fields = {
+            'ticket_db_path': f"{name}-tickets.db",
+            'persistence_path': f"{name}-user_data.pickle",
+            'spool_path': f"{name}-spool.jsonl.gz",
+            'record_dir': os.path.join(RECORD_UPDATES_DIR, name) if RECORD_UPDATES_DIR else None,
+            'trace_path': (os.path.join(os.path.dirname(TRACE_FILE), f"{name}-{os.path.basename(TRACE_FILE)}")
+                           if TRACE_FILE else None),
+            **entry,
+        }
+        if 'token_env' in fields:
+            fields['token'] = os.environ.get(fields.pop('token_env'))
+        if fields.get('support_chat_id') is not None:
+            fields['support_chat_id'] = str(fields['support_chat_id'])
+        if 'game_codes' in fields:
+            fields['game_codes'] = tuple(fields['game_codes'])
+        tenants.append(Tenant(**fields))
+
+    names = [tenant.name for tenant in tenants]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Tenant names in {path} must be unique: {names}")
+    return tenants
+
+def get_tenant(context: ContextTypes.DEFAULT_TYPE) -> Tenant:
+    """Return the tenant the current update was received by."""
+    return context.bot_data.get('tenant', DEFAULT_TENANT)
+
+class SharedHTTPXRequest(HTTPXRequest):
+    """HTTPXRequest whose httpx client is shared by every tenant in the process.
+
+    All bots talk to the same Bot API host, so one pool of keep-alive
+    connections serves them all. The client is closed when the last request
+    object using it shuts down. Responses are decoded with orjson under
+    PERF_PROFILE=fast; python-telegram-bot has no hook for encoding requests.
+    """
+
+    _shared_client = None
+    _users = 0
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._in_use = False
+
+    def _build_client(self):
+        cls = SharedHTTPXRequest
+        if cls._shared_client is None or cls._shared_client.is_closed:
+            cls._shared_client = super()._build_client()
+        return cls._shared_client
+
+    async def initialize(self) -> None:
+        if self._in_use:
+            return
+        self._in_use = True
+        SharedHTTPXRequest._users += 1
+        if self._client.is_closed:
+            self._client = self._build_client()
+
+    @staticmethod
+    def parse_json_payload(payload: bytes) -> dict:
+        if FAST_JSON:
+            try:
+                return orjson.loads(payload)
+            except orjson.JSONDecodeError:
+                pass  # e.g. invalid UTF-8: let the lenient stdlib path decode it or raise Telegram's error
+        return HTTPXRequest.parse_json_payload(payload)
+
+    async def shutdown(self) -> None:
+        if not self._in_use:
+            return
+        self._in_use = False
+        SharedHTTPXRequest._users -= 1
+        if SharedHTTPXRequest._users == 0 and not self._client.is_closed:
+            await self._client.aclose()
+
+_openai_client = None
+
+def shared_openai_client():
+    """Return the OpenAI client used by every tenant's LLM triage."""
+    global _openai_client
+    if _openai_client is None:
+        _openai_client = AsyncOpenAI()
+    return _openai_client
+
+# --- OUTGOING GATEWAY ---
+class TokenBucket:
+    """`rate` tokens a second, up to `capacity` of them saved up."""
+
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def wait(self, now: float) -> float:
+        """Seconds until a token is available (0 if one is)."""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+class OutgoingGateway(BaseRateLimiter):
+    """Every Bot API call of a tenant's bot passes here, within Telegram's limits.
+
+    Token buckets allow GATEWAY_GLOBAL_RATE calls a second in all,
+    GATEWAY_PRIVATE_RATE a second per private chat and GATEWAY_GROUP_PER_MINUTE
+    a minute per group. Calls that have to wait are let through by class:
+    callback answers, then ticket delivery to the support group, then other
+    messages, then edits; oldest first within a class. A call waiting on a
+    busy chat does not hold up calls to other chats. A 429 pauses every call
+    for its retry_after before it is raised to the caller.
+    """
+
+    CLASSES = ('answer', 'delivery', 'message', 'edit')
+    MAX_CHAT_BUCKETS = 10_000
+
+    def __init__(self, support_chat_id=None, global_rate: float = GATEWAY_GLOBAL_RATE,
+                 private_rate: float = GATEWAY_PRIVATE_RATE, group_per_minute: float = GATEWAY_GROUP_PER_MINUTE,
+                 chat_burst: int = GATEWAY_CHAT_BURST):
+        self.support_chat_id = str(support_chat_id) if support_chat_id else None
+        # A tenth of a second of saved-up calls, so no one-second window sees much more than the rate
+        self.global_bucket = TokenBucket(global_rate, max(1.0, global_rate / 10))
+        self.private_rate = private_rate
+        self.group_rate = group_per_minute / 60
+        self.chat_burst = chat_burst
+        self.chat_buckets = OrderedDict()  # chat ID -> TokenBucket, least recently used first
+        self.queues = {name: deque() for name in self.CLASSES}  # (chat ID, future, enqueued at)
+        self.paused_until = 0.0
+        self.retry_after_count = 0
+        self.stats = {name: {"calls": 0, "waited": 0, "wait_seconds": 0.0, "max_wait_seconds": 0.0}
+                      for name in self.CLASSES}
+        self._wakeup = None
+        self._dispatcher = None
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        if self._dispatcher:
+            self._dispatcher.cancel()
+            self._dispatcher = None
+        for pending in self.queues.values():
+            for _, future, _ in pending:
+                future.cancel()
+            pending.clear()
+
+    def classify(self, endpoint: str, data: dict) -> str:
+        if endpoint == 'answerCallbackQuery':
+            return 'answer'
+        if endpoint.startswith('edit'):
+            return 'edit'
+        if self.support_chat_id is not None and str(data.get('chat_id')) == self.support_chat_id:
+            return 'delivery'
+        return 'message'
+
+    def _chat_bucket(self, chat_id):
+        if chat_id is None:
+            return None
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            private = isinstance(chat_id, int) and chat_id > 0
+            bucket = self.chat_buckets[chat_id] = TokenBucket(
+                self.private_rate if private else self.group_rate, self.chat_burst)
+            if len(self.chat_buckets) > self.MAX_CHAT_BUCKETS:
+                self.chat_buckets.popitem(last=False)
+        else:
+            self.chat_buckets.move_to_end(chat_id)
+        return bucket
+
+    def _global_wait(self, now: float) -> float:
+        return max(self.paused_until - now, self.global_bucket.wait(now))
+
+    def _take(self, name: str, chat_bucket, waited: float) -> None:
+        self.global_bucket.tokens -= 1
+        if chat_bucket is not None:
+            chat_bucket.tokens -= 1
+        stat = self.stats[name]
+        stat["calls"] += 1
+        if waited > 0:
+            stat["waited"] += 1
+            stat["wait_seconds"] += waited
+            stat["max_wait_seconds"] = max(stat["max_wait_seconds"], waited)
+
+    async def _acquire(self, name: str, chat_id) -> None:
+        now = time.monotonic()
+        bucket = self._chat_bucket(chat_id)
+        if (not any(self.queues.values()) and self._global_wait(now) <= 0
+                and (bucket is None or bucket.wait(now) <= 0)):
+            self._take(name, bucket, 0.0)
+            return
+        future = asyncio.get_running_loop().create_future()
+        self.queues[name].append((chat_id, future, now))
+        if self._dispatcher is None or self._dispatcher.done():
+            self._wakeup = asyncio.Event()
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        self._wakeup.set()
+        await future
+
+    async def _dispatch(self) -> None:
+        while True:
+            now = time.monotonic()
+            delay = self._global_wait(now)
+            if delay <= 0:
+                delay = None
+                blocked = set()  # chats with an earlier call still waiting
+                for name in self.CLASSES:
+                    queue = self.queues[name]
+                    for item in list(queue):
+                        chat_id, future, enqueued = item
+                        if future.done():
+                            queue.remove(item)
+                            continue
+                        if chat_id in blocked:
+                            continue
+                        bucket = self._chat_bucket(chat_id)
+                        wait = max(self._global_wait(now), bucket.wait(now) if bucket else 0.0)
+                        if wait > 0:
+                            if chat_id is not None:
+                                blocked.add(chat_id)
+                            delay = wait if delay is None else min(delay, wait)
+                            continue
+                        queue.remove(item)
+                        self._take(name, bucket, now - enqueued)
+                        future.set_result(None)
+            self._wakeup.clear()
+            if not any(self.queues.values()):
+                await self._wakeup.wait()
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        name = rate_limit_args if rate_limit_args in self.stats else self.classify(endpoint, data)
+        started = time.monotonic()
+        await self._acquire(name, None if name == 'answer' else data.get('chat_id'))
+        annotate_span({"gateway.class": name, "gateway.wait_ms": round((time.monotonic() - started) * 1e3, 3)})
+        try:
+            return await callback(*args, **kwargs)
+        except RetryAfter as e:
+            retry_after = e.retry_after
+            seconds = retry_after.total_seconds() if isinstance(retry_after, datetime.timedelta) else retry_after
+            self.retry_after_count += 1
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            logger.warning("Bot API asked to retry after %ss (%s); pausing outgoing calls", seconds, endpoint)
+            raise
+
+    def snapshot(self) -> dict:
+        """Queue depth and wait times per class, for the health endpoint."""
+        return {
+            "queued": {name: len(queue) for name, queue in self.queues.items()},
+            "paused_seconds": round(max(0.0, self.paused_until - time.monotonic()), 3),
+            "retry_after": self.retry_after_count,
+            "classes": {
+                name: {
+                    "calls": stat["calls"],
+                    "waited": stat["waited"],
+                    "mean_wait_ms": round(stat["wait_seconds"] / stat["waited"] * 1e3, 1) if stat["waited"] else 0.0,
+                    "max_wait_ms": round(stat["max_wait_seconds"] * 1e3, 1),
+                }
+                for name, stat in self.stats.items()
+            },
+        }
+
+# --- TICKET STORE ---
+class TicketStore:
+    """SQLite-backed record of every ticket posted to the support group.
+
+    Tickets are indexed by user and creation time, and an FTS5 table over the
+    provided username and Q&A text backs the /search command. `delivery` is
+    'pending' until the ticket reaches the support group, then 'sent', or
+    'failed' when the user was told to try again. `update_id` is the update
+    that opened the ticket, so handling it again after a restart reuses it.
+    """
+
+    def __init__(self, path: str = TICKET_DB_PATH):
+        self.conn = sqlite3.connect(path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS tickets (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                provided_username TEXT NOT NULL,
+                flow_type TEXT NOT NULL,
+                lang TEXT NOT NULL,
+                qa TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                delivery TEXT NOT NULL DEFAULT 'sent',
+                score INTEGER NOT NULL DEFAULT 0,
+                complete INTEGER NOT NULL DEFAULT 0,
+                status TEXT NOT NULL DEFAULT 'open',
+                claimed_by INTEGER,
+                claimed_at REAL,
+                claimed_by_name TEXT,
+                closed_at REAL,
+                message_id INTEGER,
+                update_id INTEGER
+            );
+            CREATE INDEX IF NOT EXISTS idx_tickets_user ON tickets(user_id, created_at);
+            CREATE INDEX IF NOT EXISTS idx_tickets_created ON tickets(created_at);
+            CREATE VIRTUAL TABLE IF NOT EXISTS tickets_fts USING fts5(provided_username, answers);
+            CREATE TABLE IF NOT EXISTS faq_entries (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                ticket_id INTEGER,
+                lang TEXT NOT NULL,
+                question TEXT NOT NULL,
+                answer TEXT NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS ticket_proofs (
+                ticket_id INTEGER NOT NULL,
+                file_unique_id TEXT NOT NULL,
+                file_id TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                forwarded INTEGER NOT NULL DEFAULT 0,
+                dhash INTEGER,
+                reused_ticket_id INTEGER,
+                distance INTEGER,
+                PRIMARY KEY (ticket_id, file_unique_id)
+            );
+            CREATE TABLE IF NOT EXISTS media_files (
+                sha256 TEXT NOT NULL,
+                lang TEXT NOT NULL,
+                file_id TEXT NOT NULL,
+                uploaded_at REAL NOT NULL,
+                PRIMARY KEY (sha256, lang)
+            );
+        """)
+        columns = {row['name'] for row in self.conn.execute("PRAGMA table_info(tickets)")}
+        if 'delivery' not in columns:
+            # Databases from before delivery tracking: every stored ticket was sent
+            with self.conn:
+                self.conn.execute("ALTER TABLE tickets ADD COLUMN delivery TEXT NOT NULL DEFAULT 'sent'")
+        workflow_columns = {
+            'score': "INTEGER NOT NULL DEFAULT 0", 'complete': "INTEGER NOT NULL DEFAULT 0",
+            'status': "TEXT NOT NULL DEFAULT 'open'", 'claimed_by': "INTEGER", 'claimed_at': "REAL",
+            'claimed_by_name': "TEXT", 'closed_at': "REAL", 'message_id': "INTEGER",
+        }
+        with self.conn:
+            for name, definition in workflow_columns.items():
+                if name not in columns:
+                    self.conn.execute(f"ALTER TABLE tickets ADD COLUMN {name} {definition}")
+        if 'update_id' not in columns:
+            # Databases from before tickets remembered their update: none of those can be handled again
+            with self.conn:
+                self.conn.execute("ALTER TABLE tickets ADD COLUMN update_id INTEGER")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_tickets_update ON tickets(update_id) WHERE update_id IS NOT NULL")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_tickets_pending ON tickets(id) WHERE delivery = 'pending'")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_tickets_open ON tickets(id) WHERE status = 'open'")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_tickets_status ON tickets(status)")
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_tickets_claimed ON tickets(claimed_at) WHERE claimed_by IS NOT NULL"
+        )
+        proof_columns = {row['name'] for row in self.conn.execute("PRAGMA table_info(ticket_proofs)")}
+        if 'dhash' not in proof_columns:
+            with self.conn:
+                for column in ('dhash', 'reused_ticket_id', 'distance'):
+                    self.conn.execute(f"ALTER TABLE ticket_proofs ADD COLUMN {column} INTEGER")
+
+    def add_ticket(self, user_id: int, provided_username: str, flow_type: str, lang: str, qa: list,
+                   score: int = 0, complete: bool = False, update_id: int = None) -> int:
+        """Store a ticket and index it for search. Returns the ticket ID."""
+        with self.conn:
+            cur = self.conn.execute(
+                "INSERT INTO tickets (user_id, provided_username, flow_type, lang, qa, created_at, delivery, "
+                "score, complete, update_id) VALUES (?, ?, ?, ?, ?, ?, 'pending', ?, ?, ?)",
+                (user_id, provided_username, flow_type, lang, json.dumps(qa, ensure_ascii=False), time.time(),
+                 score, int(complete), update_id)
+            )
+            ticket_id = cur.lastrowid
+            answers = "\n".join(f"{question} {answer}" for question, answer in qa)
+            self.conn.execute(
+                "INSERT INTO tickets_fts (rowid, provided_username, answers) VALUES (?, ?, ?)",
+                (ticket_id, provided_username, answers)
+            )
+        return ticket_id
+
+    def mark_delivery(self, ticket_id: int, delivery: str, message_id: int = None) -> None:
+        """Settle a pending ticket's delivery as 'sent' (as support group message `message_id`) or 'failed'."""
+        with self.conn:
+            self.conn.execute(
+                "UPDATE tickets SET delivery = ?, message_id = COALESCE(?, message_id) "
+                "WHERE id = ? AND delivery = 'pending'",
+                (delivery, message_id, ticket_id)
+            )
+
+    def undelivered(self) -> list:
+        """Tickets stored but not yet confirmed sent to the support group, oldest first."""
+        rows = self.conn.execute("SELECT * FROM tickets WHERE delivery = 'pending' ORDER BY id").fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def recent_tickets(self, since: float) -> list:
+        """Tickets created at or after `since` that were not abandoned, oldest first."""
+        rows = self.conn.execute(
+            "SELECT * FROM tickets WHERE created_at >= ? AND delivery != 'failed' ORDER BY created_at",
+            (since,)
+        ).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def open_ticket_priorities(self) -> list:
+        """(id, score, complete) of every open ticket that reached or may still reach the support group."""
+        return self.conn.execute(
+            "SELECT id, score, complete FROM tickets WHERE status = 'open' AND delivery != 'failed'"
+        ).fetchall()
+
+    def open_ticket_count(self) -> int:
+        return self.conn.execute(
+            "SELECT COUNT(*) FROM tickets WHERE status = 'open' AND delivery != 'failed'"
+        ).fetchone()[0]
+
+    def claim_ticket(self, ticket_id: int, staff_id: int, staff_name: str = None) -> bool:
+        """Assign an open ticket to a staff member. Returns False if it is no longer open."""
+        with self.conn:
+            cur = self.conn.execute(
+                "UPDATE tickets SET status = 'claimed', claimed_by = ?, claimed_by_name = ?, claimed_at = ? "
+                "WHERE id = ? AND status = 'open' AND delivery != 'failed'",
+                (staff_id, staff_name, time.time(), ticket_id)
+            )
+        return cur.rowcount == 1
+
+    def close_ticket(self, ticket_id: int, status: str, staff_id: int, staff_name: str = None) -> bool:
+        """Mark a ticket 'resolved' or 'rejected'. Only open tickets or the closer's own claimed ones qualify."""
+        now = time.time()
+        with self.conn:
+            cur = self.conn.execute(
+                "UPDATE tickets SET status = ?, claimed_by = ?, claimed_by_name = COALESCE(claimed_by_name, ?), "
+                "claimed_at = COALESCE(claimed_at, ?), closed_at = ? "
+                "WHERE id = ? AND (status = 'open' OR (status = 'claimed' AND claimed_by = ?))",
+                (status, staff_id, staff_name, now, now, ticket_id, staff_id)
+            )
+        return cur.rowcount == 1
+
+    def status_counts(self) -> dict:
+        """Number of tickets per status."""
+        return dict(self.conn.execute("SELECT status, COUNT(*) FROM tickets GROUP BY status").fetchall())
+
+    def agent_stats(self, since: float) -> list:
+        """Per staff member, for tickets claimed since `since`: name, claimed, resolved, rejected, mean hours to close."""
+        return self.conn.execute(
+            "SELECT claimed_by_name AS name, SUM(status = 'claimed') AS claimed, "
+            "SUM(status = 'resolved') AS resolved, SUM(status = 'rejected') AS rejected, "
+            "AVG(closed_at - claimed_at) / 3600.0 AS hours_to_close "
+            "FROM tickets WHERE claimed_by IS NOT NULL AND claimed_at >= ? "
+            "GROUP BY claimed_by ORDER BY resolved DESC, claimed DESC",
+            (since,)
+        ).fetchall()
+
+    def get_ticket(self, ticket_id: int):
+        """Fetch one ticket by ID, or None."""
+        row = self.conn.execute("SELECT * FROM tickets WHERE id = ?", (ticket_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def ticket_for_update(self, update_id: int, user_id: int):
+        """ID of the ticket a user's update already opened, or None."""
+        # user_id too: Telegram picks new update IDs at random after a quiet week
+        row = self.conn.execute(
+            "SELECT id FROM tickets WHERE update_id = ? AND user_id = ?", (update_id, user_id)
+        ).fetchone()
+        return row['id'] if row else None
+
+    def tickets_for_user(self, user_id: int, limit: int = 10) -> list:
+        """Most recent tickets of a user, newest first."""
+        rows = self.conn.execute(
+            "SELECT * FROM tickets WHERE user_id = ? ORDER BY created_at DESC LIMIT ?",
+            (user_id, limit)
+        ).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def search(self, text: str, limit: int = 10) -> list:
+        """Full-text search over usernames and answers, newest first."""
+        # Quote every term so user input can never be parsed as FTS5 syntax;
+        # rowid order lets FTS5 stop after `limit` hits instead of ranking them all
+        terms = [t.replace('"', '""') for t in text.split()]
+        if not terms:
+            return []
+        match = " ".join(f'"{t}"' for t in terms)
+        rows = self.conn.execute(
+            "SELECT t.* FROM tickets_fts f JOIN tickets t ON t.id = f.rowid "
+            "WHERE tickets_fts MATCH ? ORDER BY f.rowid DESC LIMIT ?",
+            (match, limit)
+        ).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def add_faq_entry(self, ticket_id: int, lang: str, question: str, answer: str) -> None:
+        """Remember a staff answer to a user question for the FAQ index."""
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO faq_entries (ticket_id, lang, question, answer, created_at) VALUES (?, ?, ?, ?, ?)",
+                (ticket_id, lang, question, answer, time.time())
+            )
+
+    def faq_entries(self) -> list:
+        """All (lang, question, answer) answered by staff, oldest first."""
+        return self.conn.execute("SELECT lang, question, answer FROM faq_entries ORDER BY id").fetchall()
+
+    def add_proof(self, ticket_id: int, kind: str, file_id: str, file_unique_id: str) -> bool:
+        """Attach a photo or document to a ticket. Returns False if the ticket already has that file."""
+        with self.conn:
+            cur = self.conn.execute(
+                "INSERT OR IGNORE INTO ticket_proofs (ticket_id, file_unique_id, file_id, kind, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (ticket_id, file_unique_id, file_id, kind, time.time())
+            )
+        return cur.rowcount == 1
+
+    def proof_count(self, ticket_id: int) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM ticket_proofs WHERE ticket_id = ?", (ticket_id,)).fetchone()[0]
+
+    def unforwarded_proofs(self, ticket_id: int = None) -> list:
+        """Proofs not yet sent to the support group, for one ticket or all, in arrival order."""
+        if ticket_id is None:
+            return self.conn.execute(
+                "SELECT * FROM ticket_proofs WHERE forwarded = 0 ORDER BY created_at"
+            ).fetchall()
+        return self.conn.execute(
+            "SELECT * FROM ticket_proofs WHERE ticket_id = ? AND forwarded = 0 ORDER BY created_at", (ticket_id,)
+        ).fetchall()
+
+    def mark_proofs_forwarded(self, ticket_id: int, file_unique_ids: list) -> None:
+        with self.conn:
+            self.conn.executemany(
+                "UPDATE ticket_proofs SET forwarded = 1 WHERE ticket_id = ? AND file_unique_id = ?",
+                [(ticket_id, unique_id) for unique_id in file_unique_ids]
+            )
+
+    def set_proof_hash(self, ticket_id: int, file_unique_id: str, dhash: int,
+                       reused_ticket_id: int = None, distance: int = None) -> None:
+        """Record a proof's perceptual hash and the earlier ticket it seems to be copied from, if any."""
+        with self.conn:
+            self.conn.execute(
+                "UPDATE ticket_proofs SET dhash = ?, reused_ticket_id = ?, distance = ? "
+                "WHERE ticket_id = ? AND file_unique_id = ?",
+                # SQLite integers are signed 64-bit
+                (dhash - (1 << 64) if dhash >= 1 << 63 else dhash, reused_ticket_id, distance,
+                 ticket_id, file_unique_id)
+            )
+
+    def proof_hashes(self) -> list:
+        """(ticket ID, user ID, unsigned dhash) of every hashed proof, oldest first."""
+        rows = self.conn.execute(
+            "SELECT p.ticket_id, t.user_id, p.dhash FROM ticket_proofs p JOIN tickets t ON t.id = p.ticket_id "
+            "WHERE p.dhash IS NOT NULL ORDER BY p.created_at"
+        )
+        return [(ticket_id, user_id, dhash % (1 << 64)) for ticket_id, user_id, dhash in rows]
+
+    def reused_proofs(self, ticket_id: int) -> list:
+        """(earlier ticket ID, distance) for each proof of a ticket flagged as reused."""
+        return self.conn.execute(
+            "SELECT reused_ticket_id, distance FROM ticket_proofs "
+            "WHERE ticket_id = ? AND reused_ticket_id IS NOT NULL ORDER BY created_at", (ticket_id,)
+        ).fetchall()
+
+    def media_file_ids(self, lang: str) -> dict:
+        """Telegram file_id of every asset uploaded for a language, by content sha256."""
+        rows = self.conn.execute("SELECT sha256, file_id FROM media_files WHERE lang = ?", (lang,))
+        return {row['sha256']: row['file_id'] for row in rows}
+
+    def set_media_file_id(self, sha256: str, lang: str, file_id) -> None:
+        """Remember the file_id Telegram returned for an upload, or forget it with None."""
+        with self.conn:
+            if file_id is None:
+                self.conn.execute("DELETE FROM media_files WHERE sha256 = ? AND lang = ?", (sha256, lang))
+            else:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO media_files (sha256, lang, file_id, uploaded_at) VALUES (?, ?, ?, ?)",
+                    (sha256, lang, file_id, time.time())
+                )
+
+    @staticmethod
+    def _to_dict(row) -> dict:
+        ticket = dict(row)
+        ticket['qa'] = json.loads(ticket['qa'])
+        return ticket
+
+def get_ticket_store(context: ContextTypes.DEFAULT_TYPE) -> TicketStore:
+    """Return the application's ticket store, opening it on first use."""
+    store = context.bot_data.get('ticket_store')
+    if store is None:
+        store = context.bot_data['ticket_store'] = TicketStore(get_tenant(context).ticket_db_path)
+    return store
+
+def format_ticket(ticket: dict) -> str:
+    """Plain-text rendering of a stored ticket for the support chat."""
+    created = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(ticket['created_at']))
+    lines = [
+        f"🎫 Ticket #{ticket['id']} ({ticket['flow_type'].replace('_', ' ').title()})",
+        f"🆔 User ID: {ticket['user_id']}",
+        f"💬 Provided Username: {ticket['provided_username']}",
+        f"⏰ Time: {created} UTC",
+        f"🌐 Language: {ticket['lang'].upper()}",
+        f"📊 Eligibility: {ticket['score']}/100{' ✅ complete' if ticket['complete'] else ''}",
+        f"📌 Status: {ticket['status']}" + (f" by {ticket['claimed_by_name']}" if ticket['claimed_by_name'] else ""),
+    ]
+    for i, (question, answer) in enumerate(ticket['qa'], 1):
+        lines.append(f"{i}. {question}\n   ➤ {answer}")
+    return "\n".join(lines)
+
+# --- TICKET ADMISSION ---
+class TicketAdmission:
+    """In-memory gate in front of the support group send.
+
+    Keeps, per user, the timestamps of admitted tickets in a rolling window,
+    and an 8-byte fingerprint of each (user_id, username, answers) submission
+    so a repeated ticket is merged into the original instead of re-posted.
+    Expired entries are swept at most once per window.
+    """
+
+    def __init__(self, window: float = TICKET_WINDOW_SECONDS, max_per_window: int = TICKET_MAX_PER_WINDOW):
+        self.window = window
+        self.max_per_window = max_per_window
+        self._recent = {}        # user_id -> deque of admission times
+        self._fingerprints = {}  # fingerprint -> (admission time, ticket_id)
+        self._next_sweep = 0.0
+
+    @staticmethod
+    def fingerprint(user_id: int, username: str, qa: list) -> bytes:
+        payload = json.dumps([user_id, username.lower(), qa], ensure_ascii=False)
+        return hashlib.blake2b(payload.encode(), digest_size=8).digest()
+
+    def check(self, fingerprint: bytes, user_id: int, now: float = None):
+        """Return ('duplicate', ticket_id), ('throttled', None) or ('ok', None)."""
+        now = time.monotonic() if now is None else now
+        self._sweep(now)
+        seen = self._fingerprints.get(fingerprint)
+        if seen and now - seen[0] < self.window:
+            return 'duplicate', seen[1]
+        recent = self._recent.get(user_id)
+        if recent:
+            while recent and now - recent[0] >= self.window:
+                recent.popleft()
+            if len(recent) >= self.max_per_window:
+                return 'throttled', None
+        return 'ok', None
+
+    def record(self, fingerprint: bytes, user_id: int, ticket_id: int, now: float = None) -> None:
+        """Count an admitted ticket once it has reached the support group."""
+        now = time.monotonic() if now is None else now
+        self._recent.setdefault(user_id, deque()).append(now)
+        self._fingerprints[fingerprint] = (now, ticket_id)
+
+    def restore(self, tickets: list, now: float = None) -> None:
+        """Re-admit stored tickets after a restart, so duplicates and limits span deploys."""
+        now = time.monotonic() if now is None else now
+        wall = time.time()
+        for ticket in tickets:
+            fingerprint = self.fingerprint(ticket['user_id'], ticket['provided_username'], ticket['qa'])
+            self.record(fingerprint, ticket['user_id'], ticket['id'], now - (wall - ticket['created_at']))
+
+    def _sweep(self, now: float) -> None:
+        if now < self._next_sweep:
+            return
+        self._next_sweep = now + self.window
+        self._fingerprints = {fp: seen for fp, seen in self._fingerprints.items() if now - seen[0] < self.window}
+        for user_id in [uid for uid, recent in self._recent.items() if not recent or now - recent[-1] >= self.window]:
+            del self._recent[user_id]
+
+def get_ticket_admission(context: ContextTypes.DEFAULT_TYPE) -> TicketAdmission:
+    """Return the application's ticket admission gate."""
+    admission = context.bot_data.get('ticket_admission')
+    if admission is None:
+        admission = context.bot_data['ticket_admission'] = TicketAdmission()
+        admission.restore(get_ticket_store(context).recent_tickets(time.time() - admission.window))
+    return admission
+
+# --- GUIDE MEDIA ---
+class MediaLibrary:
+    """Guide screenshots and videos, uploaded once per bot and then sent by file_id.
+
+    A guide's assets are the photos and videos in MEDIA_DIR/<guide>/<lang>/,
+    or MEDIA_DIR/<guide>/ when there is no folder for the language, sent in
+    file name order. The file_id Telegram returns for an upload is stored
+    under the file's sha256 and language, so an edited file is uploaded again
+    on its next view and an unchanged one never is.
+    """
+
+    PHOTO_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+    VIDEO_EXTENSIONS = ('.mp4', '.mov')
+    MAX_GROUP = 10  # Telegram's limit for sendMediaGroup
+
+    def __init__(self, store: TicketStore, root: str = MEDIA_DIR):
+        self.store = store
+        self.root = root
+        self._hashes = {}  # path -> (mtime_ns, size, sha256)
+        self._file_ids = {}  # lang -> {sha256: file_id}
+        self._upload_locks = {}
+
+    def assets(self, guide: str, lang: str) -> list:
+        """Paths of a guide's photos and videos for a language, in sending order."""
+        for folder in (os.path.join(self.root, guide, lang), os.path.join(self.root, guide)):
+            try:
+                names = sorted(os.listdir(folder))
+            except OSError:
+                continue
+            paths = [os.path.join(folder, name) for name in names
+                     if name.lower().endswith(self.PHOTO_EXTENSIONS + self.VIDEO_EXTENSIONS)]
+            if paths:
+                return paths
+        return []
+
+    def sha256(self, path: str) -> str:
+        """Content hash of a file, recomputed only when its size or mtime changes."""
+        stat = os.stat(path)
+        cached = self._hashes.get(path)
+        if cached and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+            return cached[2]
+        with open(path, 'rb') as f:
+            digest = hashlib.file_digest(f, 'sha256').hexdigest()
+        self._hashes[path] = (stat.st_mtime_ns, stat.st_size, digest)
+        return digest
+
+    def file_ids(self, lang: str) -> dict:
+        if lang not in self._file_ids:
+            self._file_ids[lang] = self.store.media_file_ids(lang)
+        return self._file_ids[lang]
+
+    async def send(self, bot, chat_id: int, guide: str, lang: str) -> int:
+        """Send a guide's assets to a chat. Returns the number of files uploaded."""
+        paths = self.assets(guide, lang)
+        if not paths:
+            return 0
+        items = [(path, self.sha256(path)) for path in paths]
+        for attempt in range(2):
+            file_ids = self.file_ids(lang)
+            cached = [sha in file_ids for _, sha in items]
+            try:
+                if all(cached):
+                    await self._send(bot, chat_id, items, lang)
+                    return 0
+                # One upload per guide and language at a time; later viewers reuse its file_ids
+                async with self._upload_locks.setdefault((guide, lang), asyncio.Lock()):
+                    uploads = sum(1 for _, sha in items if sha not in file_ids)
+                    await self._send(bot, chat_id, items, lang)
+                    return uploads
+            except BadRequest as e:
+                if attempt or not any(cached):
+                    raise
+                # The bot lost access to a stored file_id: upload the guide again
+                logger.warning("Stored file_id for guide %s rejected, uploading again: %s", guide, e)
+                for _, sha in items:
+                    self._forget(sha, lang)
+
+    async def _send(self, bot, chat_id: int, items: list, lang: str) -> None:
+        file_ids = self.file_ids(lang)
+        for start in range(0, len(items), self.MAX_GROUP):
+            chunk = items[start:start + self.MAX_GROUP]
+            media, sources = [], []
+            for path, sha in chunk:
+                source = file_ids.get(sha)
+                if source is None:
+                    with open(path, 'rb') as f:
+                        source = f.read()
+                cls = InputMediaVideo if path.lower().endswith(self.VIDEO_EXTENSIONS) else InputMediaPhoto
+                media.append(cls(media=source, filename=os.path.basename(path)))
+                sources.append(source)
+            if len(media) == 1:
+                path, source = chunk[0][0], sources[0]
+                if isinstance(media[0], InputMediaVideo):
+                    messages = [await bot.send_video(chat_id, source, filename=os.path.basename(path))]
+                else:
+                    messages = [await bot.send_photo(chat_id, source, filename=os.path.basename(path))]
+            else:
+                messages = await bot.send_media_group(chat_id, media)
+            for (path, sha), message in zip(chunk, messages):
+                if sha not in file_ids:
+                    sent = message.video or (message.photo[-1] if message.photo else None)
+                    if sent:
+                        file_ids[sha] = sent.file_id
+                        self.store.set_media_file_id(sha, lang, sent.file_id)
+
+    def _forget(self, sha: str, lang: str) -> None:
+        self.file_ids(lang).pop(sha, None)
+        self.store.set_media_file_id(sha, lang, None)
+
+def get_media_library(context: ContextTypes.DEFAULT_TYPE) -> MediaLibrary:
+    """Return the application's guide media library."""
+    library = context.bot_data.get('media_library')
+    if library is None:
+        library = context.bot_data['media_library'] = MediaLibrary(get_ticket_store(context))
+    return library
+
+async def send_guide_media(update: Update, context: ContextTypes.DEFAULT_TYPE, guide: str) -> None:
+    """Follow a guide screen with its screenshots or videos, if MEDIA_DIR has any."""
+    lang = context.user_data.get('lang', 'en')
+    try:
+        await get_media_library(context).send(context.bot, update.effective_chat.id, guide, lang)
+    except Exception as e:
+        logger.warning("Failed to send media for guide %s: %s", guide, e)
+
+# --- PROOF INTAKE ---
+class ProofForwarder:
+    """Forwards the screenshots and files users attach to tickets to the support group.
+
+    Proofs are stored with the ticket as they arrive and sent as albums of up
+    to 10 (one sendMediaGroup call each) once 10 are waiting, when the user
+    presses Done, or PROOF_FLUSH_SECONDS after the last one arrived. Photos
+    and documents go in separate albums because Telegram does not mix them.
+    Proofs still waiting at shutdown are forwarded by recover() on restart.
+    """
+
+    MAX_GROUP = 10  # Telegram's limit for sendMediaGroup
+
+    def __init__(self, store: TicketStore, bot, support_chat_id: str, quiet: float = PROOF_FLUSH_SECONDS):
+        self.store = store
+        self.bot = bot
+        self.support_chat_id = support_chat_id
+        self.quiet = quiet
+        self._locks = weakref.WeakValueDictionary()  # ticket ID -> lock, gone once no flush holds it
+        self._timers = {}  # ticket ID -> task waiting to flush it
+
+    def add(self, ticket_id: int, kind: str, file_id: str, file_unique_id: str) -> bool:
+        """Attach a proof to a ticket and schedule its forwarding. Returns False for a duplicate."""
+        if not self.store.add_proof(ticket_id, kind, file_id, file_unique_id):
+            return False
+        full = len(self.store.unforwarded_proofs(ticket_id)) >= self.MAX_GROUP
+        timer = self._timers.pop(ticket_id, None)
+        if timer:
+            timer.cancel()
+        self._timers[ticket_id] = asyncio.create_task(self._flush_later(ticket_id, 0 if full else self.quiet))
+        return True
+
+    async def _flush_later(self, ticket_id: int, delay: float) -> None:
+        await asyncio.sleep(delay)
+        # Out of _timers before sending, so a newer proof never cancels a send half way
+        self._timers.pop(ticket_id, None)
+        try:
+            await self.flush(ticket_id)
+        except Exception as e:
+            logger.error("Could not forward proofs of ticket #%s: %s", ticket_id, e)
+
+    async def flush(self, ticket_id: int) -> int:
+        """Send a ticket's waiting proofs to the support group now. Returns the number sent."""
+        timer = self._timers.pop(ticket_id, None)
+        if timer:
+            timer.cancel()
+        sent = 0
+        async with self._locks.setdefault(ticket_id, asyncio.Lock()):
+            proofs = self.store.unforwarded_proofs(ticket_id)
+            numbered = self.store.proof_count(ticket_id) - len(proofs)
+            for kind, media_class, send_one in (('photo', InputMediaPhoto, self.bot.send_photo),
+                                                ('document', InputMediaDocument, self.bot.send_document)):
+                batch = [proof for proof in proofs if proof['kind'] == kind]
+                for start in range(0, len(batch), self.MAX_GROUP):
+                    chunk = batch[start:start + self.MAX_GROUP]
+                    first, last = numbered + sent + 1, numbered + sent + len(chunk)
+                    caption = f"🧾 Ticket #{ticket_id}: " + (f"proofs {first}-{last}" if last > first else f"proof {first}")
+                    if len(chunk) == 1:
+                        await send_one(self.support_chat_id, chunk[0]['file_id'], caption=caption)
+                    else:
+                        await self.bot.send_media_group(self.support_chat_id, [
+                            media_class(media=proof['file_id'], caption=caption if i == 0 else None)
+                            for i, proof in enumerate(chunk)
+                        ])
+                    self.store.mark_proofs_forwarded(ticket_id, [proof['file_unique_id'] for proof in chunk])
+                    sent += len(chunk)
+        return sent
+
+    async def flush_all(self) -> int:
+        """Send every ticket's waiting proofs, e.g. those left by a previous run."""
+        ticket_ids = dict.fromkeys(proof['ticket_id'] for proof in self.store.unforwarded_proofs())
+        return sum([await self.flush(ticket_id) for ticket_id in ticket_ids])
+
+    def close(self) -> None:
+        """Stop waiting to flush; unsent proofs stay in the store for the next run."""
+        for timer in self._timers.values():
+            timer.cancel()
+        self._timers.clear()
+
+def dhash(data: bytes) -> int:
+    """64-bit difference hash of an image: which of each pair of neighbouring pixels is brighter, 9x8 grayscale."""
+    with Image.open(io.BytesIO(data)) as image:
+        image.draft('L', (36, 32))  # JPEGs decode straight to a small size
+        pixels = np.asarray(image.convert('L').resize((9, 8), Image.Resampling.LANCZOS), dtype=np.int16)
+    bits = np.packbits(pixels[:, 1:] > pixels[:, :-1])
+    return int(bits.view('>u8')[0])
+
+class ProofHashIndex:
+    """Perceptual hashes of every proof image, to spot screenshots reused by another user.
+
+    Hashes live in flat NumPy arrays grown by doubling. A lookup XORs the
+    query with every stored hash and counts the differing bits in one
+    vectorized pass: about 1.6 ms at a million hashes, where a BK-tree would
+    pay Python overhead per visited node. Loaded from the ticket store once.
+    """
+
+    def __init__(self, entries: list = (), max_distance: int = PROOF_HASH_MAX_DISTANCE):
+        self.max_distance = max_distance
+        capacity = max(1024, len(entries))
+        self._hashes = np.empty(capacity, dtype=np.uint64)
+        self._tickets = np.empty(capacity, dtype=np.int64)
+        self._users = np.empty(capacity, dtype=np.int64)
+        self._size = 0
+        for ticket_id, user_id, hash_value in entries:
+            self.add(ticket_id, user_id, hash_value)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, ticket_id: int, user_id: int, hash_value: int) -> None:
+        if self._size == len(self._hashes):
+            for name in ('_hashes', '_tickets', '_users'):
+                old = getattr(self, name)
+                grown = np.empty(len(old) * 2, dtype=old.dtype)
+                grown[:self._size] = old
+                setattr(self, name, grown)
+        self._hashes[self._size] = hash_value
+        self._tickets[self._size] = ticket_id
+        self._users[self._size] = user_id
+        self._size += 1
+
+    def nearest(self, hash_value: int, exclude_user: int = None):
+        """(ticket ID, user ID, distance) of the closest hash within max_distance, or None."""
+        distances = np.bitwise_count(self._hashes[:self._size] ^ np.uint64(hash_value))
+        candidates = np.flatnonzero(distances <= self.max_distance)
+        if exclude_user is not None:
+            candidates = candidates[self._users[candidates] != exclude_user]
+        if not len(candidates):
+            return None
+        best = candidates[np.argmin(distances[candidates])]
+        return int(self._tickets[best]), int(self._users[best]), int(distances[best])
+
+def get_proof_hash_index(context: ContextTypes.DEFAULT_TYPE) -> ProofHashIndex:
+    """Return the application's proof hash index, loading it from the ticket store on first use."""
+    index = context.bot_data.get('proof_hash_index')
+    if index is None:
+        index = context.bot_data['proof_hash_index'] = ProofHashIndex(get_ticket_store(context).proof_hashes())
+    return index
+
+async def check_proof_reuse(context: ContextTypes.DEFAULT_TYPE, ticket_id: int, user_id: int,
+                            file_id: str, file_unique_id: str) -> None:
+    """Hash a proof image and flag its ticket if another user already sent a near-identical one."""
+    try:
+        file = await context.bot.get_file(file_id)
+        data = await file.download_as_bytearray()
+        hash_value = await asyncio.to_thread(dhash, bytes(data))
+    except Exception as e:
+        logger.warning("Could not hash proof of ticket #%s: %s", ticket_id, e)
+        return
+
+    index = get_proof_hash_index(context)
+    match = index.nearest(hash_value, exclude_user=user_id)
+    index.add(ticket_id, user_id, hash_value)
+    reused_ticket_id, _, distance = match or (None, None, None)
+    store = get_ticket_store(context)
+    already_flagged = bool(store.reused_proofs(ticket_id))
+    store.set_proof_hash(ticket_id, file_unique_id, hash_value, reused_ticket_id, distance)
+    if match is None or already_flagged:  # one warning per ticket; /ticket lists every match
+        return
+    logger.info("Proof of ticket #%s matches ticket #%s (%d bits differ)", ticket_id, reused_ticket_id, distance)
+    support_chat_id = get_tenant(context).support_chat_id
+    if support_chat_id:
+        await context.bot.send_message(
+            chat_id=support_chat_id,
+            text=f"⚠️ Ticket #{ticket_id}: a proof looks like one sent with ticket #{reused_ticket_id} "
+                 f"by another user ({distance}/64 bits differ).",
+        )
+
+def get_proof_forwarder(context: ContextTypes.DEFAULT_TYPE) -> ProofForwarder:
+    """Return the application's proof forwarder."""
+    forwarder = context.bot_data.get('proof_forwarder')
+    if forwarder is None:
+        forwarder = context.bot_data['proof_forwarder'] = ProofForwarder(
+            get_ticket_store(context), context.bot, get_tenant(context).support_chat_id
+        )
+    return forwarder
+
+# --- TICKET QUEUE ---
+# Reward criteria: weight of a "Yes", and the question asking it in each flow
+ELIGIBILITY_CRITERIA = {
+    'played_130_hours': (40, ('support_q9_text', 'existing_q3_text', 'new_q9_text')),
+    'liked_every_session': (30, ('support_q10_text', 'existing_q4_text', 'new_q10_text')),
+    'completed_every_step': (15, ('support_q13_text',)),
+    'full_setup': (10, ('support_q8_text', 'existing_q2_text', 'new_q8_text')),
+    'saved_island': (5, ('support_q11_text', 'existing_q5_text', 'new_q11_text')),
+}
+FLOW_QUESTION_PREFIXES = {'support': 'support_', 'existing_player': 'existing_', 'new_player': 'new_'}
+
+_criterion_by_question = {}  # lang -> {question text: criterion}
+
+def score_ticket(flow_type: str, qa_pairs: list, lang: str = 'en') -> tuple:
+    """(score out of 100, complete) for a ticket's resolved Q&A pairs.
+
+    Complete means every criterion asked in the ticket's flow was answered
+    with a Yes. Questions are matched by their text in English or `lang`.
+    """
+    by_question = _criterion_by_question.get(lang)
+    if by_question is None:
+        by_question = _criterion_by_question[lang] = {
+            STRINGS[code][key].split('\n')[-1].strip(): criterion
+            for criterion, (_, keys) in ELIGIBILITY_CRITERIA.items()
+            for key in keys
+            for code in {'en', lang} if code in STRINGS
+        }
+    prefix = FLOW_QUESTION_PREFIXES.get(flow_type)
+    if prefix is None:
+        return 0, False
+
+    asked = {criterion for criterion, (_, keys) in ELIGIBILITY_CRITERIA.items()
+             if any(key.startswith(prefix) for key in keys)}
+    met = set()
+    for question, answer in qa_pairs:
+        criterion = by_question.get(question)
+        if criterion in asked:
+            # A later answer to the same question (after a reminder) replaces the earlier one
+            if answer.startswith("Yes"):
+                met.add(criterion)
+            else:
+                met.discard(criterion)
+    return sum(ELIGIBILITY_CRITERIA[criterion][0] for criterion in met), met == asked
+
+class TicketQueue:
+    """Open tickets in the order staff should take them: complete first, then by score, then oldest.
+
+    A heapq binary heap keeps push and pop at O(log n) however large the
+    backlog. Tickets that stop being open some other way (failed delivery,
+    claimed elsewhere) are dropped when they reach the top, not searched for.
+    """
+
+    def __init__(self, store: TicketStore):
+        self.store = store
+        self._heap = [self._entry(*row) for row in store.open_ticket_priorities()]
+        heapq.heapify(self._heap)
+
+    @staticmethod
+    def _entry(ticket_id: int, score: int, complete: bool) -> tuple:
+        return (not complete, -score, ticket_id)
+
+    def push(self, ticket_id: int, score: int, complete: bool) -> None:
+        heapq.heappush(self._heap, self._entry(ticket_id, score, complete))
+
+    def claim_next(self, staff_id: int, staff_name: str = None):
+        """Claim the highest-priority open ticket for a staff member and return it, or None."""
+        while self._heap:
+            ticket_id = heapq.heappop(self._heap)[2]
+            if self.store.claim_ticket(ticket_id, staff_id, staff_name):
+                return self.store.get_ticket(ticket_id)
+        return None
+
+def get_ticket_queue(context: ContextTypes.DEFAULT_TYPE) -> TicketQueue:
+    """Return the application's ticket queue, built from the open tickets in the store on first use."""
+    ticket_queue = context.bot_data.get('ticket_queue')
+    if ticket_queue is None:
+        ticket_queue = context.bot_data['ticket_queue'] = TicketQueue(get_ticket_store(context))
+    return ticket_queue
+
+# --- TICKET WORKFLOW ---
+def ticket_keyboard(ticket_id: int, status: str = 'open', agent: str = None) -> InlineKeyboardMarkup:
+    """Buttons under a ticket message in the support group, for the ticket's status."""
+    resolve = InlineKeyboardButton("✅ Resolved", callback_data=f"ticket:resolve:{ticket_id}")
+    reject = InlineKeyboardButton("❌ Reject", callback_data=f"ticket:reject:{ticket_id}")
+    if status == 'open':
+        return InlineKeyboardMarkup([[InlineKeyboardButton("🙋 Claim", callback_data=f"ticket:claim:{ticket_id}"),
+                                      resolve, reject]])
+    if status == 'claimed':
+        return InlineKeyboardMarkup([
+            [InlineKeyboardButton(f"🙋 Claimed by {agent}", callback_data=f"ticket:info:{ticket_id}")],
+            [resolve, reject],
+        ])
+    label = "✅ Resolved" if status == 'resolved' else "❌ Rejected"
+    return InlineKeyboardMarkup([[InlineKeyboardButton(f"{label} by {agent}", callback_data=f"ticket:info:{ticket_id}")]])
+
+class TicketMessageEditor:
+    """Brings ticket messages in the support group in line with their status, one edit at a time.
+
+    Button clicks update the store at once; the message is edited afterwards
+    from the ticket's latest state, so several clicks on one ticket while an
+    edit is waiting cost a single edit, and the group never gets more than
+    one edit per TICKET_EDIT_INTERVAL. Only the buttons are edited: on the
+    ticket message, and on any /next reply a click came from.
+    """
+
+    def __init__(self, store: TicketStore, bot, chat_id: str, interval: float = TICKET_EDIT_INTERVAL):
+        self.store = store
+        self.bot = bot
+        self.chat_id = chat_id
+        self.interval = interval
+        self._dirty = OrderedDict()  # ticket ID -> other message IDs showing it, oldest first
+        self._task = None
+
+    def mark(self, ticket_id: int, message_id: int = None) -> None:
+        """Schedule an edit of a ticket's message, and of `message_id` if it shows the ticket too."""
+        self._dirty.setdefault(ticket_id, set()).add(message_id)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while self._dirty:
+            ticket_id, message_ids = self._dirty.popitem(last=False)
+            ticket = self.store.get_ticket(ticket_id)
+            if not ticket:
+                continue
+            keyboard = ticket_keyboard(ticket['id'], ticket['status'], ticket['claimed_by_name'])
+            for message_id in (message_ids | {ticket['message_id']}) - {None}:
+                try:
+                    await self.bot.edit_message_reply_markup(
+                        chat_id=self.chat_id, message_id=message_id, reply_markup=keyboard
+                    )
+                except Exception as e:
+                    logger.warning("Failed to update ticket #%s message: %s", ticket_id, e)
+                await asyncio.sleep(self.interval)
+
+    def close(self) -> None:
+        """Stop editing; the store has the status, and the next click redraws the buttons."""
+        if self._task:
+            self._task.cancel()
+        self._dirty.clear()
+
+def get_ticket_message_editor(context: ContextTypes.DEFAULT_TYPE) -> TicketMessageEditor:
+    """Return the application's ticket message editor."""
+    editor = context.bot_data.get('ticket_message_editor')
+    if editor is None:
+        editor = context.bot_data['ticket_message_editor'] = TicketMessageEditor(
+            get_ticket_store(context), context.bot, get_tenant(context).support_chat_id
+        )
+    return editor
+
+# --- LLM TRIAGE ---
+class ResponseCache:
+    """LRU cache with a per-entry TTL, keyed by normalized question."""
+
+    def __init__(self, max_size: int = LLM_CACHE_SIZE, ttl: float = LLM_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def put(self, key, value) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+def normalize_question(question: str) -> str:
+    """Lowercase, drop accents and punctuation and collapse whitespace so rephrasings share a cache entry."""
+    text = unicodedata.normalize('NFKD', question.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(re.sub(r"[^\w\s]", " ", text).split())
+
+class LLMTriage:
+    """Answers free-text questions from the guide content through an LLM.
+
+    Identical questions asked while a request is in flight share that request,
+    answers are cached, and at most LLM_MAX_CONCURRENCY requests hit the API
+    at once.
+    """
+
+    def __init__(self, client=None, model: str = LLM_MODEL, max_concurrency: int = LLM_MAX_CONCURRENCY,
+                 cache: ResponseCache = None, tenant: "Tenant" = None):
+        self.client = client
+        self.tenant = tenant or DEFAULT_TENANT
+        self.model = model
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.cache = cache or ResponseCache()
+        self._in_flight = {}  # cache key -> Future
+        self._prompts = {}    # lang -> system prompt
+
+    def system_prompt(self, lang: str) -> str:
+        prompt = self._prompts.get(lang)
+        if prompt is None:
+            s = STRINGS.get(lang, STRINGS['en'])
+            guide = "\n".join(text for text in s.values() if isinstance(text, str))
+            prompt = self._prompts[lang] = (
+                "You are the support assistant of an unofficial Telegram guide bot. "
+                "Answer the user's question briefly, only from the guide below, in the user's language. "
+                "If the guide does not answer it, say that the support team will help.\n\n"
+                f"Reward Island codes: {', '.join(self.tenant.game_codes)}\n"
+                f"Channel with the full guide: {self.tenant.helpful_channel_link}\n\n"
+                f"GUIDE:\n{guide}"
+            )
+        return prompt
+
+    async def stream(self, question: str, lang: str):
+        """Yield the answer in chunks as the model produces it; cached answers come in one chunk."""
+        key = (lang, normalize_question(question))
+        cached = self.cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+        pending = self._in_flight.get(key)
+        if pending is not None:
+            yield await asyncio.shield(pending)
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        parts = []
+        try:
+            async with self.semaphore:
+                if self.client is None:
+                    self.client = shared_openai_client()
+                response = await self.client.chat.completions.create(
+                    model=self.model,
+                    messages=self._messages(question, lang),
+                    stream=True,
+                )
+                async for event in response:
+                    delta = event.choices[0].delta.content if event.choices else None
+                    if delta:
+                        parts.append(delta)
+                        yield delta
+            answer = "".join(parts).strip()
+            self.cache.put(key, answer)
+            future.set_result(answer)
+        except BaseException as e:
+            # Also covers the consumer closing the generator early
+            future.set_exception(e if isinstance(e, Exception) else RuntimeError("stream abandoned"))
+            future.exception()
+            raise
+        finally:
+            del self._in_flight[key]
+
+    def _messages(self, question: str, lang: str) -> list:
+        return [
+            {"role": "system", "content": self.system_prompt(lang)},
+            {"role": "user", "content": question},
+        ]
+
+def embed_text(text: str, dim: int = FAQ_DIM):
+    """Hashed bag of words, 5-letter prefixes and word bigrams.
+
+    Returns the sparse L2-normalized vector as (indices, values). crc32 keeps
+    the hashing stable across processes.
+    """
+    words = normalize_question(text).split()
+    features = words + [w[:5] for w in words if len(w) > 5] + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    if not features:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.float32)
+    hashes = np.fromiter((zlib.crc32(f.encode()) for f in features), dtype=np.uint32, count=len(features))
+    indices, counts = np.unique(hashes % dim, return_counts=True)
+    values = counts.astype(np.float32)
+    values /= np.linalg.norm(values)
+    return indices.astype(np.intp), values
+
+class FaqIndex:
+    """Cosine top-k search over embedded FAQ questions.
+
+    Embeddings live in one (dim, n) float32 matrix, rebuilt lazily after
+    additions. Queries are sparse, so a search reads only the matrix rows of
+    the query's non-zero dimensions.
+    """
+
+    def __init__(self, dim: int = FAQ_DIM, embed=embed_text):
+        self.dim = dim
+        self.embed = embed
+        self.entries = []  # (question, answer, lang)
+        self._vectors = []
+        self._langs = {}   # lang -> small int code
+        self._matrix = None
+        self._lang_codes = None
+        self.pack_langs = set()  # languages whose pack FAQ is in the index
+
+    def add(self, question: str, answer: str, lang: str) -> None:
+        self.entries.append((question, answer, lang))
+        self._vectors.append(self.embed(question, self.dim))
+        self._langs.setdefault(lang, len(self._langs))
+        self._matrix = None
+
+    def _build(self) -> None:
+        n = len(self.entries)
+        matrix = np.zeros((self.dim, n), dtype=np.float32)
+        rows = np.concatenate([indices for indices, _ in self._vectors])
+        cols = np.repeat(np.arange(n), [len(indices) for indices, _ in self._vectors])
+        matrix[rows, cols] = np.concatenate([values for _, values in self._vectors])
+        self._matrix = matrix
+        self._lang_codes = np.fromiter((self._langs[lang] for _, _, lang in self.entries), dtype=np.int16, count=n)
+
+    def search(self, question: str, lang: str = None, k: int = 1) -> list:
+        """Best (score, question, answer) matches, highest score first."""
+        if not self.entries:
+            return []
+        if self._matrix is None:
+            self._build()
+        indices, values = self.embed(question, self.dim)
+        if not len(indices):
+            return []
+        scores = values @ self._matrix[indices]
+        if lang is not None:
+            scores[self._lang_codes != self._langs.get(lang, -1)] = -1.0
+        k = min(k, len(scores))
+        top = np.argpartition(scores, -k)[-k:]
+        top = top[np.argsort(scores[top])[::-1]]
+        return [(float(scores[i]), self.entries[i][0], self.entries[i][1]) for i in top if scores[i] > 0]
+
+def get_faq_index(context: ContextTypes.DEFAULT_TYPE, lang: str = 'en') -> FaqIndex:
+    """Return the application's FAQ index, with staff answers and the FAQ of `lang`'s pack.
+
+    A pack's FAQ is added the first time a question is asked in its language.
+    """
+    index = context.bot_data.get('faq_index')
+    if index is None:
+        index = context.bot_data['faq_index'] = FaqIndex()
+        for entry_lang, question, answer in get_ticket_store(context).faq_entries():
+            index.add(question, answer, entry_lang)
+    if lang not in index.pack_langs and lang in STRINGS:
+        index.pack_langs.add(lang)
+        tenant = get_tenant(context)
+        codes = "\n".join(tenant.game_codes)
+        for phrasings, answer in STRINGS[lang].get('faq', []):
+            answer = answer.format(codes=codes, channel=tenant.helpful_channel_link)
+            for question in phrasings:
+                index.add(question, answer, lang)
+    return index
+
+def get_llm_triage(context: ContextTypes.DEFAULT_TYPE) -> LLMTriage:
+    """Return the application's LLM triage client."""
+    triage = context.bot_data.get('llm_triage')
+    if triage is None:
+        triage = context.bot_data['llm_triage'] = LLMTriage(tenant=get_tenant(context))
+    return triage
+
+# --- UPDATE RECORDING ---
+class UpdateRecorder:
+    """Append-only, gzip-compressed log of incoming updates for replay.py.
+
+    User and chat IDs are replaced by salted hashes (sign kept, so group chats
+    stay negative) and names by placeholders. Each line is
+    {"t": receive time, "update": update dict}; a new segment file starts
+    once the current one reaches RECORD_SEGMENT_BYTES.
+    """
+
+    ANON_KEYS = ('from', 'user', 'chat', 'sender_chat')
+
+    def __init__(self, directory: str, segment_bytes: int = RECORD_SEGMENT_BYTES, salt: bytes = None):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.salt = salt or os.urandom(16)
+        self._file = None
+        self._raw = None
+        self._records = 0
+        self._last_flush = 0.0
+        os.makedirs(directory, exist_ok=True)
+
+    def _open_segment(self) -> None:
+        name = f"updates-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{self._records:010d}.jsonl.gz"
+        self._raw = open(os.path.join(self.directory, name), 'ab')
+        self._file = gzip.GzipFile(fileobj=self._raw, mode='ab')
+
+    def _digest(self, value: str) -> int:
+        return int.from_bytes(hashlib.blake2b(self.salt + value.encode(), digest_size=6).digest(), 'big')
+
+    def anon_id(self, value: int) -> int:
+        anon = self._digest(str(abs(value)))
+        return -anon if value < 0 else anon
+
+    def anonymize(self, data):
+        if isinstance(data, list):
+            return [self.anonymize(item) for item in data]
+        if not isinstance(data, dict):
+            return data
+        result = {}
+        for key, value in data.items():
+            if key in self.ANON_KEYS and isinstance(value, dict):
+                value = dict(value)
+                if 'id' in value:
+                    value['id'] = self.anon_id(value['id'])
+                for name_key in ('first_name', 'last_name', 'title'):
+                    if name_key in value:
+                        value[name_key] = "Anon"
+                if 'username' in value:
+                    value['username'] = f"user{abs(value['id'])}"
+                result[key] = value
+            elif key == 'text' and isinstance(value, str) and value.startswith('@'):
+                result[key] = f"@user{self._digest(value)}"
+            else:
+                result[key] = self.anonymize(value)
+        return result
+
+    def record(self, update_data: dict) -> None:
+        if self._file is None:
+            self._open_segment()
+        line = json.dumps({"t": time.time(), "update": self.anonymize(update_data)}, ensure_ascii=False)
+        self._file.write(line.encode() + b"\n")
+        self._records += 1
+        if self._raw.tell() >= self.segment_bytes:
+            self.close()
+        elif time.monotonic() - self._last_flush >= 1.0:
+            # Bound what a crash can lose without a sync flush per record
+            self.flush()
+
+    def flush(self) -> None:
+        if self._file is not None:
+            self._file.flush()
+            self._last_flush = time.monotonic()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._raw.close()
+            self._file = self._raw = None
+
+async def record_update(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Runs before every other handler when RECORD_UPDATES_DIR is set."""
+    recorder = context.bot_data.get('update_recorder')
+    if recorder is None:
+        recorder = context.bot_data['update_recorder'] = UpdateRecorder(get_tenant(context).record_dir)
+    recorder.record(update.to_dict())
+
+async def close_recorder(application: Application) -> None:
+    """Flush and close the update recording and the trace file."""
+    for name in ('update_recorder', 'tracer'):
+        output = application.bot_data.get(name)
+        if output is not None:
+            output.close()
+
+# --- CONVERSATION TRACING ---
+# Innermost open span of the update being handled, in the update's task and the tasks it starts
+_current_span = contextvars.ContextVar('current_span', default=None)
+
+STATE_NAMES = {
+    SELECT_LANG: 'SELECT_LANG', MAIN_MENU: 'MAIN_MENU', EXISTING_PLAYER_FLOW: 'EXISTING_PLAYER_FLOW',
+    NEW_PLAYER_FLOW: 'NEW_PLAYER_FLOW', SUPPORT_FLOW: 'SUPPORT_FLOW', USERNAME_COLLECTION: 'USERNAME_COLLECTION',
+    ASK_QUESTION: 'ASK_QUESTION', PROOF_INTAKE: 'PROOF_INTAKE', ConversationHandler.END: 'END',
+}
+
+class Span:
+    """One timed operation of a trace; `update` is the update span it belongs to."""
+
+    __slots__ = ('tracer', 'trace_id', 'span_id', 'parent_id', 'name', 'kind', 'start_ns', 'end_ns',
+                 'attributes', 'error', 'update', 'api_ns', 'gateway_ns')
+
+    def __init__(self, tracer, trace_id: str, parent_id, name: str, kind: int, update=None, start_ns: int = None):
+        self.tracer = tracer
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.start_ns = time.time_ns() if start_ns is None else start_ns
+        self.end_ns = None
+        self.attributes = {}
+        self.error = None
+        self.update = update or self
+        self.api_ns = 0  # Bot API calls made while handling the update, gateway waits included
+        self.gateway_ns = 0
+
+    def to_otlp(self) -> dict:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [otlp_attribute(key, value) for key, value in self.attributes.items() if value is not None],
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        if self.error:
+            span["status"] = {"code": 2, "message": self.error}
+        return span
+
+def otlp_attribute(key: str, value) -> dict:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+def annotate_span(attributes: dict) -> None:
+    """Add attributes to the current span, if the update being handled is traced."""
+    span = _current_span.get()
+    if span is not None:
+        span.attributes.update(attributes)
+
+class ConversationTracer:
+    """One trace per conversation, from /start to the ticket, written as OTLP/JSON lines.
+
+    Every update from a private chat is a SERVER span named "update", with a
+    span per handler call and a CLIENT span per Bot API call under it; the gap
+    since the user's previous update is a "user think" span. The trace ID and
+    running totals live in user_data['trace']. When the ticket is submitted,
+    a root "conversation" span covering the whole trace is written with the
+    time split into bot processing, Bot API calls and user think time, and the
+    next update starts a new trace. Each line of the file is an OTLP
+    ExportTraceServiceRequest, as the OpenTelemetry Collector's file exporter
+    writes and its otlpjsonfile receiver reads.
+    """
+
+    INTERNAL, SERVER, CLIENT = 1, 2, 3
+    FLUSH_SPANS = 256
+    FLUSH_SECONDS = 5.0
+
+    def __init__(self, path: str, service_name: str, conv_handler: ConversationHandler):
+        self.path = path
+        self.conv_handler = conv_handler
+        self.resource = {"attributes": [otlp_attribute("service.name", service_name)]}
+        self.pending = []
+        self._last_flush = time.monotonic()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def instrument(self, conv_handler: ConversationHandler) -> None:
+        """Give every handler of the conversation a span of its own."""
+        handlers = [*conv_handler.entry_points, *conv_handler.fallbacks,
+                    *(handler for handlers in conv_handler.states.values() for handler in handlers)]
+        for handler in handlers:
+            handler.callback = self.traced(handler.callback)
+
+    def traced(self, callback):
+        @functools.wraps(callback)
+        async def traced_callback(update, context):
+            if _current_span.get() is None:
+                return await callback(update, context)
+            with self.span(callback.__name__) as span:
+                state = await callback(update, context)
+                span.attributes["conversation.next_state"] = STATE_NAMES.get(state, state)
+                return state
+        return traced_callback
+
+    @contextlib.contextmanager
+    def span(self, name: str, kind: int = INTERNAL, attributes: dict = None):
+        """A child of the current span; Bot API calls also count towards their update's API time."""
+        parent = _current_span.get()
+        span = Span(self, parent.trace_id, parent.span_id, name, kind, parent.update)
+        if attributes:
+            span.attributes.update(attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end_ns = time.time_ns()
+            if kind == self.CLIENT:
+                span.update.api_ns += span.end_ns - span.start_ns
+                span.update.gateway_ns += int(span.attributes.get("gateway.wait_ms", 0) * 1e6)
+            self.pending.append(span)
+
+    def state(self, update: Update):
+        # ConversationHandler keeps no public view of its current states
+        return self.conv_handler._conversations.get((update.effective_chat.id, update.effective_user.id))
+
+    @contextlib.asynccontextmanager
+    async def update_span(self, application: Application, update: Update):
+        """Wrap the handling of one update in a span of its conversation's trace."""
+        user_data = application.user_data[update.effective_user.id]
+        now = time.time_ns()
+        message = update.effective_message
+        command = message.text.split()[0] if message and message.text and message.text.startswith('/') else None
+        trace = user_data.get('trace')
+        if trace is None or command == '/start':
+            trace = user_data['trace'] = {"trace_id": os.urandom(16).hex(), "span_id": os.urandom(8).hex(),
+                                          "start_ns": now, "last_ns": None, "updates": 0,
+                                          "bot_ns": 0, "api_ns": 0, "gateway_ns": 0, "think_ns": 0}
+        if trace["last_ns"] is not None:
+            think = Span(self, trace["trace_id"], trace["span_id"], "user think", self.INTERNAL,
+                         start_ns=trace["last_ns"])
+            think.end_ns = now
+            trace["think_ns"] += now - trace["last_ns"]
+            self.pending.append(think)
+
+        span = Span(self, trace["trace_id"], trace["span_id"], "update", self.SERVER, start_ns=now)
+        span.attributes.update({
+            "telegram.update_id": update.update_id,
+            "telegram.callback_data": update.callback_query.data if update.callback_query else None,
+            "telegram.command": command,
+            "telegram.message_type": (
+                None if message is None or update.callback_query else
+                "photo" if message.photo else "document" if message.document else "text" if message.text else "other"
+            ),
+            "conversation.state": STATE_NAMES.get(self.state(update), self.state(update)),
+        })
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end_ns = time.time_ns()
+            state = self.state(update)
+            span.attributes["conversation.next_state"] = STATE_NAMES.get(state, state)
+            self.pending.append(span)
+            trace["last_ns"] = span.end_ns
+            trace["updates"] += 1
+            trace["bot_ns"] += span.end_ns - span.start_ns - span.api_ns
+            trace["api_ns"] += span.api_ns
+            trace["gateway_ns"] += span.gateway_ns
+            if "ticket_id" in trace:
+                self._end_conversation(user_data.pop('trace'))
+            self.maybe_flush()
+
+    def ticket_submitted(self, user_data: dict, ticket_id: int, flow_type: str) -> None:
+        """End the trace with the update being handled; its conversation span is written then."""
+        trace = user_data.get('trace')
+        if trace is not None and _current_span.get() is not None:
+            trace["ticket_id"] = ticket_id
+            trace["flow_type"] = flow_type
+
+    def _end_conversation(self, trace: dict) -> None:
+        root = Span(self, trace["trace_id"], None, "conversation", self.INTERNAL, start_ns=trace["start_ns"])
+        root.span_id = trace["span_id"]
+        root.end_ns = trace["last_ns"]
+        root.attributes.update({
+            "ticket.id": trace["ticket_id"],
+            "ticket.flow_type": trace["flow_type"],
+            "conversation.updates": trace["updates"],
+            "conversation.bot_ms": round(trace["bot_ns"] / 1e6, 3),
+            "conversation.api_ms": round(trace["api_ns"] / 1e6, 3),
+            "conversation.gateway_wait_ms": round(trace["gateway_ns"] / 1e6, 3),
+            "conversation.think_ms": round(trace["think_ns"] / 1e6, 3),
+        })
+        self.pending.append(root)
+
+    def maybe_flush(self) -> None:
+        if len(self.pending) >= self.FLUSH_SPANS or time.monotonic() - self._last_flush >= self.FLUSH_SECONDS:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write the pending spans as one line."""
+        if self.pending and self._file is not None:
+            request = {"resourceSpans": [{
+                "resource": self.resource,
+                "scopeSpans": [{"scope": {"name": "bot"}, "spans": [span.to_otlp() for span in self.pending]}],
+            }]}
+            self._file.write(json.dumps(request, ensure_ascii=False) + "\n")
+            self._file.flush()
+            self.pending.clear()
+        self._last_flush = time.monotonic()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self.flush()
+            self._file.close()
+            self._file = None
 
 # --- Helper Functions ---
 async def show_main_menu(update: Update, context: ContextTypes.DEFAULT_TYPE, message: str = None):
@@ -290,7 +2013,10 @@ async def show_main_menu(update: Update, context: ContextTypes.DEFAULT_TYPE, mes
         [InlineKeyboardButton(s['new_player_btn'], callback_data="new_player_start")],
         [InlineKeyboardButton(s['existing_player_btn'], callback_data="existing_player_start")],
         [InlineKeyboardButton(s['helpful_channel_btn'], callback_data="helpful_channel")],
+        # Shown without OPENAI_API_KEY too: the FAQ index answers, and support gets what it cannot
+        [InlineKeyboardButton(s['ask_question_btn'], callback_data="ask_question")],
         [InlineKeyboardButton(s['support_btn'], callback_data="contact_support")],
+        [InlineKeyboardButton(s['lang_btn'], callback_data="change_lang")],
     ]
     
     query = update.callback_query
@@ -299,14 +2025,14 @@ async def show_main_menu(update: Update, context: ContextTypes.DEFAULT_TYPE, mes
     if query:
         await query.answer()
         try:
-            await asyncio.sleep(0.3)  # Delay for smooth transition
+            await asyncio.sleep(MENU_DELAY)  # Delay for smooth transition
             await query.edit_message_text(
                 text=text_to_show,
                 reply_markup=InlineKeyboardMarkup(keyboard),
                 parse_mode='Markdown'
             )
         except Exception as e:
-            logger.warning(f"Failed to edit message, might be same as old: {e}")
+            logger.warning("Failed to edit message, might be same as old: %s", e)
     else:
         await update.message.reply_text(
             text=text_to_show,
@@ -315,29 +2041,218 @@ async def show_main_menu(update: Update, context: ContextTypes.DEFAULT_TYPE, mes
         )
     return MAIN_MENU
 
-async def safe_edit_message(query, text, reply_markup=None, parse_mode=None):
-    """Safely edit message with error handling and delay."""
+class EditBreaker:
+    """Outcome counters and circuit breaker for one bot's safe_edit_message calls.
+
+    429s, timeouts and network errors count as the Bot API being degraded.
+    EDIT_BREAKER_THRESHOLD of them in a row open the breaker: for
+    EDIT_BREAKER_COOLDOWN seconds failed edits are neither retried nor
+    replaced by a new message. The first edit after that closes it again if it
+    goes through, or reopens it if it does not.
+    """
+
+    OUTCOMES = ('edited', 'not_modified', 'retry_after', 'timed_out', 'network_error', 'cannot_edit',
+                'rejected', 'fallback_sent', 'fallback_failed', 'fallback_suppressed', 'gave_up')
+
+    def __init__(self, threshold: int = EDIT_BREAKER_THRESHOLD, cooldown: float = EDIT_BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0  # degraded failures in a row
+        self.open_until = 0.0
+        self.opened = 0
+        self.counts = dict.fromkeys(self.OUTCOMES, 0)
+
+    @property
+    def is_open(self) -> bool:
+        return time.monotonic() < self.open_until
+
+    def record(self, outcome: str, degraded: bool = False) -> None:
+        self.counts[outcome] += 1
+        if not degraded:
+            if outcome in ('edited', 'not_modified', 'fallback_sent'):
+                self.failures = 0
+                self.open_until = 0.0
+            return
+        self.failures += 1
+        if self.threshold and self.failures >= self.threshold and not self.is_open:
+            self.open_until = time.monotonic() + self.cooldown
+            self.opened += 1
+            logger.warning("Bot API degraded (%d failed edits in a row); no fallback messages for %ss",
+                           self.failures, self.cooldown)
+
+    def snapshot(self) -> dict:
+        return {
+            "open": self.is_open,
+            "open_seconds": round(max(0.0, self.open_until - time.monotonic()), 3),
+            "opened": self.opened,
+            "failures_in_a_row": self.failures,
+            **self.counts,
+        }
+
+# EditBreaker of the tenant whose update is being handled (set by BotApplication);
+# handlers run outside an Application, as in bench.py, share the default one
+_edit_breaker = contextvars.ContextVar('edit_breaker', default=EditBreaker())
+
+# BadRequest messages for a message that exists but can no longer be edited (too old, deleted, not text)
+CANNOT_EDIT_ERRORS = ("message can't be edited", "message to edit not found", "no text in the message to edit",
+                      "message_id_invalid")
+
+async def safe_edit_message(query, text, reply_markup=None, parse_mode=None, delay=None):
+    """Edit the message behind a callback query, reacting to each kind of failure.
+
+    "Not modified" counts as done. A message that can no longer be edited is
+    replaced by a new one. 429s and network errors are retried after a wait
+    instead, since a new message would fail the same way; see EditBreaker.
+    """
+    await asyncio.sleep(EDIT_DELAY if delay is None else delay)  # Add delay to prevent rapid updates
+    breaker = _edit_breaker.get()
+    for attempt in range(EDIT_RETRIES + 1):
+        try:
+            await query.edit_message_text(
+                text=text,
+                reply_markup=reply_markup,
+                parse_mode=parse_mode
+            )
+            breaker.record('edited')
+            return True
+        except RetryAfter as e:
+            error, retry_after = e, e.retry_after
+            wait = retry_after.total_seconds() if isinstance(retry_after, datetime.timedelta) else retry_after
+            breaker.record('retry_after', degraded=True)
+        except TimedOut as e:
+            # The edit may have gone through anyway; a retry then reports "not modified"
+            error, wait = e, min(EDIT_MAX_RETRY_WAIT, 0.5 * 2 ** attempt)
+            breaker.record('timed_out', degraded=True)
+        except NetworkError as e:
+            if not isinstance(e, BadRequest):
+                error, wait = e, min(EDIT_MAX_RETRY_WAIT, 0.5 * 2 ** attempt)
+                breaker.record('network_error', degraded=True)
+            elif "message is not modified" in e.message.lower():
+                # Double tap, or a retry of an edit that had timed out but landed
+                breaker.record('not_modified')
+                return True
+            elif any(reason in e.message.lower() for reason in CANNOT_EDIT_ERRORS):
+                breaker.record('cannot_edit')
+                break
+            else:
+                # A new message with the same text or keyboard would be rejected too
+                logger.error("Edit rejected: %s", e)
+                breaker.record('rejected')
+                return False
+        except TelegramError as e:
+            # e.g. Forbidden: the user blocked the bot
+            logger.error("Edit failed: %s", e)
+            breaker.record('rejected')
+            return False
+        if breaker.is_open or attempt == EDIT_RETRIES or wait > EDIT_MAX_RETRY_WAIT:
+            logger.warning("Failed to edit message after %d attempt(s): %s", attempt + 1, error)
+            breaker.record('gave_up')
+            return False
+        await asyncio.sleep(wait)
+
+    # Send a new message in place of the one that can no longer be edited
+    if breaker.is_open or query.message is None:
+        breaker.record('fallback_suppressed')
+        return False
     try:
-        await asyncio.sleep(0.5)  # Add delay to prevent rapid updates
-        await query.edit_message_text(
+        await query.message.reply_text(
             text=text,
             reply_markup=reply_markup,
             parse_mode=parse_mode
         )
+        breaker.record('fallback_sent')
         return True
+    except (RetryAfter, NetworkError) as e:
+        logger.error("Failed to send new message: %s", e)
+        breaker.record('fallback_failed', degraded=not isinstance(e, BadRequest))
+        return False
     except Exception as e:
-        logger.warning(f"Failed to edit message: {e}")
-        # Try to send a new message if editing fails
+        logger.error("Failed to send new message: %s", e)
+        breaker.record('fallback_failed')
+        return False
+
+class EditableMessage:
+    """Lets a sent message stand in for a callback query in safe_edit_message."""
+
+    def __init__(self, message):
+        self.message = message
+
+    async def edit_message_text(self, **kwargs):
+        return await self.message.edit_text(**kwargs)
+
+# chat_id -> monotonic time of the last streamed edit, shared by all streams to that chat; oldest first
+_last_stream_edit = OrderedDict()
+MAX_STREAM_CHATS = 10_000
+
+def mark_stream_edit(chat_id) -> None:
+    """Record a streamed edit to chat_id, forgetting the chats that were edited longest ago."""
+    _last_stream_edit[chat_id] = time.monotonic()
+    _last_stream_edit.move_to_end(chat_id)
+    if len(_last_stream_edit) > MAX_STREAM_CHATS:
+        # Evicted entries are far older than any min_interval, so no spacing is lost
+        _last_stream_edit.popitem(last=False)
+
+async def stream_edit_message(query, chunks, reply_markup=None, min_interval=STREAM_EDIT_INTERVAL):
+    """Progressively edit a placeholder message while text chunks arrive.
+
+    Chunks that arrive between two edits are coalesced, edits to one chat are
+    spaced at least min_interval apart, and a final edit through
+    safe_edit_message shows the full text with its keyboard. Returns
+    (seconds until the first text was visible, number of edits).
+    """
+    chat_id = query.message.chat_id
+    started = time.monotonic()
+    parts = []
+    changed = asyncio.Event()
+    finished = False
+
+    async def pump():
+        nonlocal finished
         try:
-            await query.message.reply_text(
-                text=text,
-                reply_markup=reply_markup,
-                parse_mode=parse_mode
-            )
-            return True
-        except Exception as e2:
-            logger.error(f"Failed to send new message: {e2}")
-            return False
+            async for chunk in chunks:
+                parts.append(chunk)
+                changed.set()
+        finally:
+            finished = True
+            changed.set()
+
+    pump_task = asyncio.create_task(pump())
+    first_visible = None
+    edits = 0
+    shown = ""
+    try:
+        while True:
+            await changed.wait()
+            changed.clear()
+            wait = _last_stream_edit.get(chat_id, 0.0) + min_interval - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            if finished:
+                break
+            text = "".join(parts)
+            if not text.strip() or text == shown:
+                continue
+            mark_stream_edit(chat_id)
+            try:
+                await query.edit_message_text(text=text + " ▌")
+            except Exception as e:
+                logger.warning("Failed to edit streamed message: %s", e)
+                continue
+            shown = text
+            edits += 1
+            if first_visible is None:
+                first_visible = time.monotonic() - started
+        await pump_task  # re-raises a failure of the chunk source
+    finally:
+        pump_task.cancel()
+
+    mark_stream_edit(chat_id)
+    await safe_edit_message(query, "".join(parts).strip(), reply_markup, delay=0)
+    edits += 1
+    if first_visible is None:
+        first_visible = time.monotonic() - started
+    logger.info("Streamed reply to chat %s: first text after %.3fs, %d edits", chat_id, first_visible, edits)
+    return first_visible, edits
 
 # --- NEW PLAYER FLOW ---
 async def new_player_start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
@@ -521,6 +2436,7 @@ async def new_cloud_gaming_link(update: Update, context: ContextTypes.DEFAULT_TY
     ]
     
     await safe_edit_message(query, text, InlineKeyboardMarkup(keyboard))
+    await send_guide_media(update, context, 'cloud_gaming_link')
     return NEW_PLAYER_FLOW
 
 async def new_q3_yes(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
@@ -584,6 +2500,7 @@ async def new_epic_activate(update: Update, context: ContextTypes.DEFAULT_TYPE)
     ]
     
     await safe_edit_message(query, text, InlineKeyboardMarkup(keyboard))
+    await send_guide_media(update, context, 'epic_activate_link')
     return NEW_PLAYER_FLOW
 
 async def new_q4_yes(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
@@ -787,11 +2704,12 @@ async def new_q7_no(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     
     lang = context.user_data.get('lang', 'en')
     s = STRINGS[lang]
+    tenant = get_tenant(context)
     
     # Store Q&A
     context.user_data['new_player_qa'].append((s['new_q7_text'], "No"))
     
-    codes_text = "Here are the codes for the reward Island:\n\n" + "\n".join(GAME_CODES)
+    codes_text = "Here are the codes for the reward Island:\n\n" + "\n".join(tenant.game_codes)
     
     keyboard = [
         [InlineKeyboardButton(s['already_chose'], callback_data="new_q8_yes")],
@@ -1009,17 +2927,19 @@ async def new_q12_no(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     
     lang = context.user_data.get('lang', 'en')
     s = STRINGS[lang]
+    tenant = get_tenant(context)
     
     # Store Q&A
     context.user_data['new_player_qa'].append((s['new_q12_text'], "No"))
     
-    text = f"{s['channel_instruction_13']} {HELPFUL_CHANNEL_LINK}"
+    text = f"{s['channel_instruction_13']} {tenant.helpful_channel_link}"
     
     keyboard = [
-        [InlineKeyboardButton(s['join_channel_only'], url=HELPFUL_CHANNEL_LINK)]
+        [InlineKeyboardButton(s['join_channel_only'], url=tenant.helpful_channel_link)]
     ]
     
     await safe_edit_message(query, text, InlineKeyboardMarkup(keyboard))
+    await send_guide_media(update, context, 'channel_instruction_13')
     return NEW_PLAYER_FLOW
 
 async def new_ask_username(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
@@ -1032,8 +2952,7 @@ async def new_ask_username(update: Update, context: ContextTypes.DEFAULT_TYPE) -
     
     context.user_data['flow_type'] = 'new_player'
     
-    await safe_edit_message(query, s['support_q2'], parse_mode='Markdown')
-    return USERNAME_COLLECTION
+    return await prompt_for_text(update, context, s['support_q2'], USERNAME_COLLECTION, parse_mode='Markdown')
 
 async def new_channel_forward(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """New Player - Forward to channel only"""
@@ -1042,11 +2961,12 @@ async def new_channel_forward(update: Update, context: ContextTypes.DEFAULT_TYPE
     
     lang = context.user_data.get('lang', 'en')
     s = STRINGS[lang]
+    tenant = get_tenant(context)
     
-    text = f"{s['channel_guidance']} {HELPFUL_CHANNEL_LINK}"
+    text = f"{s['channel_guidance']} {tenant.helpful_channel_link}"
     
     keyboard = [
-        [InlineKeyboardButton(s['join_channel_only'], url=HELPFUL_CHANNEL_LINK)]
+        [InlineKeyboardButton(s['join_channel_only'], url=tenant.helpful_channel_link)]
     ]
     
     await safe_edit_message(query, text, InlineKeyboardMarkup(keyboard))
@@ -1105,11 +3025,12 @@ async def existing_q1_no(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     
     lang = context.user_data.get('lang', 'en')
     s = STRINGS[lang]
+    tenant = get_tenant(context)
     
     # Store Q&A
     context.user_data['existing_player_qa'].append((context.user_data.get('existing_q1_text'), "No"))
     
-    codes_text = "Here are the codes for the reward Island:\n\n" + "\n".join(GAME_CODES)
+    codes_text = "Here are the codes for the reward Island:\n\n" + "\n".join(tenant.game_codes)
     
     keyboard = [
         [InlineKeyboardButton(s['already_chose'], callback_data="existing_q2_yes")],
@@ -1149,18 +3070,20 @@ async def existing_q2_no(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     
     lang = context.user_data.get('lang', 'en')
     s = STRINGS[lang]
+    tenant = get_tenant(context)
     
     # Store Q&A
     context.user_data['existing_player_qa'].append((s['existing_q2_text'], "No"))
     
-    text = f"{s['channel_instruction_9']} {HELPFUL_CHANNEL_LINK}"
+    text = f"{s['channel_instruction_9']} {tenant.helpful_channel_link}"
     
     keyboard = [
-        [InlineKeyboardButton(s['join_channel_only'], url=HELPFUL_CHANNEL_LINK)],
+        [InlineKeyboardButton(s['join_channel_only'], url=tenant.helpful_channel_link)],
         [InlineKeyboardButton(s['finally_fixed'], callback_data="existing_q3_yes")]
     ]
     
     await safe_edit_message(query, text, InlineKeyboardMarkup(keyboard))
+    await send_guide_media(update, context, 'channel_instruction_9')
     return EXISTING_PLAYER_FLOW
 
 async def existing_q3_yes(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
@@ -1193,18 +3116,20 @@ async def existing_q3_no(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     
     lang = context.user_data.get('lang', 'en')
     s = STRINGS[lang]
+    tenant = get_tenant(context)
     
     # Store Q&A
     context.user_data['existing_player_qa'].append((s['existing_q3_text'], "No"))
     
-    text = f"{s['channel_instruction_10']} {HELPFUL_CHANNEL_LINK}"
+    text = f"{s['channel_instruction_10']} {tenant.helpful_channel_link}"
     
     keyboard = [
-        [InlineKeyboardButton(s['join_channel_only'], url=HELPFUL_CHANNEL_LINK)],
+        [InlineKeyboardButton(s['join_channel_only'], url=tenant.helpful_channel_link)],
         [InlineKeyboardButton(s['a_yes'], callback_data="existing_q4_yes")]
     ]
     
     await safe_edit_message(query, text, InlineKeyboardMarkup(keyboard))
+    await send_guide_media(update, context, 'channel_instruction_10')
     return EXISTING_PLAYER_FLOW
 
 async def existing_q4_yes(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
@@ -1326,17 +3251,19 @@ async def existing_influencer_no(update: Update, context: ContextTypes.DEFAULT_T
     
     lang = context.user_data.get('lang', 'en')
     s = STRINGS[lang]
+    tenant = get_tenant(context)
     
     # Store Q&A
     context.user_data['existing_player_qa'].append((s['existing_q6_text'], "No"))
     
-    text = f"{s['channel_instruction_13']} {HELPFUL_CHANNEL_LINK}"
+    text = f"{s['channel_instruction_13']} {tenant.helpful_channel_link}"
     
     keyboard = [
-        [InlineKeyboardButton(s['join_channel_only'], url=HELPFUL_CHANNEL_LINK)]
+        [InlineKeyboardButton(s['join_channel_only'], url=tenant.helpful_channel_link)]
     ]
     
     await safe_edit_message(query, text, InlineKeyboardMarkup(keyboard))
+    await send_guide_media(update, context, 'channel_instruction_13')
     return EXISTING_PLAYER_FLOW
 
 async def existing_ask_username(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
@@ -1349,8 +3276,7 @@ async def existing_ask_username(update: Update, context: ContextTypes.DEFAULT_TY
     
     context.user_data['flow_type'] = 'existing_player'
     
-    await safe_edit_message(query, s['support_q2'], parse_mode='Markdown')
-    return USERNAME_COLLECTION
+    return await prompt_for_text(update, context, s['support_q2'], USERNAME_COLLECTION, parse_mode='Markdown')
 
 async def existing_channel_instruction_11(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Existing Player - Forward to channel instruction 11"""
@@ -1359,14 +3285,16 @@ async def existing_channel_instruction_11(update: Update, context: ContextTypes.
     
     lang = context.user_data.get('lang', 'en')
     s = STRINGS[lang]
+    tenant = get_tenant(context)
     
-    text = f"{s['channel_instruction_11']} {HELPFUL_CHANNEL_LINK}"
+    text = f"{s['channel_instruction_11']} {tenant.helpful_channel_link}"
     
     keyboard = [
-        [InlineKeyboardButton(s['join_channel_only'], url=HELPFUL_CHANNEL_LINK)]
+        [InlineKeyboardButton(s['join_channel_only'], url=tenant.helpful_channel_link)]
     ]
     
     await safe_edit_message(query, text, InlineKeyboardMarkup(keyboard))
+    await send_guide_media(update, context, 'channel_instruction_11')
     return EXISTING_PLAYER_FLOW
 
 # --- SUPPORT FLOW ---
@@ -1551,6 +3479,7 @@ async def support_cloud_gaming_link(update: Update, context: ContextTypes.DEFAUL
     ]
     
     await safe_edit_message(query, text, InlineKeyboardMarkup(keyboard))
+    await send_guide_media(update, context, 'cloud_gaming_link')
     return SUPPORT_FLOW
 
 async def support_q3_yes(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
@@ -1614,6 +3543,7 @@ async def support_epic_activate(update: Update, context: ContextTypes.DEFAULT_TY
     ]
     
     await safe_edit_message(query, text, InlineKeyboardMarkup(keyboard))
+    await send_guide_media(update, context, 'epic_activate_link')
     return SUPPORT_FLOW
 
 async def support_q4_yes(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
@@ -1817,11 +3747,12 @@ async def support_q7_no(update: Update, context: ContextTypes.DEFAULT_TYPE) -> i
     
     lang = context.user_data.get('lang', 'en')
     s = STRINGS[lang]
+    tenant = get_tenant(context)
     
     # Store Q&A
     context.user_data['support_qa'].append((s['support_q7_text'], "No"))
     
-    codes_text = "Here are the codes for the reward Island:\n\n" + "\n".join(GAME_CODES)
+    codes_text = "Here are the codes for the reward Island:\n\n" + "\n".join(tenant.game_codes)
     
     keyboard = [
         [InlineKeyboardButton(s['already_chose'], callback_data="support_q8_yes")],
@@ -2084,11 +4015,11 @@ async def support_get_username_start(update: Update, context: ContextTypes.DEFAU
     # Store Q&A for Q13 before asking for username
     if context.user_data.get('support_q13_text_key'):
         context.user_data['support_qa'].append((s[context.user_data.get('support_q13_text_key')], "Yes (Ready to send screenshots)"))
+        context.user_data['expects_proofs'] = True
 
     context.user_data['flow_type'] = 'support'
     
-    await safe_edit_message(query, s['support_q2'], parse_mode='Markdown')
-    return USERNAME_COLLECTION
+    return await prompt_for_text(update, context, s['support_q2'], USERNAME_COLLECTION, parse_mode='Markdown')
 
 async def support_channel_only(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Forward to channel only (no back to support or main menu)"""
@@ -2097,34 +4028,462 @@ async def support_channel_only(update: Update, context: ContextTypes.DEFAULT_TYP
     
     lang = context.user_data.get('lang', 'en')
     s = STRINGS[lang]
+    tenant = get_tenant(context)
     
-    text = f"{s['channel_guidance']} {HELPFUL_CHANNEL_LINK}"
+    text = f"{s['channel_guidance']} {tenant.helpful_channel_link}"
     
     keyboard = [
-        [InlineKeyboardButton(s['join_channel_only'], url=HELPFUL_CHANNEL_LINK)]
+        [InlineKeyboardButton(s['join_channel_only'], url=tenant.helpful_channel_link)]
     ]
     
     await safe_edit_message(query, text, InlineKeyboardMarkup(keyboard))
     return SUPPORT_FLOW
 
-# --- Conversation Handlers ---
-async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-    """Entry point: Shows disclaimer and asks for language."""
-    text = (
-        f"{STRINGS['en']['disclaimer']}\n\n"
-        f"{STRINGS['fr']['disclaimer']}\n\n"
-        "------\n\n"
-        f"{STRINGS['en']['lang_prompt']}\n\n"
-        f"{STRINGS['fr']['lang_prompt']}"
-    )
+# --- FREE-TEXT QUESTIONS ---
+async def ask_question_start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Ask the user to type a free-text question."""
+    query = update.callback_query
+    await query.answer()
+    
+    lang = context.user_data.get('lang', 'en')
+    s = STRINGS[lang]
+    
+    keyboard = [
+        [InlineKeyboardButton(s['back_btn'], callback_data="back_to_main")]
+    ]
+    
+    await safe_edit_message(query, s['ask_question_prompt'], InlineKeyboardMarkup(keyboard))
+    return ASK_QUESTION
 
+async def answer_question(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Answer a free-text question from the FAQ, then the LLM; escalate to support otherwise."""
+    lang = context.user_data.get('lang', 'en')
+    s = STRINGS[lang]
+    question = update.message.text
+    
     keyboard = [
-        [
-            InlineKeyboardButton("English 🇬🇧", callback_data="en"),
-            InlineKeyboardButton("Français 🇫🇷", callback_data="fr"),
-        ]
+        [InlineKeyboardButton(s['support_btn'], callback_data="contact_support")],
+        [InlineKeyboardButton(s['back_btn'], callback_data="back_to_main")]
     ]
     
+    matches = get_faq_index(context, lang).search(question, lang)
+    if matches and matches[0][0] >= FAQ_MIN_SCORE:
+        text = matches[0][2]
+    elif LLM_ENABLED:
+        placeholder = await update.message.reply_text(text=s['thinking'])
+        target = EditableMessage(placeholder)
+        try:
+            await stream_edit_message(target, get_llm_triage(context).stream(question, lang), InlineKeyboardMarkup(keyboard))
+        except Exception as e:
+            logger.error("Failed to answer question: %s", e)
+            await safe_edit_message(target, s['ask_question_error'], InlineKeyboardMarkup(keyboard), delay=0)
+        return ASK_QUESTION
+    else:
+        # Low confidence and nobody else to ask: hand the question to the support team
+        context.user_data['question_qa'] = [("Question", question)]
+        context.user_data['flow_type'] = 'question'
+        return await prompt_for_text(update, context, f"{s['question_escalate']}\n\n{s['username_prompt']}",
+                                     USERNAME_COLLECTION, parse_mode='Markdown')
+    
+    await update.message.reply_text(text=text, reply_markup=InlineKeyboardMarkup(keyboard))
+    return ASK_QUESTION
+
+# --- DEEP LINKS ---
+class DeepLinkQuery:
+    """Stands in for a callback query when a deep link runs a button handler from /start.
+
+    There is no bot message to edit yet, so edits are sent as new messages.
+    """
+
+    def __init__(self, message, data: str):
+        self.message = message
+        self.data = data
+
+    async def answer(self, *args, **kwargs):
+        return True
+
+    async def edit_message_text(self, text, reply_markup=None, parse_mode=None, **kwargs):
+        return await self.message.reply_text(text=text, reply_markup=reply_markup, parse_mode=parse_mode)
+
+class DeepLinkUpdate:
+    """The incoming update, with a DeepLinkQuery as its callback query."""
+
+    def __init__(self, update: Update, message, data: str):
+        self._update = update
+        self.callback_query = DeepLinkQuery(message, data)
+
+    def __getattr__(self, name):
+        return getattr(self._update, name)
+
+def resolve_deep_links(conv_handler: ConversationHandler) -> dict:
+    """Check every DEEP_LINKS target against the flow graph; payload -> (callback, callback_data)."""
+    links = {}
+    for payload, (data, state) in DEEP_LINKS.items():
+        handler = next(
+            (h for h in conv_handler.states.get(state, [])
+             if isinstance(h, CallbackQueryHandler) and h.pattern and h.pattern.match(data)),
+            None
+        )
+        if handler is None:
+            raise ValueError(f"Deep link {payload!r}: no handler for {data!r} in state {state}")
+        links[payload] = (handler.callback, data)
+    return links
+
+async def follow_deep_link(update: Update, context: ContextTypes.DEFAULT_TYPE, message, payload: str) -> int:
+    """Show the disclaimer, then run the deep link's target handler as if its button was pressed."""
+    callback, data = context.bot_data['deep_links'][payload]
+    s = STRINGS[context.user_data['lang']]
+    await message.reply_text(text=s['disclaimer'], parse_mode='Markdown')
+    
+    for key in ('new_player_qa', 'existing_player_qa', 'support_qa'):
+        context.user_data[key] = []
+    # Buttons signed by the target handler record the history as it is replaced below
+    context.user_data['deep_link'] = payload
+    try:
+        state = await callback(DeepLinkUpdate(update, message, data), context)
+    finally:
+        context.user_data.pop('deep_link', None)
+    
+    # The target handler records "Yes" to the previous question; the user never answered it
+    for key in ('new_player_qa', 'existing_player_qa', 'support_qa'):
+        if context.user_data.get(key):
+            context.user_data[key] = [("Started from link", payload)]
+    return state
+
+# --- STATELESS CONVERSATIONS ---
+# The user whose update is being handled, for SignedCallbackBot: (codec, user ID, user_data)
+_signing_for = contextvars.ContextVar('signing_for', default=None)
+
+# The flow whose answers a state records
+FLOW_STATES = {NEW_PLAYER_FLOW: 'new_player', EXISTING_PLAYER_FLOW: 'existing_player', SUPPORT_FLOW: 'support'}
+FLOW_TYPES = (None, 'new_player', 'existing_player', 'support', 'question')
+# States that wait for typed text; their prompt carries the token in a link instead of a button
+TEXT_PROMPT_STATES = (USERNAME_COLLECTION,)
+
+def literal_callback_data(pattern: re.Pattern) -> list:
+    """The callback_data a pattern like ^a$ or ^(a|b)$ matches, or [] for any other pattern."""
+    match = re.fullmatch(r"\^\(?((?:[\w-]|\\.)+(?:\|(?:[\w-]|\\.)+)*)\)?\$", pattern.pattern)
+    if not match:
+        return []
+    return [data for data in (re.sub(r"\\(.)", r"\1", part) for part in match.group(1).split('|'))
+            if pattern.fullmatch(data)]
+
+class CallbackCodec:
+    """Packs a user's place in the conversation into signed callback_data.
+
+    A token is "~" and URL-safe base64 of: the button's action, flow type and
+    flags, language, pending deep link, which *_text_key entries are set, one
+    byte per recorded answer, and an HMAC over all of it and the user's ID.
+    Actions and answers are indexes into tables built from the conversation
+    handler and STRINGS, so replicas must run the same code and packs. The
+    tables are hashed into the key: a token from another build fails the
+    check instead of being misread.
+    """
+
+    PREFIX = "~"
+    TAG_BYTES = 8
+    MAX_BYTES = 47  # base64 of 47 bytes, plus the prefix, fills callback_data's 64 bytes
+    MAX_ANSWERS = MAX_BYTES - 6 - TAG_BYTES
+    EXPECTS_PROOFS = 0x08
+    TRUNCATED = 0x10
+    MAX_QUESTION = 512  # characters of an escalated question kept in a prompt link
+
+    def __init__(self, secret: bytes, conversation: ConversationHandler):
+        self.conversation = conversation
+        self.actions = []  # callback_data, or "" for a text prompt
+        self.states = []   # state the action is handled in
+        for state, handlers in conversation.states.items():
+            for handler in handlers:
+                if isinstance(handler, CallbackQueryHandler) and isinstance(handler.pattern, re.Pattern):
+                    for data in literal_callback_data(handler.pattern):
+                        if data not in self.actions:
+                            self.actions.append(data)
+                            self.states.append(state)
+        for state in TEXT_PROMPT_STATES:
+            self.actions.append("")
+            self.states.append(state)
+        if len(self.actions) > 256:
+            raise ValueError(f"{len(self.actions)} callback actions do not fit in one byte")
+        self._action_index = {data: i for i, data in enumerate(self.actions) if data}
+        self._prompt_index = {self.states[i]: i for i, data in enumerate(self.actions) if not data}
+
+        self.langs = list(STRINGS)
+        self.links = sorted(DEEP_LINKS)
+        self.first_questions = {}  # flow -> where its question 1 text comes from
+        self.answers = []          # (question, answer); question is ('key'|'intro'|'text', value)
+        for flow, prefix in FLOW_QUESTION_PREFIXES.items():
+            for n in itertools.count(1):
+                if f"{prefix}q{n}_text" in STRINGS['en']:
+                    question = ('key', f"{prefix}q{n}_text")
+                elif n == 1:
+                    question = ('intro', f"{flow}_intro")
+                else:
+                    break
+                self.first_questions.setdefault(flow, question)
+                self.answers += [(question, "Yes"), (question, "No")]
+        self.answers += [
+            (('key', 'support_q13_text'), "Yes (Ready to send screenshots)"),
+            (('text', "VPN Reminder - Did you finally use VPN?"), "Yes"),
+            (('text', "Cloud Gaming Reminder"), "Already have profile"),
+        ]
+        self.answers += [(('text', "Started from link"), payload) for payload in self.links]
+        if len(self.answers) > 256:
+            raise ValueError(f"{len(self.answers)} recorded answers do not fit in one byte")
+        self._answer_codes = {}  # lang -> {(question text, answer): index}
+
+        tables = json.dumps([self.actions, self.states, self.langs, self.links, self.answers])
+        self.key = hmac.new(secret, tables.encode(), hashlib.sha256).digest()
+
+    @staticmethod
+    def question_text(question: tuple, s: dict) -> str:
+        kind, value = question
+        if kind == 'key':
+            return s[value]
+        if kind == 'intro':
+            return s[value].split('\n')[-1]
+        return value
+
+    def answer_codes(self, lang: str) -> dict:
+        codes = self._answer_codes.get(lang)
+        if codes is None:
+            s = STRINGS[lang]
+            codes = self._answer_codes[lang] = {
+                (self.question_text(question, s), answer): i for i, (question, answer) in enumerate(self.answers)
+            }
+        return codes
+
+    def _tag(self, user_id: int, payload: bytes, extra: str) -> bytes:
+        message = user_id.to_bytes(8, 'big', signed=True) + payload + extra.encode()
+        return hmac.new(self.key, message, hashlib.sha256).digest()[:self.TAG_BYTES]
+
+    @staticmethod
+    def _flow(state: int, flow_type: str):
+        return FLOW_STATES.get(state) or (flow_type if state in TEXT_PROMPT_STATES else None)
+
+    def encode(self, action: int, user_id: int, user_data: dict, extra: str = "") -> str:
+        """Token (without the prefix) for pressing `action` with `user_data` as it is now."""
+        flow_type = user_data.get('flow_type')
+        flow = self._flow(self.states[action], flow_type)
+        lang = user_data.get('lang')
+        flags = FLOW_TYPES.index(flow_type) if flow_type in FLOW_TYPES else 0
+        if user_data.get('expects_proofs'):
+            flags |= self.EXPECTS_PROOFS
+        mask, codes = 0, []
+        prefix = FLOW_QUESTION_PREFIXES.get(flow)
+        if prefix:
+            for n in range(1, 17):
+                if user_data.get(f"{prefix}q{n}_text_key"):
+                    mask |= 1 << (n - 1)
+            history = user_data.get(f"{flow}_qa") or []
+            if history and user_data.get('deep_link'):
+                # follow_deep_link replaces the history this way once the target handler returns
+                history = [("Started from link", user_data['deep_link'])]
+            lookup = self.answer_codes(lang if lang in STRINGS else 'en')
+            for question, answer in history:
+                code = lookup.get((question, answer))
+                if code is None:
+                    logger.warning("Stateless mode: answer %r to %r has no code, dropped", answer, question[:40])
+                else:
+                    codes.append(code)
+            if len(codes) > self.MAX_ANSWERS:
+                # The latest answers decide the ticket's score; the oldest go
+                codes = codes[-self.MAX_ANSWERS:]
+                flags |= self.TRUNCATED
+        link = user_data.get('pending_link')
+        payload = bytes([
+            action, flags,
+            self.langs.index(lang) if lang in self.langs else 255,
+            self.links.index(link) + 1 if link in self.links else 0,
+        ]) + mask.to_bytes(2, 'big') + bytes(codes)
+        token = payload + self._tag(user_id, payload, extra)
+        return base64.urlsafe_b64encode(token).rstrip(b'=').decode()
+
+    def decode(self, token: str, user_id: int, extra: str = ""):
+        """(callback_data, state, user_data) from a token, or None unless this build signed it for this user."""
+        try:
+            raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        except ValueError:
+            return None
+        payload, tag = raw[:-self.TAG_BYTES], raw[-self.TAG_BYTES:]
+        if len(payload) < 6 or not hmac.compare_digest(tag, self._tag(user_id, payload, extra)):
+            return None
+        action, flags, lang_index, link = payload[:4]
+        mask = int.from_bytes(payload[4:6], 'big')
+        state = self.states[action]
+
+        user_data = {}
+        if lang_index < len(self.langs):
+            user_data['lang'] = self.langs[lang_index]
+        flow_type = FLOW_TYPES[flags & 0x07]
+        if flow_type:
+            user_data['flow_type'] = flow_type
+        if flags & self.EXPECTS_PROOFS:
+            user_data['expects_proofs'] = True
+        if link:
+            user_data['pending_link'] = self.links[link - 1]
+        flow = self._flow(state, flow_type)
+        prefix = FLOW_QUESTION_PREFIXES.get(flow)
+        if prefix:
+            s = STRINGS[user_data.get('lang', 'en')]
+            user_data[f"{prefix}q1_text"] = self.question_text(self.first_questions[flow], s)
+            for n in range(1, 17):
+                if mask & (1 << (n - 1)):
+                    user_data[f"{prefix}q{n}_text_key"] = f"{prefix}q{n}_text"
+            user_data[f"{flow}_qa"] = [(self.question_text(question, s), answer)
+                                       for question, answer in (self.answers[code] for code in payload[6:])]
+            if flags & self.TRUNCATED:
+                logger.info("Stateless mode: user %s's oldest answers did not fit in the button", user_id)
+        elif flow == 'question' and extra:
+            user_data['question_qa'] = [("Question", extra)]
+        return self.actions[action], state, user_data
+
+    def sign_keyboard(self, markup: InlineKeyboardMarkup, user_id: int, user_data: dict) -> InlineKeyboardMarkup:
+        """A copy of markup whose conversation buttons carry tokens; other buttons are kept as they are."""
+        return InlineKeyboardMarkup([
+            [InlineKeyboardButton(button.text, callback_data=self.PREFIX + self.encode(
+                self._action_index[button.callback_data], user_id, user_data))
+             if isinstance(button.callback_data, str) and button.callback_data in self._action_index else button
+             for button in row]
+            for row in markup.inline_keyboard
+        ])
+
+    def prompt_link(self, bot_username: str, user_id: int, user_data: dict, state: int) -> str:
+        """t.me link carrying the token for a text prompt that enters `state`."""
+        extra = ""
+        if user_data.get('flow_type') == 'question' and user_data.get('question_qa'):
+            extra = user_data['question_qa'][0][1][:self.MAX_QUESTION]
+        query = {'start': self.encode(self._prompt_index[state], user_id, user_data, extra)}
+        if extra:
+            query['q'] = extra
+        return f"https://t.me/{bot_username}?{urllib.parse.urlencode(query)}"
+
+    def read_prompt_link(self, message, bot_username: str, user_id: int):
+        """decode() the prompt link in a message the user replied to, or None."""
+        prefix = f"https://t.me/{bot_username}?"
+        for entity in message.entities or ():
+            if entity.type == MessageEntity.TEXT_LINK and (entity.url or "").startswith(prefix):
+                query = urllib.parse.parse_qs(urllib.parse.urlsplit(entity.url).query)
+                if 'start' in query:
+                    return self.decode(query['start'][0], user_id, query.get('q', [""])[0])
+        return None
+
+    @staticmethod
+    def owns(key: str) -> bool:
+        """Whether a user_data key is carried in tokens (and replaced when one is restored)."""
+        return (key in ('lang', 'flow_type', 'expects_proofs', 'pending_link')
+                or key.endswith(('_qa', '_q1_text', '_text_key')))
+
+    async def restore(self, application: Application, update: Update):
+        """Load the conversation a signed button or prompt carries; the update to handle, or None to drop it."""
+        user, chat = update.effective_user, update.effective_chat
+        if user is None or chat is None:
+            return update
+        decoded = None
+        query = update.callback_query
+        if query and isinstance(query.data, str) and query.data.startswith(self.PREFIX):
+            decoded = self.decode(query.data[len(self.PREFIX):], user.id)
+            if decoded is None:
+                logger.warning("Rejected callback_data with a bad signature from user %s", user.id)
+                await query.answer()
+                return None
+            data = update.to_dict()
+            data['callback_query']['data'] = decoded[0]
+            update = Update.de_json(data, application.bot)
+        elif update.message and update.message.reply_to_message:
+            decoded = self.read_prompt_link(update.message.reply_to_message, application.bot.username, user.id)
+
+        user_data = application.user_data[user.id]
+        if decoded is not None:
+            _, state, restored = decoded
+            for key in [key for key in user_data if self.owns(key)]:
+                del user_data[key]
+            user_data.update(restored)
+            # ConversationHandler has no public way to set a conversation's state
+            self.conversation._conversations[(chat.id, user.id)] = state
+        _signing_for.set((self, user.id, user_data))
+        return update
+
+class SignedCallbackBot(ExtBot):
+    """ExtBot that signs the buttons it sends while a user's update is handled in stateless mode.
+
+    Its Bot API calls are also spans of the update's trace when TRACE_FILE is set.
+    """
+
+    __slots__ = ()
+
+    async def _do_post(self, endpoint, data, **kwargs):
+        span = _current_span.get()
+        if span is None:
+            return await super()._do_post(endpoint, data, **kwargs)
+        with span.tracer.span(f"telegram.{endpoint}", ConversationTracer.CLIENT, {"rpc.method": endpoint}):
+            return await super()._do_post(endpoint, data, **kwargs)
+
+    def _replace_keyboard(self, reply_markup):
+        reply_markup = super()._replace_keyboard(reply_markup)
+        signing = _signing_for.get()
+        if signing is not None and isinstance(reply_markup, InlineKeyboardMarkup):
+            codec, user_id, user_data = signing
+            return codec.sign_keyboard(reply_markup, user_id, user_data)
+        return reply_markup
+
+async def prompt_for_text(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str, state: int,
+                          parse_mode: str = None) -> int:
+    """Ask the user to type an answer, then wait for it in `state`.
+
+    In stateless mode the typed answer carries no callback_data, so the prompt
+    is sent as a ForceReply message with the conversation in a hidden link;
+    whichever replica gets the reply restores it from there.
+    """
+    codec = context.bot_data.get('callback_codec')
+    query = update.callback_query
+    if codec is None:
+        if query:
+            await safe_edit_message(query, text, parse_mode=parse_mode)
+        else:
+            await update.message.reply_text(text=text, parse_mode=parse_mode)
+        return state
+    link = codec.prompt_link(context.bot.username, update.effective_user.id, context.user_data, state)
+    await update.effective_message.reply_text(
+        text=f"{text}[\u200b]({link})",
+        parse_mode='Markdown',
+        reply_markup=ForceReply(input_field_placeholder="@username"),
+        disable_web_page_preview=True
+    )
+    return state
+
+# --- Conversation Handlers ---
+def detect_language(update: Update):
+    """Map Telegram's language_code (e.g. 'fr', 'fr-CA') to a supported language, or None."""
+    user = update.effective_user
+    code = (user.language_code or '').split('-')[0].lower() if user else ''
+    return code if code in STRINGS else None
+
+async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Entry point: skips the language screen when the language is known or detectable."""
+    lang = context.user_data.get('lang') or detect_language(update)
+    payload = context.args[0] if context.args else None
+    if payload not in context.bot_data.get('deep_links', {}):
+        payload = None
+    if update.callback_query or not lang:
+        # Remember the link so it can be followed once the language is chosen
+        context.user_data['pending_link'] = payload
+        return await show_language_picker(update, context)
+    
+    context.user_data['lang'] = lang
+    if payload:
+        return await follow_deep_link(update, context, update.message, payload)
+    s = STRINGS[lang]
+    return await show_main_menu(update, context, message=f"{s['disclaimer']}\n\n{s['welcome']}")
+
+async def show_language_picker(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Shows disclaimer and asks for language."""
+    # Only the English pack is loaded here; every other language shows just its prompt
+    prompts = "\n".join(dict.fromkeys(STRINGS.prompts[code] for code in STRINGS if STRINGS.prompts[code]))
+    text = f"{STRINGS['en']['disclaimer']}\n\n------\n\n{prompts}"
+
+    buttons = [InlineKeyboardButton(STRINGS.names[code], callback_data=code) for code in STRINGS]
+    keyboard = [buttons[i:i + 2] for i in range(0, len(buttons), 2)]
+    
     query = update.callback_query
     if query:
         await query.answer()
@@ -2150,18 +4509,23 @@ async def set_language(update: Update, context: ContextTypes.DEFAULT_TYPE) -> in
     lang = query.data
     context.user_data['lang'] = lang
     
-    return await show_main_menu(update, context)
+    payload = context.user_data.pop('pending_link', None)
+    if payload:
+        return await follow_deep_link(update, context, query.message, payload)
+    s = STRINGS[lang]
+    return await show_main_menu(update, context, message=f"{s['disclaimer']}\n\n{s['welcome']}")
 
 async def show_helpful_channel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Shows the helpful channel link."""
     lang = context.user_data.get('lang', 'en')
     s = STRINGS[lang]
+    tenant = get_tenant(context)
     
     query = update.callback_query
     await query.answer()
 
     keyboard = [
-        [InlineKeyboardButton(s['join_channel_btn'], url=HELPFUL_CHANNEL_LINK)],
+        [InlineKeyboardButton(s['join_channel_btn'], url=tenant.helpful_channel_link)],
         [InlineKeyboardButton(s['back_btn'], callback_data="back_to_main")]
     ]
     await safe_edit_message(
@@ -2176,17 +4540,19 @@ async def collect_username(update: Update, context: ContextTypes.DEFAULT_TYPE) -
     """Collect username and send Q&A to support team"""
     lang = context.user_data.get('lang', 'en')
     s = STRINGS[lang]
+    tenant = get_tenant(context)
     
     username = update.message.text
     
     if username.startswith('@') and len(username) > 2:
-        logger.info(f"*** USERNAME COLLECTION from user {update.message.from_user.id}: {username} ***")
+        logger.debug("Username collected from user %s", update.message.from_user.id)
         
-        if not SUPPORT_CHAT_ID:
-            logger.error("SUPPORT_CHAT_ID is not set in environment variables")
+        if not tenant.support_chat_id:
+            logger.error("SUPPORT_CHAT_ID is not set for tenant %s", tenant.name)
             await update.message.reply_text("❌ Support feature is currently unavailable. Please try again later.")
             return await show_main_menu(update, context)
         
+        ticket_id = None
         try:
             user = update.effective_user
             user_username = user.username if user.username else "No username"
@@ -2206,49 +4572,167 @@ async def collect_username(update: Update, context: ContextTypes.DEFAULT_TYPE) -
             elif flow_type == 'support':
                 qa_data = context.user_data.get('support_qa', [])
                 flow_title = "🆘 SUPPORT REQUEST"
+            elif flow_type == 'question':
+                qa_data = context.user_data.get('question_qa', [])
+                flow_title = "❓ USER QUESTION"
             
-            support_message = (
-                f"🚨 **{flow_title}** 🚨\n"
-                f"👤 User: {first_name} {last_name}\n"
-                f"📛 User's Telegram: @{user_username}\n"
-                f"💬 Provided Username: {username}\n"
-                f"🆔 User ID: `{user.id}`\n"
-                f"⏰ Time: {update.message.date.strftime('%Y-%m-%d %H:%M:%S')}\n"
-                f"🌐 Language: {lang.upper()}\n\n"
-            )
+            # Resolve question keys to their display text once, for the store and the message
+            qa_pairs = []
+            for question, answer in qa_data:
+                q_text = STRINGS.get(lang, STRINGS['en']).get(question, question)
+                qa_pairs.append((q_text.split('\n')[-1].strip(), answer))
+
+            store = get_ticket_store(context)
+            # Set when a drain cut this update short after storing its ticket: recover()
+            # has delivered that ticket since, so finish the step without posting it again
+            ticket_id = store.ticket_for_update(update.update_id, user.id)
+            if ticket_id is None:
+                admission = get_ticket_admission(context)
+                fingerprint = admission.fingerprint(user.id, username, qa_pairs)
+                verdict, existing_ticket_id = admission.check(fingerprint, user.id)
+                if verdict != 'ok':
+                    logger.info("Ticket from user %s not posted: %s", user.id, verdict)
+                    context.user_data.pop('existing_player_qa', None)
+                    context.user_data.pop('new_player_qa', None)
+                    context.user_data.pop('support_qa', None)
+                    context.user_data.pop('question_qa', None)
+                    if verdict == 'duplicate':
+                        text = s['ticket_duplicate'].format(ticket_id=existing_ticket_id)
+                    else:
+                        text = s['ticket_throttled']
+                    await update.message.reply_text(text=text, reply_markup=ReplyKeyboardRemove())
+                    return await show_main_menu(update, context)
+
+                ticket_queue = get_ticket_queue(context)
+                score, complete = score_ticket(flow_type, qa_pairs, lang)
+                ticket_id = store.add_ticket(user.id, username, flow_type, lang, qa_pairs, score, complete,
+                                             update.update_id)
+                ticket_queue.push(ticket_id, score, complete)
+
+                support_message = (
+                    f"🚨 **{flow_title}** 🚨\n"
+                    f"🎫 Ticket: #{ticket_id}\n"
+                    f"👤 User: {first_name} {last_name}\n"
+                    f"📛 User's Telegram: @{user_username}\n"
+                    f"💬 Provided Username: {username}\n"
+                    f"🆔 User ID: `{user.id}`\n"
+                    f"⏰ Time: {update.message.date.strftime('%Y-%m-%d %H:%M:%S')}\n"
+                    f"🌐 Language: {lang.upper()}\n"
+                    f"📊 Eligibility: {score}/100{' ✅ complete' if complete else ''}\n\n"
+                )
             
-            if qa_data:
-                support_message += "**Questions & Answers:**\n"
-                for i, (question, answer) in enumerate(qa_data, 1):
-                    # Check if question is a full string or a key, display gracefully
-                    q_text = STRINGS.get(lang, STRINGS['en']).get(question, question)
-                    support_message += f"{i}. {q_text.split('\n')[-1].strip()}\n   ➤ **{answer}**\n\n"
-            else:
-                support_message += "**No Q&A data collected.**\n\n"
+                if qa_pairs:
+                    support_message += "**Questions & Answers:**\n"
+                    for i, (question, answer) in enumerate(qa_pairs, 1):
+                        support_message += f"{i}. {question}\n   ➤ **{answer}**\n\n"
+                else:
+                    support_message += "**No Q&A data collected.**\n\n"
             
-            support_message += f"**Flow Type:** {flow_type.replace('_', ' ').title()}"
+                support_message += f"**Flow Type:** {flow_type.replace('_', ' ').title()}"
             
-            await context.bot.send_message(
-                chat_id=SUPPORT_CHAT_ID,
-                text=support_message,
-                parse_mode='Markdown'
-            )
+                sent = await context.bot.send_message(
+                    chat_id=tenant.support_chat_id,
+                    text=support_message,
+                    parse_mode='Markdown',
+                    reply_markup=ticket_keyboard(ticket_id)
+                )
+                store.mark_delivery(ticket_id, 'sent', sent.message_id)
+                admission.record(fingerprint, user.id, ticket_id)
+                if 'tracer' in context.bot_data:
+                    context.bot_data['tracer'].ticket_submitted(context.user_data, ticket_id, flow_type)
+            else:
+                logger.info("Update %s already opened ticket #%s, not posting it again", update.update_id, ticket_id)
             
             # Clear QA data after submission
             context.user_data.pop('existing_player_qa', None)
             context.user_data.pop('new_player_qa', None)
             context.user_data.pop('support_qa', None)
+            context.user_data.pop('question_qa', None)
+
+            # proof_ticket_id is all that is left of expects_proofs when the first try was cut short
+            if flow_type == 'support' and (context.user_data.pop('expects_proofs', False)
+                                           or context.user_data.get('proof_ticket_id') == ticket_id):
+                context.user_data['proof_ticket_id'] = ticket_id
+                await update.message.reply_text(
+                    text=s['proof_request'].format(ticket_id=ticket_id), reply_markup=proof_keyboard(s)
+                )
+                return PROOF_INTAKE
             
             await update.message.reply_text(text=s['support_thanks'], reply_markup=ReplyKeyboardRemove())
             return await show_main_menu(update, context)
             
         except Exception as e:
-            logger.error(f"Error sending support message to group: {e}")
+            logger.error("Error sending support message to group: %s", e)
+            if ticket_id is not None:
+                # The user is asked to try again, so this one must not be re-sent on restart
+                get_ticket_store(context).mark_delivery(ticket_id, 'failed')
             await update.message.reply_text("❌ There was an error sending your information. Please try again later.")
             return await show_main_menu(update, context)
     else:
-        await update.message.reply_text(text=s['invalid_username'])
-        return USERNAME_COLLECTION
+        return await prompt_for_text(update, context, s['invalid_username'], USERNAME_COLLECTION)
+
+def proof_keyboard(s: dict) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup([[InlineKeyboardButton(s['proof_done_btn'], callback_data="proofs_done")]])
+
+async def receive_proof(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Attach a photo or document the user sent to their ticket."""
+    lang = context.user_data.get('lang', 'en')
+    s = STRINGS[lang]
+    message = update.message
+
+    ticket_id = context.user_data.get('proof_ticket_id')
+    if ticket_id is None:
+        return await show_main_menu(update, context)
+    sent = message.photo[-1] if message.photo else message.document
+    added = get_proof_forwarder(context).add(
+        ticket_id, 'photo' if message.photo else 'document', sent.file_id, sent.file_unique_id
+    )
+    if added and Image is not None:
+        # A medium size is plenty for a 9x8 hash; documents are hashed from their thumbnail when they have one
+        if message.photo:
+            hash_source = next((size for size in message.photo if min(size.width, size.height) >= 320), sent)
+        else:
+            is_image = (sent.mime_type or '').startswith('image/') and (sent.file_size or 0) <= 5 * 1024 * 1024
+            hash_source = sent.thumbnail or (sent if is_image else None)
+        if hash_source:
+            context.application.create_task(
+                check_proof_reuse(context, ticket_id, update.effective_user.id, hash_source.file_id,
+                                  sent.file_unique_id),
+                update=update,
+            )
+
+    # An album arrives as one update per picture: acknowledge it once
+    album = message.media_group_id
+    if album and album == context.user_data.get('proof_album'):
+        return PROOF_INTAKE
+    context.user_data['proof_album'] = album
+    await message.reply_text(text=s['proof_received'] if added else s['proof_duplicate'],
+                             reply_markup=proof_keyboard(s))
+    return PROOF_INTAKE
+
+async def proof_text(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Text while waiting for proofs."""
+    s = STRINGS[context.user_data.get('lang', 'en')]
+    await update.message.reply_text(text=s['proof_only_media'], reply_markup=proof_keyboard(s))
+    return PROOF_INTAKE
+
+async def proofs_done(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Forward the remaining proofs now and return to the main menu."""
+    lang = context.user_data.get('lang', 'en')
+    s = STRINGS[lang]
+
+    ticket_id = context.user_data.pop('proof_ticket_id', None)
+    context.user_data.pop('proof_album', None)
+    if ticket_id is None:
+        return await show_main_menu(update, context)
+    try:
+        await get_proof_forwarder(context).flush(ticket_id)
+    except Exception as e:
+        # Still stored with the ticket; recover() forwards it after the next restart
+        logger.error("Could not forward proofs of ticket #%s: %s", ticket_id, e)
+    count = get_ticket_store(context).proof_count(ticket_id)
+    thanks = s['proof_thanks'].format(count=count, ticket_id=ticket_id)
+    return await show_main_menu(update, context, message=f"{thanks}\n\n{s['welcome']}")
 
 async def cancel_support(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """User types /cancel during the support flow."""
@@ -2258,26 +4742,493 @@ async def cancel_support(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     await update.message.reply_text(text=s['support_cancel'], reply_markup=ReplyKeyboardRemove())
     return await show_main_menu(update, context)
 
-def main() -> None:
-    """Run the bot."""
-    if not TELEGRAM_TOKEN:
-        logger.error("TELEGRAM_TOKEN environment variable not set!")
-        print("❌ ERROR: TELEGRAM_TOKEN environment variable is required!")
+# --- SUPPORT CHAT COMMANDS ---
+async def ticket_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """/ticket <id> - show a stored ticket in the support chat."""
+    if not context.args or not context.args[0].lstrip('#').isdigit():
+        await update.message.reply_text("Usage: /ticket <id>")
+        return
+    ticket = get_ticket_store(context).get_ticket(int(context.args[0].lstrip('#')))
+    if not ticket:
+        await update.message.reply_text("Ticket not found.")
+        return
+    text = format_ticket(ticket)
+    for reused_ticket_id, distance in get_ticket_store(context).reused_proofs(ticket['id']):
+        text += f"\n⚠️ Proof may be reused from ticket #{reused_ticket_id} ({distance}/64 bits differ)"
+    await update.message.reply_text(text)
+
+async def search_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """/search <text> - full-text search over stored tickets."""
+    if not context.args:
+        await update.message.reply_text("Usage: /search <text>")
+        return
+    tickets = get_ticket_store(context).search(" ".join(context.args))
+    if not tickets:
+        await update.message.reply_text("No matching tickets.")
+        return
+    lines = [
+        f"#{t['id']} · {t['provided_username']} · {t['flow_type']} · user {t['user_id']}"
+        for t in tickets
+    ]
+    await update.message.reply_text("\n".join(lines))
+
+async def answer_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """/answer <id> <text> - reply to a user's question and add it to the FAQ."""
+    if len(context.args) < 2 or not context.args[0].lstrip('#').isdigit():
+        await update.message.reply_text("Usage: /answer <id> <text>")
+        return
+    ticket = get_ticket_store(context).get_ticket(int(context.args[0].lstrip('#')))
+    if not ticket:
+        await update.message.reply_text("Ticket not found.")
         return
+    answer = " ".join(context.args[1:])
+    s = STRINGS.get(ticket['lang'], STRINGS['en'])
+    await context.bot.send_message(chat_id=ticket['user_id'], text=s['support_reply'].format(answer=answer))
+    
+    if ticket['flow_type'] == 'question':
+        question = ticket['qa'][0][1]
+        get_ticket_store(context).add_faq_entry(ticket['id'], ticket['lang'], question, answer)
+        get_faq_index(context).add(question, answer, ticket['lang'])
+    await update.message.reply_text(f"Answer sent for ticket #{ticket['id']}.")
 
-    application = Application.builder().token(TELEGRAM_TOKEN).build()
+async def next_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """/next - claim the highest-priority open ticket."""
+    staff = update.effective_user
+    ticket = get_ticket_queue(context).claim_next(staff.id, staff.first_name)
+    if not ticket:
+        await update.message.reply_text("No open tickets.")
+        return
+    get_ticket_message_editor(context).mark(ticket['id'])
+    left = get_ticket_store(context).open_ticket_count()
+    await update.message.reply_text(
+        f"📥 Claimed by {staff.first_name} ({left} open left)\n\n{format_ticket(ticket)}",
+        reply_markup=ticket_keyboard(ticket['id'], ticket['status'], ticket['claimed_by_name']),
+    )
+
+async def ticket_button(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Claim / Resolved / Reject buttons under ticket messages in the support group."""
+    query = update.callback_query
+    if str(update.effective_chat.id) != get_tenant(context).support_chat_id:
+        await query.answer()
+        return
+    _, action, ticket_id = query.data.split(':')
+    ticket_id = int(ticket_id)
+    store = get_ticket_store(context)
+    staff = update.effective_user
+
+    if action == 'claim':
+        done = store.claim_ticket(ticket_id, staff.id, staff.first_name)
+    elif action in ('resolve', 'reject'):
+        done = store.close_ticket(ticket_id, 'resolved' if action == 'resolve' else 'rejected',
+                                  staff.id, staff.first_name)
+    else:
+        done = False
+    ticket = store.get_ticket(ticket_id)
+    if not ticket:
+        await query.answer("Ticket not found.", show_alert=True)
+        return
+
+    who = ticket['claimed_by_name'] or "someone"
+    if done:
+        await query.answer(f"Ticket #{ticket_id} {ticket['status']}.")
+    elif ticket['status'] == 'open':
+        await query.answer(f"Ticket #{ticket_id} is open.")
+    elif ticket['status'] == 'claimed':
+        await query.answer(f"Ticket #{ticket_id} is claimed by {who}.", show_alert=action != 'info')
+    else:
+        await query.answer(f"Ticket #{ticket_id} was already {ticket['status']} by {who}.", show_alert=action != 'info')
+    # Redraw even when nothing changed: this message's buttons may be out of date
+    get_ticket_message_editor(context).mark(ticket_id, query.message.message_id)
+
+async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """/stats [days] - tickets per status and per-agent throughput over the last days (default 7)."""
+    days = int(context.args[0]) if context.args and context.args[0].isdigit() else 7
+    store = get_ticket_store(context)
+    counts = store.status_counts()
+    lines = [
+        "📊 Tickets: " + ", ".join(f"{counts.get(status, 0)} {status}"
+                                  for status in ('open', 'claimed', 'resolved', 'rejected')),
+        f"👥 Claimed in the last {days} day(s):",
+    ]
+    for row in store.agent_stats(time.time() - days * 86400):
+        closing = f", {row['hours_to_close']:.1f} h to close on average" if row['hours_to_close'] is not None else ""
+        lines.append(f"• {row['name'] or 'unknown'}: {row['resolved']} resolved, {row['rejected']} rejected, "
+                     f"{row['claimed']} in progress{closing}")
+    if len(lines) == 2:
+        lines.append("• nobody yet")
+    await update.message.reply_text("\n".join(lines))
+
+# --- GRACEFUL SHUTDOWN ---
+class BotApplication(Application):
+    """Application that tracks the updates its handlers are working on.
+
+    drain() spools the in-flight updates; HealthMonitor reports their count,
+    the oldest one's age and when the last update finished.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.in_flight = {}  # handler task -> (update, monotonic start time)
+        self.updates_processed = 0
+        self.last_update_at = None  # monotonic time the last update finished
+
+    async def process_update(self, update: object) -> None:
+        task = asyncio.create_task(self._process_update(update))
+        self.in_flight[task] = (update, time.monotonic())
+        try:
+            await task
+        except asyncio.CancelledError:
+            if not task.cancelled() or asyncio.current_task().cancelling():
+                raise
+            # Cancelled by drain(), which spooled the update; the update fetcher must carry on
+        finally:
+            del self.in_flight[task]
+            self.updates_processed += 1
+            self.last_update_at = time.monotonic()
+
+    async def _process_update(self, update: object) -> None:
+        # Runs in its own task, so the breaker stays with this update and the tasks it starts
+        _edit_breaker.set(self.bot_data['edit_breaker'])
+        codec = self.bot_data.get('callback_codec')
+        if codec is not None and isinstance(update, Update):
+            update = await codec.restore(self, update)
+            if update is None:
+                return
+        tracer = self.bot_data.get('tracer')
+        if (tracer is None or not isinstance(update, Update) or update.effective_user is None
+                or update.effective_chat is None or update.effective_chat.type != Chat.PRIVATE):
+            await super().process_update(update)
+            return
+        async with tracer.update_span(self, update):
+            await super().process_update(update)
+
+def spool_updates(path: str, updates: list) -> None:
+    """Write updates in the recorder's line format (not anonymized), replacing the file atomically."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as raw:
+        with gzip.GzipFile(fileobj=raw, mode='wb') as f:
+            for update in updates:
+                f.write(json.dumps({"t": time.time(), "update": update.to_dict()}, ensure_ascii=False).encode() + b"\n")
+        raw.flush()
+        os.fsync(raw.fileno())
+    os.replace(tmp_path, path)
+
+def read_spool(path: str) -> list:
+    """Update dicts from a spool file, oldest first; [] when there is none."""
+    if not os.path.exists(path):
+        return []
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        return [json.loads(line)['update'] for line in f]
+
+async def drain(application: BotApplication, deadline: float) -> None:
+    """Stop fetching, give handlers until `deadline` (loop time), spool what is left, then stop.
+
+    Telegram already considers every fetched update delivered (the Updater
+    confirms a batch with its next getUpdates call), so nothing fetched may
+    be dropped: updates still queued or in a handler at the deadline are
+    written to the tenant's spool, and Application.stop() flushes persistence.
+    """
+    tenant = application.bot_data['tenant']
+    if application.updater and application.updater.running:
+        await application.updater.stop()
+
+    update_queue = application.update_queue
+    try:
+        await asyncio.wait_for(update_queue.join(), max(0.0, deadline - asyncio.get_running_loop().time()))
+    except TimeoutError:
+        # A finished handler task stays in in_flight until its caller resumes: it needs no spooling
+        leftover = [update for task, (update, _) in application.in_flight.items() if not task.done()]
+        while not update_queue.empty():
+            leftover.append(update_queue.get_nowait())
+            update_queue.task_done()
+        # The conversation state only moves when a handler returns, so a
+        # cancelled update is handled again from the same step on restart
+        spool_updates(tenant.spool_path, [update for update in leftover if isinstance(update, Update)])
+        for task in list(application.in_flight):
+            task.cancel()
+        logger.warning("Tenant %s: spooled %d update(s) not handled within the drain deadline",
+                       tenant.name, len(leftover))
+
+    for name in ('proof_forwarder', 'ticket_message_editor'):
+        if name in application.bot_data:
+            application.bot_data[name].close()
+    if application.running:
+        await application.stop()
+
+async def recover(application: BotApplication) -> None:
+    """Before polling: send tickets a previous run stored but never delivered, then handle spooled updates."""
+    tenant = application.bot_data['tenant']
+    store = get_ticket_store(application)
+    for ticket in store.undelivered() if tenant.support_chat_id else []:
+        try:
+            sent = await application.bot.send_message(
+                chat_id=tenant.support_chat_id, text=format_ticket(ticket),
+                reply_markup=ticket_keyboard(ticket['id'], ticket['status'], ticket['claimed_by_name']),
+            )
+        except Exception as e:
+            logger.error("Tenant %s: could not resend ticket #%s: %s", tenant.name, ticket['id'], e)
+            continue
+        store.mark_delivery(ticket['id'], 'sent', sent.message_id)
+        logger.info("Tenant %s: resent ticket #%s", tenant.name, ticket['id'])
+    if tenant.support_chat_id and store.unforwarded_proofs():
+        try:
+            forwarded = await get_proof_forwarder(application).flush_all()
+            logger.info("Tenant %s: forwarded %d waiting proof(s)", tenant.name, forwarded)
+        except Exception as e:
+            logger.error("Tenant %s: could not forward waiting proofs: %s", tenant.name, e)
+
+    spooled = read_spool(tenant.spool_path)
+    for data in spooled:
+        await application.process_update(Update.de_json(data, application.bot))
+    if spooled:
+        os.remove(tenant.spool_path)
+        logger.info("Tenant %s: handled %d spooled update(s)", tenant.name, len(spooled))
+
+# --- HEALTH ---
+class SlowCallbackWatchdog:
+    """Opt-in detector for loop steps that hold the event loop too long (SLOW_CALLBACK_MS).
+
+    The loop bumps a heartbeat every quarter threshold. A daemon thread checks
+    it, and when the heartbeat is late it samples the loop thread's stack with
+    sys._current_frames() and charges the block to the outermost bot.py
+    function on it, normally the handler. Nothing runs when it is not started.
+    """
+
+    def __init__(self, threshold: float):
+        self.threshold = threshold
+        self.interval = threshold / 4
+        self.stats = {}  # function name -> {"count", "blocked_seconds", "last_stack"}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._loop = None
+        self._loop_thread_id = None
+        self._last_beat = 0.0
+        self._timer = None
+        self._flagged = None  # (heartbeat time, function name) of the block being measured
+
+    def start(self) -> None:
+        """Start watching the running loop; call from the loop's thread."""
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._beat()
+        threading.Thread(target=self._watch, name="slow-callback-watchdog", daemon=True).start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._timer:
+            self._timer.cancel()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {name: dict(stat) for name, stat in self.stats.items()}
+
+    def _beat(self) -> None:
+        self._last_beat = time.monotonic()
+        self._timer = self._loop.call_later(self.interval, self._beat)
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self.interval):
+            beat = self._last_beat
+            if self._flagged and beat != self._flagged[0]:
+                # The loop is back: charge the whole block to the function caught holding it
+                blocked = beat - self._flagged[0] - self.interval
+                with self._lock:
+                    stat = self.stats[self._flagged[1]]
+                    stat["blocked_seconds"] += blocked
+                logger.warning("Event loop blocked for %.0f ms in %s\n%s", blocked * 1e3, self._flagged[1],
+                               stat["last_stack"])
+                self._flagged = None
+            if self._flagged is None and time.monotonic() - beat > self.threshold:
+                frame = sys._current_frames().get(self._loop_thread_id)
+                if frame is None:
+                    continue
+                name = self.attribute(frame)
+                with self._lock:
+                    stat = self.stats.setdefault(name, {"count": 0, "blocked_seconds": 0.0, "last_stack": ""})
+                    stat["count"] += 1
+                    stat["last_stack"] = "".join(traceback.format_stack(frame, limit=12))
+                self._flagged = (beat, name)
+
+    @staticmethod
+    def attribute(frame) -> str:
+        """Name of the outermost module-level bot.py function on the stack."""
+        name = "<outside bot.py>"
+        module = globals()
+        while frame is not None:
+            function = module.get(frame.f_code.co_name) if frame.f_globals is module else None
+            if getattr(function, '__code__', None) is frame.f_code:
+                name = frame.f_code.co_name
+            frame = frame.f_back
+        return name
+
+class HealthMonitor:
+    """Liveness, readiness and event-loop lag on a small local HTTP endpoint.
+
+    GET /healthz  200 while the loop keeps up and no handler is stuck, else 503
+    GET /readyz   200 once every tenant passed its startup checks and is polling, else 503
+    GET /status   the same details as JSON, per tenant
+
+    Lag is measured by a probe that sleeps HEALTH_PROBE_INTERVAL and records
+    how late it woke up.
+    """
+
+    def __init__(self, probe_interval: float = HEALTH_PROBE_INTERVAL, max_lag: float = HEALTH_MAX_LAG,
+                 stall_seconds: float = HEALTH_STALL_SECONDS):
+        self.probe_interval = probe_interval
+        self.max_lag = max_lag
+        self.stall_seconds = stall_seconds
+        self.applications = []
+        self.checks = {}  # tenant name -> {"token": bool, "support_chat": bool}
+        self.lag_samples = deque(maxlen=max(1, int(60 / probe_interval)))
+        self.draining = False
+        self.watchdog = None  # SlowCallbackWatchdog, when enabled
+        self._last_probe = None
+        self._probe_task = None
+        self._server = None
+
+    async def start(self, host: str = HEALTH_HOST, port: int = HEALTH_PORT) -> None:
+        self._last_probe = time.monotonic()
+        self._probe_task = asyncio.create_task(self._probe())
+        self._server = await asyncio.start_server(self._handle, host, port)
+        logger.info("Health endpoint listening on http://%s:%d", host, port)
+
+    async def stop(self) -> None:
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+        if self._probe_task:
+            self._probe_task.cancel()
+
+    async def add(self, application: "BotApplication") -> None:
+        """Run a tenant's startup checks; initialize() already proved the token with getMe."""
+        tenant = application.bot_data['tenant']
+        checks = {"token": application.bot.username is not None, "support_chat": False}
+        if tenant.support_chat_id:
+            try:
+                await application.bot.get_chat(tenant.support_chat_id)
+                checks["support_chat"] = True
+            except Exception as e:
+                logger.error("Tenant %s: support chat %s is not reachable: %s", tenant.name, tenant.support_chat_id, e)
+        self.checks[tenant.name] = checks
+        self.applications.append(application)
+
+    async def _probe(self) -> None:
+        while True:
+            await asyncio.sleep(self.probe_interval)
+            now = time.monotonic()
+            self.lag_samples.append(max(0.0, now - self._last_probe - self.probe_interval))
+            self._last_probe = now
+
+    def lag(self) -> float:
+        """Current lag: the last sample, or how overdue the probe is if that is worse."""
+        overdue = time.monotonic() - self._last_probe - self.probe_interval
+        return max(self.lag_samples[-1] if self.lag_samples else 0.0, overdue)
+
+    def tenant_status(self, application: "BotApplication") -> dict:
+        now = time.monotonic()
+        tenant = application.bot_data['tenant']
+        started = [since for _, since in application.in_flight.values()]
+        return {
+            "username": application.bot.username,
+            **self.checks.get(tenant.name, {}),
+            "running": application.running and application.updater.running,
+            "in_flight": len(started),
+            "oldest_in_flight_seconds": round(now - min(started), 3) if started else None,
+            "last_update_age_seconds": (
+                round(now - application.last_update_at, 3) if application.last_update_at else None
+            ),
+            "updates_processed": application.updates_processed,
+            "gateway": application.bot.rate_limiter.snapshot() if application.bot.rate_limiter else None,
+            "edits": application.bot_data['edit_breaker'].snapshot(),
+        }
+
+    def status(self) -> dict:
+        tenants = {app.bot_data['tenant'].name: self.tenant_status(app) for app in self.applications}
+        samples = sorted(self.lag_samples)
+        stuck = [name for name, t in tenants.items()
+                 if t["oldest_in_flight_seconds"] is not None and t["oldest_in_flight_seconds"] > self.stall_seconds]
+        lag = self.lag()
+        return {
+            "live": lag < self.max_lag and not stuck,
+            "ready": bool(tenants) and not self.draining and all(
+                t["token"] and t["support_chat"] and t["running"] for t in tenants.values()
+            ),
+            "loop_lag_seconds": round(lag, 4),
+            "loop_lag_p99_seconds": round(samples[int(len(samples) * 0.99)], 4) if samples else 0.0,
+            "loop_lag_max_seconds": round(samples[-1], 4) if samples else 0.0,
+            "stuck_tenants": stuck,
+            "slow_callbacks": self.watchdog.snapshot() if self.watchdog else None,
+            "tenants": tenants,
+        }
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), 5)
+            while (await asyncio.wait_for(reader.readline(), 5)) not in (b"\r\n", b"\n", b""):
+                pass
+            parts = request_line.decode('latin-1').split()
+            path = parts[1].split('?')[0] if len(parts) > 1 else ""
+            status = self.status()
+            if path == "/healthz":
+                code, body = (200 if status["live"] else 503), {"live": status["live"]}
+            elif path == "/readyz":
+                code, body = (200 if status["ready"] else 503), {"ready": status["ready"]}
+            elif path == "/status":
+                code, body = 200, status
+            else:
+                code, body = 404, {"error": "not found"}
+            payload = json.dumps(body).encode()
+            reason = {200: "OK", 404: "Not Found", 503: "Service Unavailable"}[code]
+            writer.write(
+                f"HTTP/1.1 {code} {reason}\r\nContent-Type: application/json\r\n"
+                f"Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n".encode() + payload
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+def build_application(tenant: Tenant = DEFAULT_TENANT, request=None, persist: bool = True) -> Application:
+    """Create a tenant's Application with all handlers; request replaces the HTTP layer (replay.py)."""
+    if request is not None:
+        get_updates_request = request
+    else:
+        request = SharedHTTPXRequest(connection_pool_size=HTTP_POOL_SIZE)
+        get_updates_request = SharedHTTPXRequest(connection_pool_size=HTTP_POOL_SIZE)
+    # Signs buttons only once a CallbackCodec is installed below (stateless mode)
+    gateway = OutgoingGateway(tenant.support_chat_id) if GATEWAY_GLOBAL_RATE > 0 else None
+    bot = SignedCallbackBot(tenant.token, base_url=tenant.base_url, request=request,
+                            get_updates_request=get_updates_request, rate_limiter=gateway)
+    builder = Application.builder().application_class(BotApplication).bot(bot)
+    if persist:
+        # user_data and conversation states survive restarts; bot_data holds live objects like the ticket store
+        store_data = PersistenceInput(bot_data=False, chat_data=False, user_data=True, callback_data=False)
+        builder = builder.persistence(PicklePersistence(filepath=tenant.persistence_path, store_data=store_data))
+    if tenant.record_dir or tenant.trace_path:
+        builder = builder.post_shutdown(close_recorder)
+    application = builder.build()
+    application.bot_data['tenant'] = tenant
+    application.bot_data['edit_breaker'] = EditBreaker()
+
+    if tenant.record_dir:
+        application.add_handler(TypeHandler(Update, record_update), group=-1)
 
     conv_handler = ConversationHandler(
+        name="main",
+        persistent=persist,
         entry_points=[CommandHandler("start", start)],
         states={
             SELECT_LANG: [
-                CallbackQueryHandler(set_language, pattern="^(en|fr)$")
+                CallbackQueryHandler(set_language, pattern=f"^({'|'.join(map(re.escape, STRINGS))})$")
             ],
             MAIN_MENU: [
                 CallbackQueryHandler(new_player_start, pattern="^new_player_start$"),
                 CallbackQueryHandler(existing_player_start, pattern="^existing_player_start$"),
                 CallbackQueryHandler(show_helpful_channel, pattern="^helpful_channel$"),
                 CallbackQueryHandler(support_start, pattern="^contact_support$"),
+                CallbackQueryHandler(ask_question_start, pattern="^ask_question$"),
+                CallbackQueryHandler(show_language_picker, pattern="^change_lang$"),
                 CallbackQueryHandler(show_main_menu, pattern="^back_to_main$"),
             ],
             EXISTING_PLAYER_FLOW: [
@@ -2372,6 +5323,18 @@ def main() -> None:
                 MessageHandler(filters.TEXT & ~filters.COMMAND, collect_username),
                 CommandHandler("cancel", cancel_support), 
             ],
+            PROOF_INTAKE: [
+                MessageHandler(filters.PHOTO | filters.Document.ALL, receive_proof),
+                MessageHandler(filters.TEXT & ~filters.COMMAND, proof_text),
+                CallbackQueryHandler(proofs_done, pattern="^proofs_done$"),
+                CommandHandler("cancel", cancel_support),
+            ],
+            ASK_QUESTION: [
+                MessageHandler(filters.TEXT & ~filters.COMMAND, answer_question),
+                CallbackQueryHandler(support_start, pattern="^contact_support$"),
+                CallbackQueryHandler(show_main_menu, pattern="^back_to_main$"),
+                CommandHandler("cancel", cancel_support),
+            ],
         },
         fallbacks=[
             CommandHandler("start", start),
@@ -2379,17 +5342,114 @@ def main() -> None:
         ],
     )
 
+    if tenant.trace_path:
+        tracer = application.bot_data['tracer'] = ConversationTracer(tenant.trace_path, tenant.name, conv_handler)
+        tracer.instrument(conv_handler)
+
     application.add_handler(conv_handler)
+    application.bot_data['deep_links'] = resolve_deep_links(conv_handler)
+    if STATELESS_SECRET:
+        application.bot_data['callback_codec'] = CallbackCodec(STATELESS_SECRET.encode(), conv_handler)
+
+    if tenant.support_chat_id:
+        support_chat = filters.Chat(chat_id=int(tenant.support_chat_id))
+        application.add_handler(CommandHandler("ticket", ticket_command, filters=support_chat))
+        application.add_handler(CommandHandler("search", search_command, filters=support_chat))
+        application.add_handler(CommandHandler("answer", answer_command, filters=support_chat))
+        application.add_handler(CommandHandler("next", next_command, filters=support_chat))
+        application.add_handler(CommandHandler("stats", stats_command, filters=support_chat))
+        application.add_handler(CallbackQueryHandler(ticket_button, pattern=r"^ticket:[a-z]+:\d+$"))
+
+    return application
+
+async def run_tenants(tenants: list) -> None:
+    """Poll every tenant's Application on one event loop until SIGINT or SIGTERM, then drain them."""
+    global EDIT_DELAY, MENU_DELAY
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    applications = []
+    watchdog = SlowCallbackWatchdog(SLOW_CALLBACK_MS / 1000) if SLOW_CALLBACK_MS else None
+    if watchdog:
+        watchdog.start()
+    monitor = HealthMonitor() if HEALTH_PORT else None
+    if monitor:
+        monitor.watchdog = watchdog
+        await monitor.start()
+    # Startup allocations per tenant: Application, handlers, persisted user_data
+    # (the first tenant also pays for the shared connection pool)
+    tracemalloc.start()
+    try:
+        for tenant in tenants:
+            before = tracemalloc.get_traced_memory()[0]
+            application = build_application(tenant)
+            await application.initialize()
+            if application.post_init:
+                await application.post_init(application)
+            await recover(application)
+            await application.updater.start_polling()
+            await application.start()
+            applications.append(application)
+            if monitor:
+                await monitor.add(application)
+            used = tracemalloc.get_traced_memory()[0] - before
+            logger.info("Tenant %s running as @%s, %d KiB", tenant.name, application.bot.username, used // 1024)
+            print(f"🤖 {tenant.name}: @{application.bot.username} ({used / 1024:.0f} KiB)")
+        tracemalloc.stop()
+        print(f"🚀 {len(applications)} bot(s) running...")
+        await stop.wait()
+    finally:
+        tracemalloc.stop()
+        if monitor:
+            monitor.draining = True
+        # The pacing delays are cosmetic; drop them so in-flight handlers finish quickly
+        EDIT_DELAY = MENU_DELAY = 0
+        deadline = loop.time() + DRAIN_SECONDS
+        await asyncio.gather(*(drain(application, deadline) for application in applications))
+        for application in reversed(applications):
+            await application.shutdown()
+            if application.post_shutdown:
+                await application.post_shutdown(application)
+        if monitor:
+            await monitor.stop()
+        if watchdog:
+            watchdog.stop()
+            for name, stat in sorted(watchdog.snapshot().items(), key=lambda item: -item[1]["blocked_seconds"]):
+                logger.info("Slow callbacks in %s: %d, %.0f ms blocked", name, stat["count"],
+                            stat["blocked_seconds"] * 1e3)
+
+def run_event_loop(coroutine, fast: bool = PERF_PROFILE == "fast"):
+    """asyncio.run(coroutine), on uvloop's loop when `fast` and uvloop is installed.
+
+    uvloop.run() works on every Python python-telegram-bot supports (3.9+);
+    asyncio.run(loop_factory=...) would need 3.12.
+    """
+    if fast:
+        if uvloop is not None:
+            return uvloop.run(coroutine)
+        logger.warning("PERF_PROFILE=fast: uvloop is not installed, using the asyncio event loop")
+    return asyncio.run(coroutine)
+
+def main() -> None:
+    """Run the bot, or every bot listed in BOTS_CONFIG."""
+    tenants = load_tenants()
+    missing = [tenant.name for tenant in tenants if not tenant.token]
+    if missing:
+        logger.error("No token for tenant(s): %s", ", ".join(missing))
+        print("❌ ERROR: TELEGRAM_TOKEN environment variable is required!")
+        return
+
+    if PERF_PROFILE == "fast" and not FAST_JSON:
+        logger.warning("PERF_PROFILE=fast: orjson is not installed, using json")
 
     logger.info("Bot is running...")
     print("🤖 Bot is starting...")
-    print(f"✅ TELEGRAM_TOKEN: {'Set' if TELEGRAM_TOKEN else 'Not Set'}")
-    print(f"✅ SUPPORT_CHAT_ID: {'Set' if SUPPORT_CHAT_ID else 'Not Set'}")
-    if SUPPORT_CHAT_ID:
-        print(f"📋 SUPPORT_CHAT_ID Value: {SUPPORT_CHAT_ID}")
-    print("🚀 Bot is running...")
-    
-    application.run_polling()
+    for tenant in tenants:
+        print(f"✅ {tenant.name} SUPPORT_CHAT_ID: {tenant.support_chat_id or 'Not Set'}")
+
+    run_event_loop(run_tenants(tenants))
 
 if __name__ == "__main__":
     main()
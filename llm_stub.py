@@ -0,0 +1,113 @@
+"""Local stand-in for the OpenAI chat completions API.
+
+Used to exercise the bot's free-text questions without a real model:
+
+    python llm_stub.py --port 8099 --latency 0.8
+    OPENAI_BASE_URL=http://127.0.0.1:8099/v1 OPENAI_API_KEY=stub python bot.py
+
+Every completion answers with a fixed sentence quoting the question, after
+--latency seconds, and the number of requests served is printed on exit.
+Streaming requests get the answer word by word, --chunk-delay seconds apart;
+other requests get it whole once all its words would have been streamed, as
+a model takes as long to generate an answer either way.
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ANSWER = "This is a stub answer to: {question}"
+
+class StubHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+    chunk_delay = 0.0
+    requests_served = 0
+    lock = threading.Lock()
+
+    def do_POST(self):
+        if not self.path.endswith("/chat/completions"):
+            self.send_error(404)
+            return
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        question = body["messages"][-1]["content"]
+        with StubHandler.lock:
+            StubHandler.requests_served += 1
+
+        time.sleep(self.latency)
+        answer = ANSWER.format(question=question)
+        if body.get("stream"):
+            self._stream(answer, body.get("model", "stub"))
+            return
+
+        time.sleep(self.chunk_delay * (len(answer.split(" ")) - 1))
+        payload = json.dumps({
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": answer},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _stream(self, answer: str, model: str) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        words = answer.split(" ")
+        for i, word in enumerate(words):
+            if i:
+                time.sleep(self.chunk_delay)
+            self._event({"content": word if i == 0 else " " + word}, None, model)
+        self._event({}, "stop", model)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+    def _event(self, delta: dict, finish_reason, model: str) -> None:
+        chunk = {
+            "id": "chatcmpl-stub",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        }
+        self.wfile.write(b"data: " + json.dumps(chunk).encode() + b"\n\n")
+        self.wfile.flush()
+
+    def log_message(self, format, *args):
+        pass
+
+def serve(port: int = 8099, latency: float = 0.0, chunk_delay: float = 0.0) -> ThreadingHTTPServer:
+    """Start the stub in a background thread and return the server."""
+    StubHandler.latency = latency
+    StubHandler.chunk_delay = chunk_delay
+    server = ThreadingHTTPServer(("127.0.0.1", port), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds before each answer")
+    parser.add_argument("--chunk-delay", type=float, default=0.1, help="seconds between streamed words")
+    args = parser.parse_args()
+
+    server = serve(args.port, args.latency, args.chunk_delay)
+    print(f"🤖 LLM stub listening on http://127.0.0.1:{args.port}/v1")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+        print(f"Requests served: {StubHandler.requests_served}")
+
+if __name__ == "__main__":
+    main()
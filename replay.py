@@ -0,0 +1,307 @@
+"""Replay recorded updates through the bot against a fake Bot API.
+
+Recordings are the segment files written when RECORD_UPDATES_DIR is set:
+
+    python replay.py recordings/ --speed max
+    python replay.py recordings/updates-20261017-190000-1-0.jsonl.gz --speed original
+    python replay.py recordings/ --restart-at 300 --drain-seconds 0.05
+    python replay.py recordings/ --speed original --trace traces.jsonl
+
+Reports handler CPU time per update, Bot API calls per update and the final
+conversation states, so a slowdown in bot.py shows up before deploy.
+
+--restart-at runs the trace twice: straight through, and with a rolling
+restart (drain, then a new Application on the same files) after N updates.
+It exits 1 if the restart lost or repeated an update or a ticket, or left
+a user in another conversation state. --api-latency makes each Bot API call
+take that long, so the drain deadline can cut a handler between its calls.
+fixtures/restart.jsonl.gz is three users opening support tickets; at these
+settings the drain cuts the first user's ticket submission short:
+
+    python replay.py fixtures/restart.jsonl.gz --restart-at 18 --api-latency 0.05 --drain-seconds 1.8
+
+--trace writes the conversation traces (see ConversationTracer) and splits
+each conversation's time to ticket into bot processing, Bot API calls and
+user think time; think time is only real at --speed original.
+"""
+import argparse
+import asyncio
+import dataclasses
+import gzip
+import json
+import os
+import re
+import statistics
+import sys
+import tempfile
+import time
+import zlib
+from collections import Counter
+
+from telegram import Update
+from telegram.ext import TypeHandler
+from telegram.request import BaseRequest, RequestData
+
+import bot
+
+FAKE_TOKEN = "123456:REPLAY"
+FAKE_SUPPORT_CHAT_ID = "-1000000000001"
+
+class FakeBotAPI(BaseRequest):
+    """Answers every Bot API call locally with a minimal valid result."""
+
+    def __init__(self, calls: Counter = None, delivered: Counter = None, latency: float = 0.0):
+        self.calls = Counter() if calls is None else calls
+        self.delivered = Counter() if delivered is None else delivered  # ticket ID -> support group messages
+        self.latency = latency  # seconds before a call takes effect; a call cancelled sooner never happened
+        self._message_id = 0
+
+    @property
+    def read_timeout(self):
+        return None
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    async def do_request(self, url, method, request_data: RequestData = None, read_timeout=None,
+                         write_timeout=None, connect_timeout=None, pool_timeout=None):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        endpoint = url.rsplit('/', 1)[-1]
+        self.calls[endpoint] += 1
+        params = request_data.parameters if request_data else {}
+        if endpoint == 'sendMessage' and str(params.get('chat_id')) == FAKE_SUPPORT_CHAT_ID:
+            ticket = re.search(r"Ticket:? #(\d+)", params.get('text', ""))
+            if ticket:
+                self.delivered[int(ticket.group(1))] += 1
+        return 200, json.dumps({"ok": True, "result": self.result(endpoint, params)}).encode()
+
+    def result(self, endpoint: str, params: dict):
+        if endpoint == 'getMe':
+            return {"id": 123456, "is_bot": True, "first_name": "Replay", "username": "replay_bot",
+                    "can_join_groups": True, "can_read_all_group_messages": False,
+                    "supports_inline_queries": False}
+        if endpoint in ('sendMessage', 'editMessageText'):
+            self._message_id += 1
+            chat_id = int(params.get('chat_id', 1))
+            return {"message_id": params.get('message_id', self._message_id), "date": int(time.time()),
+                    "chat": {"id": chat_id, "type": "private" if chat_id > 0 else "supergroup"},
+                    "text": params.get('text', "")}
+        if endpoint == 'getUpdates':
+            return []
+        return True
+
+def read_recording(paths: list):
+    """Yield (receive time, update dict) from segment files, oldest first."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(os.path.join(path, name) for name in os.listdir(path) if name.endswith('.jsonl.gz'))
+        else:
+            files.append(path)
+    for path in sorted(files):
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            try:
+                for line in f:
+                    record = json.loads(line)
+                    yield record['t'], record['update']
+            except (EOFError, zlib.error, json.JSONDecodeError):
+                # A segment cut short by a crash: keep what was readable
+                print(f"⚠️ {path} is truncated, replayed what was readable", file=sys.stderr)
+
+def conversation_states(application) -> Counter:
+    """Count users per state of the main ConversationHandler."""
+    states = Counter()
+    for handler in application.handlers[0]:
+        if hasattr(handler, '_conversations'):
+            # ConversationHandler keeps no public view of its current states
+            for state in handler._conversations.values():
+                states[state] += 1
+    return states
+
+async def replay(paths: list, speed: str, slow_callback_ms: float = 0, trace_path: str = None) -> dict:
+    calls = Counter()
+    watchdog = bot.SlowCallbackWatchdog(slow_callback_ms / 1000) if slow_callback_ms else None
+    if watchdog:
+        watchdog.start()
+    tenant = dataclasses.replace(bot.DEFAULT_TENANT, token=FAKE_TOKEN, record_dir=None, trace_path=trace_path,
+                                 support_chat_id=bot.DEFAULT_TENANT.support_chat_id or FAKE_SUPPORT_CHAT_ID)
+    application = bot.build_application(tenant, request=FakeBotAPI(calls), persist=False)
+    # Tickets from a replay must never reach the real store
+    application.bot_data['ticket_store'] = bot.TicketStore(':memory:')
+    await application.initialize()
+    calls.clear()  # getMe during initialize is not part of the trace
+
+    cpu_times = []
+    previous_t = None
+    started = time.perf_counter()
+    for t, data in read_recording(paths):
+        if speed == 'original' and previous_t is not None and t > previous_t:
+            await asyncio.sleep(t - previous_t)
+        previous_t = t
+        update = Update.de_json(data, application.bot)
+        cpu = time.process_time()
+        await application.process_update(update)
+        cpu_times.append(time.process_time() - cpu)
+    wall = time.perf_counter() - started
+
+    states = conversation_states(application)
+    await application.shutdown()
+    await bot.close_recorder(application)
+    if watchdog:
+        watchdog.stop()
+
+    n = len(cpu_times)
+    return {
+        "updates": n,
+        "wall_seconds": round(wall, 3),
+        "cpu_ms_total": round(sum(cpu_times) * 1e3, 3),
+        "cpu_ms_mean": round(statistics.fmean(cpu_times) * 1e3, 4) if n else 0,
+        "cpu_ms_p99": round(sorted(cpu_times)[min(n - 1, int(n * 0.99))] * 1e3, 4) if n else 0,
+        "api_calls_per_update": round(sum(calls.values()) / n, 3) if n else 0,
+        "api_calls": dict(calls.most_common()),
+        "final_states": {bot.STATE_NAMES.get(state, str(state)): count for state, count in states.most_common()},
+        "users": len(application.user_data),
+        "slow_callbacks": {
+            name: stat["count"] for name, stat in (watchdog.snapshot() if watchdog else {}).items()
+        },
+    }
+
+def trace_breakdown(path: str) -> dict:
+    """Mean and p50 milliseconds per conversation that reached a ticket, from the trace file's root spans."""
+    conversations = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            for resource in json.loads(line)["resourceSpans"]:
+                for scope in resource["scopeSpans"]:
+                    for span in scope["spans"]:
+                        if span["name"] != "conversation":
+                            continue
+                        attributes = {a["key"]: next(iter(a["value"].values())) for a in span["attributes"]}
+                        conversations.append({
+                            "total": (int(span["endTimeUnixNano"]) - int(span["startTimeUnixNano"])) / 1e6,
+                            "bot": attributes["conversation.bot_ms"],
+                            "api": attributes["conversation.api_ms"],
+                            "gateway": attributes["conversation.gateway_wait_ms"],
+                            "think": attributes["conversation.think_ms"],
+                        })
+    if not conversations:
+        return {"conversations": 0}
+    return {
+        "conversations": len(conversations),
+        **{part: {"mean_ms": round(statistics.fmean(c[part] for c in conversations), 3),
+                  "p50_ms": round(statistics.median(c[part] for c in conversations), 3)}
+           for part in ("total", "bot", "api", "gateway", "think")},
+    }
+
+async def count_handled(update: Update, context) -> None:
+    """Runs after the conversation handler has returned for an update."""
+    context.bot_data['handled'][update.update_id] += 1
+
+async def run_instance(tenant, updates: list, delivered: Counter, handled: Counter, drain_seconds: float,
+                       api_latency: float = 0.0) -> Counter:
+    """One process lifetime: recover, handle `updates` through the update queue, then drain.
+
+    Returns the conversation states it ended with.
+    """
+    application = bot.build_application(tenant, request=FakeBotAPI(delivered=delivered, latency=api_latency))
+    application.bot_data['handled'] = handled
+    application.add_handler(TypeHandler(Update, count_handled), group=1)
+    await application.initialize()
+    await bot.recover(application)
+    await application.start()
+    for data in updates:
+        await application.update_queue.put(Update.de_json(data, application.bot))
+    await bot.drain(application, asyncio.get_running_loop().time() + drain_seconds)
+    await application.shutdown()
+    return conversation_states(application)
+
+async def restart_check(paths: list, restart_at: int, drain_seconds: float, api_latency: float = 0.0) -> dict:
+    """Replay once straight through and once with a restart after `restart_at` updates."""
+    updates = [data for _, data in read_recording(paths)]
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, cut in (("straight", len(updates)), ("restart", restart_at)):
+            tenant = dataclasses.replace(
+                bot.DEFAULT_TENANT, token=FAKE_TOKEN, record_dir=None, support_chat_id=FAKE_SUPPORT_CHAT_ID,
+                ticket_db_path=os.path.join(tmp, f"{name}-tickets.db"),
+                persistence_path=os.path.join(tmp, f"{name}-user_data.pickle"),
+                spool_path=os.path.join(tmp, f"{name}-spool.jsonl.gz"),
+            )
+            delivered, handled = Counter(), Counter()
+            await run_instance(tenant, updates[:cut], delivered, handled,
+                               drain_seconds if name == "restart" else 60.0, api_latency)
+            spooled = len(bot.read_spool(tenant.spool_path))
+            states = await run_instance(tenant, updates[cut:], delivered, handled, 60.0, api_latency)
+            store = bot.TicketStore(tenant.ticket_db_path)
+            results[name] = {
+                "updates_spooled": spooled,
+                "updates_unhandled": len({u['update_id'] for u in updates} - set(handled)),
+                "updates_repeated": sum(1 for n in handled.values() if n > 1),
+                "tickets": store.conn.execute("SELECT COUNT(*) FROM tickets WHERE delivery != 'failed'").fetchone()[0],
+                "tickets_undelivered": len(store.undelivered()),
+                "tickets_sent_twice": sum(1 for n in delivered.values() if n > 1),
+                "final_states": dict(sorted(states.items())),
+            }
+    return results
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("paths", nargs="+", help="segment files or recording directories")
+    parser.add_argument("--speed", choices=("original", "max"), default="max",
+                        help="keep the recorded gaps between updates, or replay back to back")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    parser.add_argument("--slow-callback-ms", type=float, default=0,
+                        help="count loop steps longer than this, per handler")
+    parser.add_argument("--restart-at", type=int, help="check a rolling restart after this many updates")
+    parser.add_argument("--drain-seconds", type=float, default=bot.DRAIN_SECONDS,
+                        help="drain deadline for --restart-at")
+    parser.add_argument("--api-latency", type=float, default=0.0,
+                        help="seconds each Bot API call takes for --restart-at, so the drain cuts handlers mid-call")
+    parser.add_argument("--trace", help="write conversation traces to this file and report time to ticket")
+    args = parser.parse_args()
+
+    if args.speed == 'max':
+        # The UI pacing delays and Bot API limits are wall-clock only; drop them so the trace runs flat out
+        bot.EDIT_DELAY = bot.MENU_DELAY = 0
+        bot.GATEWAY_GLOBAL_RATE = 0
+
+    if args.restart_at is not None:
+        results = asyncio.run(restart_check(args.paths, args.restart_at, args.drain_seconds, args.api_latency))
+        print(json.dumps(results, indent=2))
+        straight, restart = results["straight"], results["restart"]
+        ok = (restart["updates_unhandled"] == restart["updates_repeated"] == restart["tickets_undelivered"]
+              == restart["tickets_sent_twice"] == 0 and restart["tickets"] == straight["tickets"]
+              and restart["final_states"] == straight["final_states"])
+        print("✅ Restart lost and repeated nothing" if ok
+              else "❌ Restart lost or repeated updates or tickets, or changed where users ended up")
+        sys.exit(0 if ok else 1)
+
+    report = asyncio.run(replay(args.paths, args.speed, args.slow_callback_ms, args.trace))
+    if args.trace:
+        report["time_to_ticket"] = trace_breakdown(args.trace)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"📼 Replayed {report['updates']} updates in {report['wall_seconds']}s")
+    print(f"⏱️ Handler CPU: {report['cpu_ms_total']} ms total, {report['cpu_ms_mean']} ms mean, "
+          f"{report['cpu_ms_p99']} ms p99")
+    print(f"📡 API calls per update: {report['api_calls_per_update']} {report['api_calls']}")
+    print(f"🗂️ Final states ({report['users']} users): {report['final_states']}")
+    if args.slow_callback_ms:
+        print(f"🐢 Loop steps over {args.slow_callback_ms:g} ms: {report['slow_callbacks']}")
+    if args.trace:
+        breakdown = report["time_to_ticket"]
+        if breakdown["conversations"]:
+            print(f"🧵 Time to ticket over {breakdown['conversations']} conversation(s), mean ms: "
+                  f"total {breakdown['total']['mean_ms']} = bot {breakdown['bot']['mean_ms']} "
+                  f"+ Bot API {breakdown['api']['mean_ms']} (gateway wait {breakdown['gateway']['mean_ms']}) "
+                  f"+ user think {breakdown['think']['mean_ms']}")
+        else:
+            print("🧵 No conversation reached a ticket")
+
+if __name__ == "__main__":
+    main()